@@ -12,27 +12,135 @@ Description:
 - Sets up structured logging.
 - Creates and validates a LangChain agent instance with proper
   error handling and logging for observability.
+- The agent is built lazily by the memoized `get_agent()` factory; the
+  module attribute `agent` remains available and resolves to it.
+- `build_middleware()` assembles the agent middleware enabled in
+  config.py (per-tool concurrency limits from tool_concurrency.py, the
+  prompt prefix cache from prompt_cache.py). Backend rate limits are
+  applied by the model itself (see ratelimit.py).
+- `get_session_agent()` builds a second, checkpointed agent for multi-turn
+  sessions (see memory.py). It adds the context window middleware and
+  requires a `thread_id` in the invocation config.
 
 If agent creation fails, the error is logged with stack trace details
 and re-raised to ensure failure visibility.
 """
 
-from langchain.agents import create_agent
+import threading
 
-from client import model
-from tools import execute_terminal_command,web_search_tool,generate_test_cases
+from client import get_model
+from tools import execute_terminal_command,read_command_output,web_search_tool,generate_test_cases
 from logger_config import setup_logger
 
 logger = setup_logger(__name__)
 
-logger.info("Initializing LangChain agent")
+tools =[execute_terminal_command,read_command_output,web_search_tool,generate_test_cases]
 
-tools =[execute_terminal_command,web_search_tool,generate_test_cases]
-logger.info("Initializing LangChain agent")
+_agent = None
+_session_agent = None
+_agent_lock = threading.Lock()
 
-try:
-    agent = create_agent(model=model, tools=tools)
-    logger.info("Agent created successfully")
-except Exception as e:
-    logger.error(f"Failed to create agent: {str(e)}", exc_info=True)
-    raise
\ No newline at end of file
+
+def build_middleware() -> list:
+    """
+    Summary:
+        Assembles the agent middleware enabled in config.py.
+
+    Returns:
+        list: AgentMiddleware instances, outermost first.
+    """
+    from cascade import CascadeMiddleware
+    from config import MODEL_CASCADE_ENABLED
+    from deadline import DeadlineMiddleware
+    from prompt_cache import PromptPrefixCacheMiddleware, prompt_cache
+    from tool_concurrency import ToolConcurrencyMiddleware
+
+    # Outermost, so that its time limit covers queueing, rate limiting and retries
+    middleware = [DeadlineMiddleware(), ToolConcurrencyMiddleware()]
+    if MODEL_CASCADE_ENABLED:
+        # Outside the prefix cache, which strips the tools it validates against
+        middleware.append(CascadeMiddleware())
+    if prompt_cache is not None:
+        middleware.append(PromptPrefixCacheMiddleware(prompt_cache))
+    return middleware
+
+
+def _create(**kwargs):
+    from langchain.agents import create_agent
+
+    middleware = build_middleware() + kwargs.pop("extra_middleware", [])
+    return create_agent(model=get_model(), tools=tools, middleware=middleware, **kwargs)
+
+
+def get_agent():
+    """
+    Summary:
+        Returns the shared LangChain agent, creating it on first call.
+
+    Returns:
+        CompiledStateGraph: The agent graph.
+    """
+    global _agent
+    if _agent is not None:
+        return _agent
+
+    with _agent_lock:
+        if _agent is None:
+            logger.info("Initializing LangChain agent")
+            try:
+                _agent = _create()
+                logger.info("Agent created successfully")
+            except Exception as e:
+                logger.error(f"Failed to create agent: {str(e)}", exc_info=True)
+                raise
+    return _agent
+
+
+def get_session_agent():
+    """
+    Summary:
+        Returns the shared checkpointed agent used by `memory.Session`,
+        creating it on first call.
+
+    Returns:
+        CompiledStateGraph: The agent graph with a checkpointer attached.
+    """
+    global _session_agent
+    if _session_agent is not None:
+        return _session_agent
+
+    with _agent_lock:
+        if _session_agent is None:
+            logger.info("Initializing session agent")
+            try:
+                from memory import ContextWindowMiddleware, build_checkpointer
+
+                _session_agent = _create(
+                    checkpointer=build_checkpointer(),
+                    extra_middleware=[ContextWindowMiddleware()],
+                )
+                logger.info("Session agent created successfully")
+            except Exception as e:
+                logger.error(f"Failed to create session agent: {str(e)}", exc_info=True)
+                raise
+    return _session_agent
+
+
+def reset_agent() -> None:
+    """
+    Summary:
+        Drops the memoized agents so the next `get_agent()` or
+        `get_session_agent()` rebuilds them, e.g. after `client.set_model()`
+        swapped the chat model.
+    """
+    global _agent, _session_agent
+    with _agent_lock:
+        _agent = None
+        _session_agent = None
+
+
+def __getattr__(name: str):
+    # Backwards-compatible lazy module attribute
+    if name == "agent":
+        return get_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
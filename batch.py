@@ -0,0 +1,278 @@
+"""
+Concurrent Batch Execution Module
+
+Summary:
+This module runs many independent agent queries concurrently instead of
+invoking the agent one message set at a time.
+
+Description:
+- Loads message sets from a JSONL file or accepts them as a Python list.
+- Dispatches every message set through `agent.ainvoke` with a configurable
+  concurrency cap enforced by an asyncio semaphore.
+- Runs every item under a deadline and step budget (deadline.py): the
+  per-item timeout, or the item's own `deadline_s` / `max_steps`. An item
+  that runs out of budget returns a partial answer with status "partial";
+  every result carries the timing breakdown. Errors, including malformed
+  items, are captured per item so one failing query never aborts the rest
+  of the batch.
+- Yields results in completion order so callers can stream them to disk
+  or stdout while slower items are still running.
+
+Each result is a plain dictionary that can be serialized directly to JSON.
+"""
+
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from langchain_core.messages import HumanMessage
+
+from agent import get_agent
+from deadline import deadline_config, deadline_scope, hard_timeout
+from prompt_budget import get_system_prompt
+from config import BATCH_MAX_CONCURRENCY, BATCH_ITEM_TIMEOUT, AGENT_MAX_STEPS
+from logger_config import setup_logger
+from tracing import callback_config, span
+
+# Initialize logger for this module
+logger = setup_logger(__name__)
+
+
+MessageSetInput = Union[str, Dict[str, Any]]
+
+
+def build_message_set(query: str) -> Dict[str, Any]:
+    """
+    Summary:
+        Builds an independent agent input (system prompt + one user query).
+
+    Args:
+        query (str): User query text.
+
+    Returns:
+        Dict[str, Any]: Agent input in the same shape as the examples in main.py.
+    """
+    return {"messages": [get_system_prompt(), HumanMessage(content=query)]}
+
+
+def normalize_message_set(item: MessageSetInput, index: int) -> Dict[str, Any]:
+    """
+    Summary:
+        Converts a batch item into an identified agent input.
+
+    Args:
+        item (MessageSetInput): Either a query string, a dict with a `query`
+            key, or a ready-made agent input with a `messages` key. Optional
+            `id`, `deadline_s` and `max_steps` keys are carried through.
+        index (int): Position of the item in the batch, used as fallback id.
+
+    Returns:
+        Dict[str, Any]: Dictionary with `id`, `index` and `input` keys, plus
+        `deadline_s` / `max_steps` when the item sets them.
+
+    Raises:
+        ValueError: If the item has neither `query` nor `messages`.
+    """
+    if isinstance(item, str):
+        return {"id": str(index), "index": index, "input": build_message_set(item)}
+
+    item_id = str(item.get("id", index))
+    budget = {key: item[key] for key in ("deadline_s", "max_steps") if key in item}
+    if "messages" in item:
+        return {"id": item_id, "index": index, "input": {"messages": item["messages"]}, **budget}
+    if "query" in item:
+        return {"id": item_id, "index": index, "input": build_message_set(item["query"]), **budget}
+
+    raise ValueError(f"Batch item {item_id} must contain either 'query' or 'messages'")
+
+
+def item_budget(entry: Dict[str, Any], timeout: Optional[float]) -> Tuple[Optional[float], Optional[int]]:
+    """
+    Summary:
+        Returns the deadline and step budget of a normalized item.
+
+    Args:
+        entry (Dict[str, Any]): Result of `normalize_message_set`.
+        timeout (Optional[float]): Deadline used when the item sets none.
+
+    Returns:
+        Tuple[Optional[float], Optional[int]]: Seconds and maximum steps
+            (None = unlimited).
+
+    Raises:
+        ValueError: If `deadline_s` or `max_steps` is not a number.
+    """
+    seconds = entry.get("deadline_s", timeout)
+    max_steps = entry.get("max_steps", AGENT_MAX_STEPS)
+    try:
+        return (
+            float(seconds) if seconds is not None else None,
+            int(max_steps) if max_steps is not None else None,
+        )
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid deadline_s/max_steps: {seconds!r}/{max_steps!r}") from None
+
+
+def load_message_sets(path: str) -> List[Dict[str, Any]]:
+    """
+    Summary:
+        Reads batch items from a JSONL file.
+
+    Args:
+        path (str): Path to a JSONL file. Each non-empty line is a JSON
+            object such as `{"id": "q1", "query": "..."}` or a bare JSON string.
+
+    Returns:
+        List[Dict[str, Any]]: Raw batch items, ready for `normalize_message_set`.
+    """
+    items = []
+    with open(path, "r", encoding="utf-8") as handle:
+        for line_no, line in enumerate(handle, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                items.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                logger.error(f"Invalid JSON on line {line_no} of {path}: {e}")
+                raise
+    logger.info(f"Loaded {len(items)} batch items from {path}")
+    return items
+
+
+async def _run_item(
+    item: MessageSetInput,
+    index: int,
+    semaphore: asyncio.Semaphore,
+    timeout: Optional[float],
+) -> Dict[str, Any]:
+    """
+    Summary:
+        Runs a single batch item under the shared semaphore with error isolation.
+
+    Args:
+        item (MessageSetInput): Raw batch item.
+        index (int): Position of the item in the batch.
+        semaphore (asyncio.Semaphore): Shared concurrency limiter.
+        timeout (Optional[float]): Default deadline in seconds (None disables it).
+
+    Returns:
+        Dict[str, Any]: Result dictionary with status, output and timing.
+    """
+    result = {
+        "id": str(item.get("id", index)) if isinstance(item, dict) else str(index),
+        "index": index,
+        "status": "ok",
+        "output": None,
+        "error": None,
+        "elapsed_s": 0.0,
+    }
+    try:
+        if not isinstance(item, (str, dict)):
+            raise ValueError(f"Batch item {index} must be a string or an object, got {type(item).__name__}")
+        entry = normalize_message_set(item, index)
+        seconds, max_steps = item_budget(entry, timeout)
+    except ValueError as e:
+        # A malformed item fails on its own, the rest of the batch still runs
+        result["status"] = "error"
+        result["error"] = f"{type(e).__name__}: {e}"
+        logger.error(f"[BATCH {result['id']}] Invalid item: {e}")
+        return result
+
+    async with semaphore:
+        start = time.perf_counter()
+        with deadline_scope(seconds, max_steps) as deadline:
+            try:
+                with span("agent.invoke", kind="agent", batch_id=entry["id"]):
+                    response = await asyncio.wait_for(
+                        get_agent().ainvoke(entry["input"], config=callback_config(**deadline_config(max_steps))),
+                        timeout=hard_timeout(seconds),
+                    )
+                result["output"] = response["messages"][-1].content
+                if deadline.stop_reason:
+                    result["status"] = "partial"
+            except asyncio.TimeoutError:
+                result["status"] = "timeout"
+                result["error"] = f"Timed out after {seconds}s"
+                logger.warning(f"[BATCH {entry['id']}] Timed out after {seconds}s")
+            except Exception as e:
+                result["status"] = "error"
+                result["error"] = f"{type(e).__name__}: {e}"
+                logger.error(f"[BATCH {entry['id']}] Failed: {e}", exc_info=True)
+        result["elapsed_s"] = round(time.perf_counter() - start, 3)
+        result["timing"] = deadline.breakdown()
+
+    return result
+
+
+async def arun_batch(
+    items: Iterable[MessageSetInput],
+    max_concurrency: int = BATCH_MAX_CONCURRENCY,
+    timeout: Optional[float] = BATCH_ITEM_TIMEOUT,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Summary:
+        Runs batch items concurrently and yields results in completion order.
+
+    Args:
+        items (Iterable[MessageSetInput]): Queries or agent inputs to run.
+        max_concurrency (int): Maximum number of agent invocations in flight.
+        timeout (Optional[float]): Per-item timeout in seconds.
+
+    Yields:
+        Dict[str, Any]: One result per item as soon as it finishes.
+    """
+    items = list(items)
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    logger.info(
+        f"Starting batch of {len(items)} items "
+        f"(max_concurrency={max_concurrency}, timeout={timeout})"
+    )
+
+    tasks = [asyncio.create_task(_run_item(item, index, semaphore, timeout)) for index, item in enumerate(items)]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def run_batch(
+    items: Iterable[MessageSetInput],
+    max_concurrency: int = BATCH_MAX_CONCURRENCY,
+    timeout: Optional[float] = BATCH_ITEM_TIMEOUT,
+    on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Summary:
+        Synchronous entry point for `arun_batch`.
+
+    Args:
+        items (Iterable[MessageSetInput]): Queries or agent inputs to run.
+        max_concurrency (int): Maximum number of agent invocations in flight.
+        timeout (Optional[float]): Per-item timeout in seconds.
+        on_result (Optional[Callable]): Called with each result as it completes.
+
+    Returns:
+        List[Dict[str, Any]]: All results in completion order.
+    """
+
+    async def _collect() -> List[Dict[str, Any]]:
+        collected = []
+        async for result in arun_batch(items, max_concurrency, timeout):
+            if on_result is not None:
+                on_result(result)
+            collected.append(result)
+        return collected
+
+    start = time.perf_counter()
+    results = asyncio.run(_collect())
+    failed = sum(1 for r in results if r["status"] != "ok")
+    logger.info(
+        f"Batch finished: {len(results)} items, {failed} failed, "
+        f"{time.perf_counter() - start:.2f}s total"
+    )
+    return results
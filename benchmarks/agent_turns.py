@@ -0,0 +1,302 @@
+"""
+Agent Turn Benchmark
+
+Summary:
+This benchmark measures end-to-end agent turns offline by driving the agent
+from agent.py with the scripted fake chat model and fake SerpAPI client
+from fakes.py.
+
+Description:
+- Replays the example workloads from prompt.py ("search" = example_1_query,
+  "testgen" = example_2_query, "terminal" = example_3_query). Each one is
+  scripted as a tool call followed by a final answer, so every turn goes
+  through the full agent loop and the real tool implementations.
+- Injected latencies per model call and per search call stand in for
+  Gemini and SerpAPI round trips.
+- Turns run concurrently through `agent.ainvoke`, limited by `--concurrency`.
+- Reports turn latency percentiles (p50/p95/p99), throughput, tool-call
+  counts, errors and peak RSS as one JSON document, overall and per workload.
+- The search cache is disabled unless `--with-cache` is given, so repeated
+  queries keep paying the injected search latency and runs stay comparable.
+
+Usage (from the repository root):
+    python -m benchmarks.agent_turns --turns 300 --concurrency 16 \\
+        --model-latency 0.05 --search-latency 0.1 --output bench.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import AIMessage, ToolMessage
+
+from logger_config import redirect_console_logging, set_console_level, setup_logger
+
+# Initialize logger for this module
+logger = setup_logger(__name__)
+
+
+def build_workloads() -> Dict[str, Dict[str, Any]]:
+    """
+    Summary:
+        Builds the benchmark workloads from the example queries in prompt.py.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Workload name -> `query` (HumanMessage text)
+            and `script` (fake model replies for that conversation).
+    """
+    from prompt import example_1_query, example_2_query, example_3_query
+
+    function_code = example_2_query.text.split("function:", 1)[-1].split("Include", 1)[0].strip()
+    return {
+        "search": {
+            "query": example_1_query.text,
+            "script": [
+                AIMessage(content="", tool_calls=[{
+                    "name": "web_search_tool",
+                    "args": {"query": "Python exception handling and error logging best practices", "num_results": 5},
+                    "id": "call_search",
+                }]),
+                AIMessage(content="Use specific exception types, log with exc_info and re-raise when needed."),
+            ],
+        },
+        "testgen": {
+            "query": example_2_query.text,
+            "script": [
+                AIMessage(content="", tool_calls=[{
+                    "name": "generate_test_cases",
+                    "args": {"function_code": function_code, "test_framework": "pytest", "num_test_cases": 3},
+                    "id": "call_testgen",
+                }]),
+                AIMessage(content="def test_calculate_discount_valid():\n    assert calculate_discount(100, 10) == 90"),
+            ],
+        },
+        "terminal": {
+            "query": example_3_query.text,
+            "script": [
+                AIMessage(content="", tool_calls=[{
+                    "name": "execute_terminal_command",
+                    "args": {"commands": [f"{sys.executable} --version", f"{sys.executable} -m pip list"]},
+                    "id": "call_terminal",
+                }]),
+                AIMessage(content="Python version and installed packages listed above."),
+            ],
+        },
+    }
+
+
+def percentile(values: Sequence[float], pct: float) -> Optional[float]:
+    """
+    Summary:
+        Nearest-rank percentile of a list of values.
+
+    Args:
+        values (Sequence[float]): Samples.
+        pct (float): Percentile between 0 and 100.
+
+    Returns:
+        Optional[float]: The percentile, or None for an empty list.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100 * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def peak_rss_mb() -> float:
+    """
+    Summary:
+        Peak resident set size of this process in MiB.
+
+    Returns:
+        float: Peak RSS (ru_maxrss is KiB on Linux and bytes on macOS).
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak /= 1024
+    return round(peak / 1024, 1)
+
+
+def summarize(samples: List[Dict[str, Any]], wall_s: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Summary:
+        Aggregates per-turn samples into latency and tool-call statistics.
+
+    Args:
+        samples (List[Dict[str, Any]]): Turn samples from `run_turn`.
+        wall_s (Optional[float]): Wall time of the run, for throughput.
+
+    Returns:
+        Dict[str, Any]: Summary statistics.
+    """
+    latencies = [s["latency_ms"] for s in samples if s["status"] == "ok"]
+    tools = Counter()
+    for s in samples:
+        tools.update(s["tool_calls"])
+
+    summary = {
+        "turns": len(samples),
+        "errors": sum(1 for s in samples if s["status"] != "ok"),
+        "latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "mean": round(sum(latencies) / len(latencies), 3) if latencies else None,
+            "max": max(latencies) if latencies else None,
+        },
+        "tool_calls": {"total": sum(tools.values()), "by_tool": dict(tools)},
+    }
+    if wall_s is not None:
+        summary["wall_s"] = round(wall_s, 3)
+        summary["throughput_turns_per_s"] = round(len(samples) / wall_s, 2) if wall_s else None
+    return summary
+
+
+async def run_turn(agent, name: str, workload: Dict[str, Any], semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+    """
+    Summary:
+        Runs one agent turn and records its latency and tool calls.
+
+    Args:
+        agent: Compiled agent graph.
+        name (str): Workload name.
+        workload (Dict[str, Any]): Workload definition.
+        semaphore (asyncio.Semaphore): Concurrency limiter.
+
+    Returns:
+        Dict[str, Any]: Turn sample with workload, status, latency_ms and tool_calls.
+    """
+    from batch import build_message_set
+
+    sample = {"workload": name, "status": "ok", "latency_ms": None, "tool_calls": []}
+    async with semaphore:
+        start = time.perf_counter()
+        try:
+            response = await agent.ainvoke(build_message_set(workload["query"]))
+            sample["tool_calls"] = [m.name for m in response["messages"] if isinstance(m, ToolMessage)]
+        except Exception as e:
+            sample["status"] = "error"
+            sample["error"] = f"{type(e).__name__}: {e}"
+            logger.error(f"[BENCH] {name} turn failed: {e}", exc_info=True)
+        sample["latency_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    return sample
+
+
+async def run_benchmark(
+    workload_names: Sequence[str],
+    turns: int,
+    concurrency: int,
+    model_latency: float,
+    search_latency: float,
+    warmup: int = 3,
+    with_cache: bool = False,
+) -> Dict[str, Any]:
+    """
+    Summary:
+        Replays the selected workloads round-robin and reports statistics.
+
+    Args:
+        workload_names (Sequence[str]): Workloads to replay.
+        turns (int): Number of measured turns.
+        concurrency (int): Maximum turns in flight.
+        model_latency (float): Injected latency per model call, in seconds.
+        search_latency (float): Injected latency per search call, in seconds.
+        warmup (int): Unmeasured turns run first (agent build, imports, caches).
+        with_cache (bool): Keep the web search cache enabled.
+
+    Returns:
+        Dict[str, Any]: Benchmark report.
+    """
+    import tools
+    from agent import get_agent, reset_agent
+    from client import set_model, set_search_client
+    from fakes import FakeChatModel, FakeSearchClient
+
+    workloads = build_workloads()
+    unknown = [n for n in workload_names if n not in workloads]
+    if unknown:
+        raise ValueError(f"Unknown workloads {unknown}; choose from {sorted(workloads)}")
+
+    search_client = FakeSearchClient(latency=search_latency)
+    set_model(FakeChatModel(
+        scripts={workloads[n]["query"]: workloads[n]["script"] for n in workload_names},
+        latency=model_latency,
+    ))
+    set_search_client(search_client)
+    if not with_cache:
+        tools.search_cache = None
+    reset_agent()
+    agent = get_agent()
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    schedule = [workload_names[i % len(workload_names)] for i in range(turns)]
+
+    for name in schedule[:warmup]:
+        await run_turn(agent, name, workloads[name], semaphore)
+
+    start = time.perf_counter()
+    samples = await asyncio.gather(*(run_turn(agent, n, workloads[n], semaphore) for n in schedule))
+    wall_s = time.perf_counter() - start
+
+    report = {
+        "benchmark": "agent_turns",
+        "config": {
+            "workloads": list(workload_names),
+            "turns": turns,
+            "concurrency": concurrency,
+            "model_latency_s": model_latency,
+            "search_latency_s": search_latency,
+            "warmup": warmup,
+            "search_cache": with_cache,
+        },
+        **summarize(samples, wall_s),
+        "per_workload": {n: summarize([s for s in samples if s["workload"] == n]) for n in workload_names},
+        "search_calls": search_client.call_count,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    return report
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline agent turn benchmark")
+    parser.add_argument("--workloads", nargs="+", default=["search", "testgen", "terminal"],
+                        help="Workloads to replay round-robin")
+    parser.add_argument("--turns", type=int, default=60, help="Number of measured turns")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum turns in flight")
+    parser.add_argument("--model-latency", type=float, default=0.05, help="Seconds per fake model call")
+    parser.add_argument("--search-latency", type=float, default=0.1, help="Seconds per fake search call")
+    parser.add_argument("--warmup", type=int, default=3, help="Unmeasured warm-up turns")
+    parser.add_argument("--with-cache", action="store_true", help="Keep the web search cache enabled")
+    parser.add_argument("--output", metavar="FILE", help="Write the JSON report to FILE instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    redirect_console_logging(sys.stderr)
+    set_console_level("WARNING")
+
+    report = asyncio.run(run_benchmark(
+        args.workloads, args.turns, args.concurrency,
+        args.model_latency, args.search_latency, args.warmup, args.with_cache,
+    ))
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(payload + "\n")
+    else:
+        print(payload)
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
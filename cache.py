@@ -0,0 +1,255 @@
+"""
+Tiered Result Cache Module
+
+Summary:
+This module provides a small two-tier cache used to avoid repeating
+expensive external calls (web searches, model calls, terminal probes).
+
+Description:
+- Memory tier: a bounded LRU dictionary guarded by a lock so it can be
+  shared by threads in the agent's tool executor.
+- Disk tier: an optional SQLite table that survives process restarts.
+  Entries are namespaced so several caches can share one database file,
+  and the file runs in WAL mode with a busy timeout so several processes
+  (sharding.py workers) can share it.
+- Every entry carries an absolute expiry timestamp derived from a
+  configurable TTL; expired entries are treated as misses and removed.
+- Hit/miss counters are kept per cache instance for observability.
+
+Values must be JSON-serializable. Keys are produced by `make_cache_key`,
+which hashes the normalized inputs so arbitrary content can be used.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from config import CACHE_SQLITE_BUSY_TIMEOUT
+from logger_config import setup_logger
+
+# Initialize logger for this module
+logger = setup_logger(__name__)
+
+
+def make_cache_key(*parts: Any) -> str:
+    """
+    Summary:
+        Builds a content-addressed cache key from arbitrary JSON-like parts.
+
+    Args:
+        *parts (Any): Values that together identify a cached result.
+
+    Returns:
+        str: Hex SHA-256 digest of the canonical JSON encoding of `parts`.
+    """
+    payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TieredCache:
+    """
+    Summary:
+        Memory LRU cache backed by an optional SQLite store, with TTL expiry.
+
+    Args:
+        namespace (str): Logical cache name, used to partition the disk table.
+        db_path (Optional[str]): SQLite file for the disk tier (None disables it).
+        ttl (float): Time-to-live for new entries, in seconds.
+        max_entries (int): Maximum number of entries kept in the memory tier.
+        max_disk_entries (Optional[int]): Maximum entries kept on disk for this
+            namespace; least recently used entries are pruned beyond it.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        db_path: Optional[str] = None,
+        ttl: float = 3600,
+        max_entries: int = 256,
+        max_disk_entries: Optional[int] = None,
+    ):
+        self.namespace = namespace
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    # ------------------------------------------------------------------ disk tier
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        """Opens the SQLite store on first use (must be called with the lock held)."""
+        if self.db_path is None:
+            return None
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=CACHE_SQLITE_BUSY_TIMEOUT)
+            # WAL lets processes sharing the file (sharding.py) read while one writes
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                " namespace TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " last_access REAL NOT NULL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+            self._conn.commit()
+            logger.debug("Opened disk cache '%s' at %s", self.namespace, self.db_path)
+        return self._conn
+
+    def _disk_get(self, key: str, now: float) -> Optional[tuple]:
+        conn = self._connection()
+        if conn is None:
+            return None
+        row = conn.execute(
+            "SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+            (self.namespace, key),
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at <= now:
+            conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            )
+            conn.commit()
+            return None
+        conn.execute(
+            "UPDATE cache_entries SET last_access = ? WHERE namespace = ? AND key = ?",
+            (now, self.namespace, key),
+        )
+        conn.commit()
+        return expires_at, json.loads(value)
+
+    def _disk_set(self, key: str, value: Any, expires_at: float, now: float) -> None:
+        conn = self._connection()
+        if conn is None:
+            return
+        conn.execute(
+            "INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at, last_access)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (self.namespace, key, json.dumps(value, ensure_ascii=False), expires_at, now),
+        )
+        conn.execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND expires_at <= ?",
+            (self.namespace, now),
+        )
+        if self.max_disk_entries is not None:
+            conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key NOT IN ("
+                " SELECT key FROM cache_entries WHERE namespace = ?"
+                " ORDER BY last_access DESC LIMIT ?)",
+                (self.namespace, self.namespace, self.max_disk_entries),
+            )
+        conn.commit()
+
+    # ---------------------------------------------------------------- public API
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Summary:
+            Looks up a key in memory, then on disk.
+
+        Args:
+            key (str): Cache key (see `make_cache_key`).
+
+        Returns:
+            Optional[Any]: Cached value, or None on a miss or expired entry.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._memory[key]
+
+            try:
+                entry = self._disk_get(key, now)
+            except sqlite3.Error as e:
+                logger.warning(f"Disk cache '{self.namespace}' read failed: {e}")
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._remember(key, entry)
+            self.hits += 1
+            self.disk_hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Summary:
+            Stores a value in both tiers.
+
+        Args:
+            key (str): Cache key (see `make_cache_key`).
+            value (Any): JSON-serializable value.
+            ttl (Optional[float]): Override of the instance TTL, in seconds.
+        """
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._remember(key, (expires_at, value))
+            try:
+                self._disk_set(key, value, expires_at, now)
+            except sqlite3.Error as e:
+                logger.warning(f"Disk cache '{self.namespace}' write failed: {e}")
+
+    def _remember(self, key: str, entry: tuple) -> None:
+        """Inserts into the memory tier and evicts the least recently used entries."""
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self) -> None:
+        """Removes every entry of this namespace from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            conn = self._connection()
+            if conn is not None:
+                conn.execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+                conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Summary:
+            Reports hit/miss counters for this cache.
+
+        Returns:
+            Dict[str, Any]: Counters plus the current memory tier size.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "namespace": self.namespace,
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+            }
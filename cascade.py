@@ -0,0 +1,283 @@
+"""
+Model Cascade Module
+
+Summary:
+This module routes every model call to the cheapest Gemini tier that can
+handle it, and escalates to a larger tier when the answer is unusable.
+
+Description:
+- `MODEL_TIERS` lists the tiers from fastest and cheapest to strongest,
+  each with a model name, an output token cap and optionally the largest
+  request (estimated prompt tokens) it is routed. Tool selection and short
+  answers stay on the first tier; long conversations start further up.
+- A response is escalated to the next tier when it was cut off at the
+  output cap (finish reason `MAX_TOKENS`, e.g. the test code of
+  example_2_query at `MAX_TOKEN`), when Gemini reports a malformed function
+  call, or when a tool call names an unknown tool or fails validation
+  against the tool's argument schema. The response of the last tier is
+  returned as it is.
+- Tiers resolving to the same model instance (e.g. a model installed with
+  `client.set_model()`) are tried once, and no escalation starts once the
+  request deadline has passed.
+- Per-tier latency is recorded in `agent_model_tier_duration_seconds`,
+  outcomes in `agent_model_tier_calls_total` and escalations with their
+  reason in `agent_model_escalations_total`.
+- `CascadeMiddleware` applies the cascade inside the agent loop;
+  `invoke_cascade()` does the same for direct model calls. Inside the
+  loop, every escalation is announced on the graph's "custom" stream
+  mode, so streaming callers can discard the tokens the escalated tier
+  already streamed (see streaming.py).
+"""
+
+import time
+from typing import Any, Callable, Iterator, List, Optional, Sequence, Tuple
+
+from langchain.agents.middleware import AgentMiddleware
+from langchain_core.messages import AIMessage
+
+from config import MODEL_TIERS
+from deadline import current_deadline
+from logger_config import setup_logger
+from metrics import registry
+from ratelimit import estimate_request_tokens
+
+# Initialize logger for this module
+logger = setup_logger(__name__)
+
+_TRUNCATED = ("MAX_TOKENS", "length")
+_MALFORMED = ("MALFORMED_FUNCTION_CALL", "UNEXPECTED_TOOL_CALL")
+
+
+def route(messages: Sequence[Any]) -> int:
+    """
+    Summary:
+        Picks the first tier for a request by its size.
+
+    Args:
+        messages (Sequence[Any]): Request messages.
+
+    Returns:
+        int: Index into `MODEL_TIERS` of the cheapest tier that fits.
+    """
+    tokens = estimate_request_tokens(messages)
+    for index, tier in enumerate(MODEL_TIERS):
+        limit = tier.get("max_input_tokens")
+        if limit is None or tokens <= limit:
+            return index
+    return len(MODEL_TIERS) - 1
+
+
+def _tiers(start: int) -> Iterator[Tuple[str, Any]]:
+    # Yields (tier name, model) from `start` on, skipping models already tried
+    from client import get_model
+
+    seen = set()
+    for tier in MODEL_TIERS[start:]:
+        model = get_model(tier["name"])
+        if id(model) not in seen:
+            seen.add(id(model))
+            yield tier["name"], model
+
+
+def _ai_message(response: Any) -> Optional[AIMessage]:
+    # Handlers return an AIMessage or a ModelResponse with it last
+    if isinstance(response, AIMessage):
+        return response
+    result = getattr(response, "result", None) or []
+    return next((m for m in reversed(result) if isinstance(m, AIMessage)), None)
+
+
+def escalation_reason(message: Optional[AIMessage], tools: Sequence[Any] = ()) -> Optional[str]:
+    """
+    Summary:
+        Returns why a model response should be retried on a larger tier.
+
+    Args:
+        message (Optional[AIMessage]): The model's response.
+        tools (Sequence[Any]): Tools bound to the request.
+
+    Returns:
+        Optional[str]: "truncated", "malformed_tool_call", "unknown_tool",
+            "invalid_tool_args", or None if the response is usable.
+    """
+    if message is None:
+        return None
+    finish_reason = message.response_metadata.get("finish_reason")
+    if finish_reason in _TRUNCATED:
+        return "truncated"
+    if finish_reason in _MALFORMED or message.invalid_tool_calls:
+        return "malformed_tool_call"
+
+    schemas = {tool.name: tool for tool in tools if hasattr(tool, "name")}
+    for call in message.tool_calls:
+        tool = schemas.get(call["name"])
+        if tool is None:
+            # Provider-side tools are passed as dicts and cannot be checked
+            if len(schemas) == len(tools):
+                return "unknown_tool"
+            continue
+        try:
+            tool.tool_call_schema.model_validate(call["args"])
+        except Exception:
+            return "invalid_tool_args"
+    return None
+
+
+def _record(tier: str, seconds: float, outcome: str) -> None:
+    registry.histogram("agent_model_tier_duration_seconds", "Model call latency per cascade tier").observe(
+        seconds, tier=tier
+    )
+    registry.counter("agent_model_tier_calls_total", "Model calls per cascade tier and outcome").inc(
+        tier=tier, outcome=outcome
+    )
+
+
+def _escalate(tier: str, reason: str) -> bool:
+    """
+    Summary:
+        Decides whether to move past `tier` and records the escalation.
+
+    Args:
+        tier (str): Tier whose response was unusable.
+        reason (str): Result of `escalation_reason`.
+
+    Returns:
+        bool: False once the request deadline has passed.
+    """
+    deadline = current_deadline()
+    if deadline is not None and deadline.remaining() == 0:
+        logger.warning(f"Not escalating from model tier {tier!r} ({reason}): deadline reached")
+        return False
+    registry.counter("agent_model_escalations_total", "Model calls escalated to a larger tier").inc(
+        tier=tier, reason=reason
+    )
+    logger.info(f"Escalating model call from tier {tier!r}: {reason}")
+    return True
+
+
+def _announce(tier: str, reason: str) -> None:
+    # Tells streaming callers that the tokens streamed by `tier` are void
+    from langgraph.config import get_stream_writer
+
+    get_stream_writer()({"cascade": "escalated", "tier": tier, "reason": reason})
+
+
+def _attempts(messages: Sequence[Any]) -> Iterator[Tuple[str, Any, bool]]:
+    # Yields (tier name, model, is last tier) for the tiers a request may use
+    tiers = list(_tiers(route(messages)))
+    for position, (tier, model) in enumerate(tiers):
+        yield tier, model, position == len(tiers) - 1
+
+
+def _settle(
+    tier: str,
+    start: float,
+    response: Any,
+    tools: Sequence[Any],
+    last: bool,
+    on_escalate: Optional[Callable[[str, str], None]],
+) -> bool:
+    """
+    Summary:
+        Records a tier's response and decides whether it is the answer.
+
+    Args:
+        tier (str): Tier that produced the response.
+        start (float): `time.perf_counter()` at the start of the call.
+        response (Any): The tier's response.
+        tools (Sequence[Any]): Tools bound to the request, for validation.
+        last (bool): Whether no larger tier is left.
+        on_escalate (Optional[Callable[[str, str], None]]): Called with the
+            tier and reason when the response is discarded.
+
+    Returns:
+        bool: True to return the response, False to try the next tier.
+    """
+    reason = escalation_reason(_ai_message(response), tools)
+    if reason is None or last or not _escalate(tier, reason):
+        _record(tier, time.perf_counter() - start, "ok" if reason is None else "exhausted")
+        if reason is not None:
+            logger.warning(f"Returning unusable response of model tier {tier!r}: {reason}")
+        return True
+    _record(tier, time.perf_counter() - start, "escalated")
+    if on_escalate is not None:
+        on_escalate(tier, reason)
+    return False
+
+
+def _run(
+    messages: Sequence[Any],
+    tools: Sequence[Any],
+    call: Callable[[Any], Any],
+    on_escalate: Optional[Callable[[str, str], None]] = None,
+) -> Any:
+    """
+    Summary:
+        Runs `call(model)` on each tier until a response is usable.
+
+    Args:
+        messages (Sequence[Any]): Request messages, for routing.
+        tools (Sequence[Any]): Tools bound to the request, for validation.
+        call (Callable[[Any], Any]): Performs the model call with a tier's model.
+        on_escalate (Optional[Callable[[str, str], None]]): Called with the
+            tier and reason whenever a response is discarded.
+
+    Returns:
+        Any: Response of the first usable tier, or of the last tier tried.
+    """
+    for tier, model, last in _attempts(messages):
+        start = time.perf_counter()
+        try:
+            response = call(model)
+        except Exception:
+            _record(tier, time.perf_counter() - start, "error")
+            raise
+        if _settle(tier, start, response, tools, last, on_escalate):
+            return response
+
+
+async def _arun(
+    messages: Sequence[Any],
+    tools: Sequence[Any],
+    call: Callable[[Any], Any],
+    on_escalate: Optional[Callable[[str, str], None]] = None,
+) -> Any:
+    # Async variant of `_run`; `call` returns an awaitable
+    for tier, model, last in _attempts(messages):
+        start = time.perf_counter()
+        try:
+            response = await call(model)
+        except Exception:
+            _record(tier, time.perf_counter() - start, "error")
+            raise
+        if _settle(tier, start, response, tools, last, on_escalate):
+            return response
+
+
+def invoke_cascade(messages: List[Any]) -> AIMessage:
+    """
+    Summary:
+        Calls the model cascade directly, outside the agent loop.
+
+    Args:
+        messages (List[Any]): Input messages.
+
+    Returns:
+        AIMessage: Response of the first tier with a complete answer.
+    """
+    return _run(messages, (), lambda model: model.invoke(messages))
+
+
+class CascadeMiddleware(AgentMiddleware):
+    """
+    Summary:
+        Agent middleware that routes model calls across `MODEL_TIERS`.
+    """
+
+    def wrap_model_call(self, request: Any, handler: Callable) -> Any:
+        return _run(request.messages, request.tools, lambda model: handler(request.override(model=model)), _announce)
+
+    async def awrap_model_call(self, request: Any, handler: Callable) -> Any:
+        return await _arun(
+            request.messages, request.tools, lambda model: handler(request.override(model=model)), _announce
+        )
@@ -0,0 +1,353 @@
+"""
+Record/Replay Cassette Module
+
+Summary:
+This module records the agent's Gemini and SerpAPI traffic into a cassette
+file and replays it offline, so end-to-end runs are reproducible in
+seconds without API keys or network access.
+
+Description:
+- `Cassette` stores one record per exchange in a gzip-compressed JSON lines
+  file (compact separators, responses serialized with LangChain's `dumpd`).
+  On load the records are indexed by request hash; identical requests are
+  answered in the order they were recorded (the last answer repeats once
+  they are used up).
+- `CassetteChatModel` wraps the chat model. In record mode it calls the
+  wrapped model and stores the response with its wall time; in replay mode
+  it needs no wrapped model at all. Requests are matched on the model name,
+  the bound tools and call options, and the conversation: message types,
+  text and tool calls. Tool results are matched by tool name only, because
+  terminal output (wall times, temp file paths) differs between runs.
+- `CassetteSearchClient` does the same for `search` / `asearch`, matching
+  on the request parameters without the API key.
+- Replay serves responses with zero latency or the recorded latency
+  (`CASSETTE_LATENCY`), and raises `CassetteMiss` on any request that is
+  not in the cassette instead of falling through to a live backend.
+- `use_cassette()` installs both wrappers through `client.set_model()` /
+  `client.set_search_client()`. The web search result cache is switched
+  off while a cassette is in use, so every search reaches the cassette.
+
+Run `python main.py --record FILE` once against the live services, then
+`python main.py --replay FILE` (optionally `--replay-latency original`).
+"""
+
+import asyncio
+import atexit
+import gzip
+import json
+import os
+import threading
+import time
+import warnings
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.load import dumpd, load
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from cache import make_cache_key
+from config import MODEL_ID, CASSETTE_LATENCY
+from logger_config import setup_logger
+
+# Initialize logger for this module
+logger = setup_logger(__name__)
+
+# `langchain_core.load.load` emits a beta warning on every call
+warnings.filterwarnings("ignore", message=r"The function `load` is in beta")
+
+CASSETTE_FORMAT = 1
+
+
+class CassetteMiss(LookupError):
+    """Raised in replay mode for a request that was not recorded."""
+
+
+class Cassette:
+    """
+    Summary:
+        Recorded exchanges of one cassette file.
+
+    Args:
+        path (str): Cassette file (gzip-compressed JSON lines).
+        mode (str): "record" (start a new recording) or "replay".
+        latency (str): Replay latency, "zero" or "original".
+    """
+
+    def __init__(self, path: str, mode: str, latency: str = CASSETTE_LATENCY):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode!r}")
+        if latency not in ("zero", "original"):
+            raise ValueError(f"Unknown cassette latency: {latency!r}")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self._index: Dict[str, List[Dict[str, Any]]] = {}
+        self._served: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._file = None
+        self.hits = self.misses = self.recorded = 0
+
+        if mode == "replay":
+            self._load()
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._file = gzip.open(path, "wt", encoding="utf-8")
+            self._write({"cassette": CASSETTE_FORMAT, "model": MODEL_ID,
+                         "created": datetime.now(timezone.utc).isoformat()})
+            logger.info(f"Recording cassette to {path}")
+
+    def _load(self) -> None:
+        try:
+            with gzip.open(self.path, "rt", encoding="utf-8") as handle:
+                header = json.loads(handle.readline())
+                if header.get("cassette") != CASSETTE_FORMAT:
+                    raise ValueError(f"Unsupported cassette format: {header.get('cassette')!r}")
+                for line in handle:
+                    record = json.loads(line)
+                    self._index.setdefault(record["key"], []).append(record)
+        except Exception as e:
+            logger.error(f"Failed to load cassette {self.path}: {str(e)}", exc_info=True)
+            raise
+        logger.info(
+            f"Replaying cassette {self.path} ({sum(map(len, self._index.values()))} exchanges, "
+            f"latency={self.latency})"
+        )
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        self._file.write(json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n")
+        # Sync-flush so a crashed recording keeps everything written so far
+        self._file.flush()
+
+    def lookup(self, kind: str, key: str, description: str) -> Dict[str, Any]:
+        """
+        Summary:
+            Returns the next recorded exchange for a request.
+
+        Args:
+            kind (str): "llm" or "search".
+            key (str): Request hash.
+            description (str): Short request description for the miss error.
+
+        Returns:
+            Dict[str, Any]: The record (`response`, `latency`).
+
+        Raises:
+            CassetteMiss: If the request was never recorded.
+        """
+        with self._lock:
+            records = self._index.get(key)
+            if not records:
+                self.misses += 1
+                raise CassetteMiss(f"No recorded {kind} response in {self.path} for {description}")
+            served = self._served.get(key, 0)
+            self._served[key] = served + 1
+            self.hits += 1
+            return records[min(served, len(records) - 1)]
+
+    def record(self, kind: str, key: str, response: Any, latency: float) -> None:
+        """
+        Summary:
+            Appends an exchange to the cassette file.
+
+        Args:
+            kind (str): "llm" or "search".
+            key (str): Request hash.
+            response (Any): JSON-serializable response.
+            latency (float): Wall time of the live call, in seconds.
+        """
+        with self._lock:
+            self._write({"kind": kind, "key": key, "latency": round(latency, 4), "response": response})
+            self.recorded += 1
+
+    def delay(self, record: Dict[str, Any]) -> float:
+        """Returns the replay delay for a record."""
+        return record["latency"] if self.latency == "original" else 0.0
+
+    def close(self) -> None:
+        """Finishes the recording (no-op in replay mode)."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                logger.info(f"Cassette {self.path} closed ({self.recorded} exchanges recorded)")
+            elif self.mode == "replay":
+                logger.info(f"Cassette {self.path} replayed {self.hits} exchanges ({self.misses} misses)")
+
+
+def _message_key(message: BaseMessage) -> Dict[str, Any]:
+    # Stable view of a message: no ids, no tool output (see module docstring)
+    if message.type == "tool":
+        return {"type": "tool", "name": message.name}
+    key = {"type": message.type, "content": message.content}
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        key["tool_calls"] = [{"name": call["name"], "args": call["args"]} for call in tool_calls]
+    return key
+
+
+class CassetteChatModel(BaseChatModel):
+    """
+    Summary:
+        Chat model that records or replays another model's responses.
+
+    Args:
+        cassette (Cassette): Cassette to record to or replay from.
+        inner (Optional[BaseChatModel]): Live model (record mode only).
+        model_name (str): Model name that is part of every request key.
+    """
+
+    cassette: Any
+    inner: Optional[BaseChatModel] = None
+    model_name: str = MODEL_ID
+
+    @property
+    def _llm_type(self) -> str:
+        # Recording keeps the live model's type; the live model applies its own rate limits
+        return self.inner._llm_type if self.inner is not None else "cassette-replay"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def _key(self, messages: List[BaseMessage], stop: Optional[List[str]], kwargs: Dict[str, Any]) -> str:
+        return make_cache_key("llm", self.model_name, stop, kwargs, [_message_key(m) for m in messages])
+
+    def _describe(self, messages: List[BaseMessage]) -> str:
+        last = messages[-1] if messages else None
+        text = last.text[:80] if last is not None else ""
+        return f"a model call with {len(messages)} messages (last {last.type if last else None}: {text!r})"
+
+    def _replayed(self, messages, stop, kwargs) -> tuple:
+        record = self.cassette.lookup("llm", self._key(messages, stop, kwargs), self._describe(messages))
+        generations = load(record["response"], allowed_objects="core")
+        return ChatResult(generations=generations), self.cassette.delay(record)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.cassette.mode == "replay":
+            result, delay = self._replayed(messages, stop, kwargs)
+            if delay:
+                time.sleep(delay)
+            return result
+        start = time.perf_counter()
+        result = self.inner._generate(messages, stop=stop, **kwargs)
+        self.cassette.record("llm", self._key(messages, stop, kwargs), dumpd(result.generations), time.perf_counter() - start)
+        return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.cassette.mode == "replay":
+            result, delay = self._replayed(messages, stop, kwargs)
+            if delay:
+                await asyncio.sleep(delay)
+            return result
+        start = time.perf_counter()
+        result = await self.inner._agenerate(messages, stop=stop, **kwargs)
+        self.cassette.record("llm", self._key(messages, stop, kwargs), dumpd(result.generations), time.perf_counter() - start)
+        return result
+
+
+class CassetteSearchClient:
+    """
+    Summary:
+        Search client that records or replays another client's results.
+
+    Args:
+        cassette (Cassette): Cassette to record to or replay from.
+        inner (Any): Live search client (record mode only).
+    """
+
+    def __init__(self, cassette: Cassette, inner: Any = None):
+        self.cassette = cassette
+        self.inner = inner
+
+    @staticmethod
+    def _params(params: Optional[Dict[str, Any]], kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        params = dict(params or {})
+        params.update(kwargs)
+        params.pop("api_key", None)
+        return params
+
+    def _replayed(self, params: Dict[str, Any]) -> tuple:
+        record = self.cassette.lookup("search", make_cache_key("search", params), f"a search with {params!r}")
+        return record["response"], self.cassette.delay(record)
+
+    def search(self, params: Optional[Dict[str, Any]] = None, **kwargs) -> Dict[str, Any]:
+        """
+        Summary:
+            Records or replays one search request.
+
+        Args:
+            params (Optional[Dict[str, Any]]): SerpAPI request parameters.
+            **kwargs: Extra parameters merged into `params`.
+
+        Returns:
+            Dict[str, Any]: SerpAPI response.
+        """
+        params = self._params(params, kwargs)
+        if self.cassette.mode == "replay":
+            response, delay = self._replayed(params)
+            if delay:
+                time.sleep(delay)
+            return response
+        start = time.perf_counter()
+        response = self.inner.search(params)
+        self.cassette.record("search", make_cache_key("search", params), response, time.perf_counter() - start)
+        return response
+
+    async def asearch(self, params: Optional[Dict[str, Any]] = None, **kwargs) -> Dict[str, Any]:
+        """
+        Summary:
+            Async variant of `search`.
+
+        Args:
+            params (Optional[Dict[str, Any]]): SerpAPI request parameters.
+            **kwargs: Extra parameters merged into `params`.
+
+        Returns:
+            Dict[str, Any]: SerpAPI response.
+        """
+        params = self._params(params, kwargs)
+        if self.cassette.mode == "replay":
+            response, delay = self._replayed(params)
+            if delay:
+                await asyncio.sleep(delay)
+            return response
+        start = time.perf_counter()
+        if hasattr(self.inner, "asearch"):
+            response = await self.inner.asearch(params)
+        else:
+            response = await asyncio.to_thread(self.inner.search, params)
+        self.cassette.record("search", make_cache_key("search", params), response, time.perf_counter() - start)
+        return response
+
+
+def use_cassette(mode: str, path: str, latency: str = CASSETTE_LATENCY) -> Cassette:
+    """
+    Summary:
+        Routes the agent's model and search traffic through a cassette.
+
+    Args:
+        mode (str): "record" or "replay".
+        path (str): Cassette file.
+        latency (str): Replay latency, "zero" or "original".
+
+    Returns:
+        Cassette: The opened cassette (closed automatically at exit).
+    """
+    import tools
+    from agent import reset_agent
+    from client import get_model, get_search_client, set_model, set_search_client
+
+    cassette = Cassette(path, mode, latency)
+    atexit.register(cassette.close)
+    if mode == "record":
+        set_model(CassetteChatModel(cassette=cassette, inner=get_model()))
+        set_search_client(CassetteSearchClient(cassette, get_search_client()))
+    else:
+        set_model(CassetteChatModel(cassette=cassette))
+        set_search_client(CassetteSearchClient(cassette))
+    # Cached searches would never reach the cassette
+    tools.search_cache = None
+    reset_agent()
+    return cassette
@@ -8,46 +8,199 @@ by the application, including the Gemini chat model and the SerpAPI client.
 Description:
 - Creates a ChatGoogleGenerativeAI instance using the Gemini 2.5 Flash Lite
   model with controlled generation parameters for deterministic responses.
-- Initializes a SerpAPI client for performing web search operations.
+- Initializes a SerpAPI client for performing web search operations
+  (`search_client.SerpApiHttpClient`: pooled keep-alive connections, sync
+  and async entry points, retries with backoff, throttled by the shared
+  `"serpapi"` limiter from ratelimit.py).
+- Clients are built lazily on first use by memoized factories
+  (`get_model()`, `get_search_client()`); the heavy `langchain_google_genai`
+  and HTTP client imports are deferred until then, keeping imports cheap.
+- `get_model(tier)` returns the model of a `MODEL_TIERS` entry (model
+  name and output cap), used by the model cascade in cascade.py.
+- Optionally attaches the LLM response cache from llm_cache.py
+  (`LLM_CACHE_ENABLED` in config.py).
+- `set_model()` / `set_search_client()` swap in other backends, such as
+  the offline stand-ins from fakes.py, for tests and local serving.
 - Uses centralized logging to track successful initialization and capture
   detailed error information during failures.
 - Ensures failures are surfaced by re-raising exceptions after logging.
 
-All API credentials are securely loaded from the `cred` module.
+All API credentials are securely loaded from the `cred` module. The
+module attributes `model` and `client` remain available and resolve to
+the memoized instances.
 """
-import serpapi
-from langchain_google_genai import ChatGoogleGenerativeAI
+import threading
+from typing import Optional
 
-from cred import gemini_api_key, serpapi_api_key
+from cred import get_gemini_api_key, get_serpapi_api_key
 from config import *
 from logger_config import setup_logger
 
 # Initialize logger for this module
 logger = setup_logger(__name__)
 
-logger.info("Initializing Gemini chat model client")
+_model = None
+_model_overridden = False
+_tier_models = {}
+_search_client = None
+_init_lock = threading.Lock()
 
-try:
-    model = ChatGoogleGenerativeAI(
-        model=MODEL_ID,
-        api_key=gemini_api_key,
+
+def _build_model(model_id: str, max_output_tokens: int):
+    """
+    Summary:
+        Creates a Gemini chat model with the shared generation settings.
+
+    Args:
+        model_id (str): Gemini model name.
+        max_output_tokens (int): Output length cap.
+
+    Returns:
+        ChatGoogleGenerativeAI: Configured chat model instance.
+    """
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    from ratelimit import rate_limited
+
+    llm_cache = None
+    if LLM_CACHE_ENABLED:
+        from llm_cache import build_llm_cache
+        llm_cache = build_llm_cache()
+
+    # Rate limited below the response cache, so cache hits use no quota
+    model = rate_limited(ChatGoogleGenerativeAI)(
+        model=model_id,
+        api_key=get_gemini_api_key(),
         temperature=TEMPERATURE,
         top_p=TOP_P,
         top_k=TOP_K,
-        max_output_tokens=MAX_TOKEN,   # output length cap
+        max_output_tokens=max_output_tokens,   # output length cap
+        cache=llm_cache,               # opt-in response cache
+        # ratelimit.py retries 429/5xx itself when rate limiting is on
+        max_retries=1 if RATE_LIMIT_ENABLED else 6,
+    )
+    logger.debug(
+        "Model config: model=%s, temp=%s, top_p=%s, top_k=%s, max_tokens=%s",
+        model_id, TEMPERATURE, TOP_P, TOP_K, max_output_tokens,
     )
-    logger.info("Gemini model initialized successfully")
-    logger.debug(f"Model config: model=gemini-2.5-flash-lite, temp=0.2, top_p=0.9, top_k=40, max_tokens=512")
-except Exception as e:
-    logger.error(f"Failed to initialize Gemini model: {str(e)}", exc_info=True)
-    raise
-
-# Initialize SerpAPI client
-logger.info("Initializing Serp api client")
-try:
-    client = serpapi.Client(api_key=serpapi_api_key)
-    logger.info("Serp api client initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialized Gemini model :{str(e)}",exc_info=True)
-    raise
+    return model
+
+
+def get_model(tier: Optional[str] = None):
+    """
+    Summary:
+        Returns the shared Gemini chat model, creating it on first call.
+
+    Args:
+        tier (Optional[str]): Name of a `MODEL_TIERS` entry; None returns the
+            default model (`MODEL_ID`, `MAX_TOKEN`). A model installed with
+            `set_model()` serves every tier.
+
+    Returns:
+        ChatGoogleGenerativeAI: Configured chat model instance.
+    """
+    global _model
+    if tier is not None and not _model_overridden:
+        return _get_tier_model(tier)
+    if _model is not None:
+        return _model
+
+    with _init_lock:
+        if _model is None:
+            logger.info("Initializing Gemini chat model client")
+            try:
+                _model = _build_model(MODEL_ID, MAX_TOKEN)
+                logger.info("Gemini model initialized successfully")
+            except Exception as e:
+                logger.error(f"Failed to initialize Gemini model: {str(e)}", exc_info=True)
+                raise
+    return _model
+
+
+def _get_tier_model(tier: str):
+    model = _tier_models.get(tier)
+    if model is not None:
+        return model
+
+    spec = next((t for t in MODEL_TIERS if t["name"] == tier), None)
+    if spec is None:
+        raise ValueError(f"Unknown model tier: {tier!r}")
+    with _init_lock:
+        if tier not in _tier_models:
+            logger.info(f"Initializing Gemini model tier {tier!r} ({spec['model']})")
+            try:
+                _tier_models[tier] = _build_model(spec["model"], spec["max_output_tokens"])
+            except Exception as e:
+                logger.error(f"Failed to initialize model tier {tier!r}: {str(e)}", exc_info=True)
+                raise
+    return _tier_models[tier]
+
+
+def get_search_client():
+    """
+    Summary:
+        Returns the shared SerpAPI client, creating it on first call.
+
+    Returns:
+        SerpApiHttpClient: Configured SerpAPI client.
+    """
+    global _search_client
+    if _search_client is not None:
+        return _search_client
+
+    with _init_lock:
+        if _search_client is None:
+            # Initialize SerpAPI client
+            logger.info("Initializing Serp api client")
+            try:
+                from ratelimit import get_limiter
+                from search_client import SerpApiHttpClient
+
+                _search_client = SerpApiHttpClient(
+                    api_key=get_serpapi_api_key(),
+                    limiter=get_limiter("serpapi"),
+                )
+                logger.info("Serp api client initialized successfully")
+            except Exception as e:
+                logger.error(f"Failed to initialize Serp api client: {str(e)}", exc_info=True)
+                raise
+    return _search_client
+
+
+def set_model(model) -> None:
+    """
+    Summary:
+        Replaces the shared chat model, e.g. with `fakes.FakeChatModel`.
+
+    Args:
+        model: Chat model instance to return from `get_model()`.
+    """
+    global _model, _model_overridden
+    with _init_lock:
+        _model = model
+        _model_overridden = True
+    logger.info("Chat model overridden with %s", type(model).__name__)
+
+
+def set_search_client(search_client) -> None:
+    """
+    Summary:
+        Replaces the shared search client, e.g. with `fakes.FakeSearchClient`.
+
+    Args:
+        search_client: Object exposing `search(params)` and, for async
+            callers, `asearch(params)`.
+    """
+    global _search_client
+    with _init_lock:
+        _search_client = search_client
+    logger.info("Search client overridden with %s", type(search_client).__name__)
+
 
+def __getattr__(name: str):
+    # Backwards-compatible lazy module attributes
+    if name == "model":
+        return get_model()
+    if name == "client":
+        return get_search_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
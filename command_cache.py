@@ -0,0 +1,316 @@
+"""
+Read-Only Command Cache Module
+
+Summary:
+This module caches the results of side-effect-free environment probes
+(`python --version`, `pip list`, ...) and reuses them until the
+environment they describe changes.
+
+Description:
+- Only commands matching `COMMAND_CACHE_COMMANDS` (fnmatch patterns,
+  matched against the command with the program's directory stripped) are
+  cached, and only successful results without spilled output.
+- Every entry is keyed on the command and an environment fingerprint: the
+  host, working directory, `PATH`, the resolved program and its mtime,
+  the Python-related environment variables and, for python/pip commands,
+  the mtimes of the directories the interpreter imports packages from, as
+  reported by the interpreter itself (`site.getsitepackages()`, the user
+  site and `sys.path`; pip scripts map to their shebang interpreter). Installing,
+  upgrading or removing a package changes a directory mtime, so the next
+  probe misses and runs again; stale entries simply expire.
+- Entries live in a `TieredCache` (memory LRU + the shared SQLite file),
+  so sharded batch workers and later runs reuse them too.
+- Cached results carry `cache: "hit"` and their age, fresh results of
+  allow-listed commands `cache: "miss"`; `terminal.format_result` reports
+  both to the agent. Lookups are counted in
+  `agent_tool_cache_lookups_total`.
+"""
+
+import fnmatch
+import json
+import os
+import shlex
+import shutil
+import socket
+import subprocess
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Optional, Sequence
+
+from cache import TieredCache, make_cache_key
+from config import (
+    COMMAND_CACHE_ENABLED,
+    COMMAND_CACHE_COMMANDS,
+    COMMAND_CACHE_PATH,
+    COMMAND_CACHE_TTL,
+    COMMAND_CACHE_MAX_ENTRIES,
+)
+from logger_config import setup_logger
+from metrics import record_cache_lookup
+
+# Initialize logger for this module
+logger = setup_logger(__name__)
+
+_PYTHON_ENV = (
+    "VIRTUAL_ENV", "CONDA_PREFIX", "PYTHONPATH", "PYTHONHOME", "PYTHONNOUSERSITE", "PIP_CONFIG_FILE",
+    "PYENV_VERSION",
+)
+
+# Asks an interpreter where it imports packages from
+_SITE_DIRS_SCRIPT = (
+    "import json, site, sys; "
+    "print(json.dumps(site.getsitepackages() + [site.getusersitepackages()] + sys.path))"
+)
+_site_dirs_cache: Dict[tuple, Optional[List[str]]] = {}
+
+command_cache = TieredCache(
+    "terminal_probe",
+    db_path=COMMAND_CACHE_PATH,
+    ttl=COMMAND_CACHE_TTL,
+    max_entries=COMMAND_CACHE_MAX_ENTRIES,
+) if COMMAND_CACHE_ENABLED else None
+
+
+def allow_listed(cmd: str, patterns: Sequence[str]) -> Optional[List[str]]:
+    """
+    Summary:
+        Checks a command line against an allow-list of read-only commands.
+
+    Args:
+        cmd (str): Command line.
+        patterns (Sequence[str]): fnmatch patterns, matched against the
+            command with the program's directory stripped.
+
+    Returns:
+        Optional[List[str]]: The command's argv if it is allow-listed, else None.
+    """
+    try:
+        argv = shlex.split(cmd)
+    except ValueError:
+        return None
+    if not argv:
+        return None
+    normalized = " ".join([os.path.basename(argv[0])] + argv[1:])
+    if not any(fnmatch.fnmatchcase(normalized, pattern) for pattern in patterns):
+        return None
+    return argv
+
+
+def is_cacheable(cmd: str) -> bool:
+    """Returns whether a command's result may be served from the cache."""
+    return command_cache is not None and allow_listed(cmd, COMMAND_CACHE_COMMANDS) is not None
+
+
+def _mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _interpreter(program: str, env: Mapping[str, str]) -> Optional[str]:
+    """
+    Summary:
+        Finds the Python interpreter behind a python or pip program.
+
+    Args:
+        program (str): Resolved path of the program.
+        env (Mapping[str, str]): Environment the command runs with.
+
+    Returns:
+        Optional[str]: The interpreter: the program itself for python, the
+            shebang interpreter of a pip script, or else the python next to
+            it (e.g. pyenv shims); None if there is none.
+    """
+    if os.path.basename(program).startswith("python"):
+        return program
+    try:
+        with open(program, "rb") as f:
+            shebang = f.readline(512).decode(errors="replace")
+    except OSError:
+        shebang = ""
+    words = shebang[2:].split() if shebang.startswith("#!") else []
+    if len(words) > 1 and os.path.basename(words[0]) == "env":
+        words = [shutil.which(words[1], path=env.get("PATH")) or ""]
+    if words and os.path.basename(words[0]).startswith("python"):
+        return words[0]
+    for name in ("python", "python3"):
+        sibling = os.path.join(os.path.dirname(program), name)
+        if os.access(sibling, os.X_OK):
+            return sibling
+    return None
+
+
+def _site_dirs(interpreter: str, cwd: str, env: Mapping[str, str]) -> Optional[List[str]]:
+    """
+    Summary:
+        Lists the directories an interpreter imports packages from.
+
+    Description:
+        Runs the interpreter once per interpreter, working directory and
+        Python-related environment and memoizes the answer, so Debian's
+        dist-packages, pyenv versions, the user site and `.pth` entries are
+        covered without guessing paths.
+
+    Args:
+        interpreter (str): Python interpreter.
+        cwd (str): Directory the command runs in.
+        env (Mapping[str, str]): Environment the command runs with.
+
+    Returns:
+        Optional[List[str]]: Existing site and `sys.path` directories, or
+            None if the interpreter could not be queried.
+    """
+    key = (interpreter, _mtime(os.path.realpath(interpreter)), cwd, env.get("PATH"),
+           tuple(env.get(name) for name in _PYTHON_ENV), env.get("HOME"))
+    if key not in _site_dirs_cache:
+        try:
+            output = subprocess.run(
+                [interpreter, "-c", _SITE_DIRS_SCRIPT],
+                cwd=cwd, env=dict(env), capture_output=True, text=True, timeout=10, check=True,
+            ).stdout
+            dirs = sorted({path for path in json.loads(output) if path and os.path.isdir(path)})
+        except (OSError, ValueError, subprocess.SubprocessError) as e:
+            logger.debug(f"Could not list the site directories of {interpreter}: {e}")
+            dirs = None
+        _site_dirs_cache[key] = dirs
+    return _site_dirs_cache[key]
+
+
+def environment_fingerprint(argv: List[str], cwd: str, env: Mapping[str, str]) -> Optional[Dict[str, Any]]:
+    """
+    Summary:
+        Describes the environment a read-only command's output depends on.
+
+    Args:
+        argv (List[str]): Command argv.
+        cwd (str): Directory the command runs in.
+        env (Mapping[str, str]): Environment the command runs with.
+
+    Returns:
+        Optional[Dict[str, Any]]: The fingerprint, or None if the program or,
+            for python/pip commands, its site directories cannot be resolved
+            (the command is then not cached).
+    """
+    if os.sep in argv[0]:
+        program = os.path.abspath(os.path.join(cwd, argv[0]))
+    else:
+        program = shutil.which(argv[0], path=env.get("PATH"))
+    if program is None or _mtime(program) is None:
+        return None
+
+    fingerprint = {
+        "host": socket.gethostname(),
+        "cwd": cwd,
+        "path": env.get("PATH"),
+        "program": program,
+        "program_mtime": _mtime(os.path.realpath(program)),
+        "env": {name: env.get(name) for name in _PYTHON_ENV},
+    }
+    if os.path.basename(argv[0]).startswith(("python", "pip")):
+        interpreter = _interpreter(program, env)
+        dirs = _site_dirs(interpreter, cwd, env) if interpreter is not None else None
+        if dirs is None:
+            return None
+        fingerprint["site_packages"] = [(path, _mtime(path)) for path in dirs]
+    return fingerprint
+
+
+def _lookup(cmd: str, cwd: Optional[str], env: Optional[Mapping[str, str]]) -> Optional[str]:
+    """
+    Summary:
+        Returns the cache key of a command, or None if it is not cacheable.
+
+    Args:
+        cmd (str): Command line.
+        cwd (Optional[str]): Directory the command runs in (default: current).
+        env (Optional[Mapping[str, str]]): Environment (default: inherited).
+
+    Returns:
+        Optional[str]: Cache key for `command_cache`.
+    """
+    if command_cache is None:
+        return None
+    argv = allow_listed(cmd, COMMAND_CACHE_COMMANDS)
+    if argv is None:
+        return None
+    cwd = os.path.abspath(cwd or os.getcwd())
+    fingerprint = environment_fingerprint(argv, cwd, env if env is not None else os.environ)
+    if fingerprint is None:
+        return None
+    return make_cache_key("terminal_probe", argv, fingerprint)
+
+
+def _cached(key: str) -> Optional[Dict[str, Any]]:
+    entry = command_cache.get(key)
+    record_cache_lookup("execute_terminal_command", entry is not None)
+    if entry is None:
+        return None
+    result = dict(entry["result"])
+    result.update(cache="hit", cache_age_s=round(time.time() - entry["stored_at"], 1))
+    return result
+
+
+def _store(key: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    if result["exit_code"] != 0 or result["error"] or result["spill_files"]:
+        return result
+    command_cache.set(key, {"result": result, "stored_at": time.time()})
+    return {**result, "cache": "miss"}
+
+
+def run_cached(
+    cmd: str,
+    cwd: Optional[str],
+    env: Optional[Mapping[str, str]],
+    run: Callable[[], Dict[str, Any]],
+) -> Dict[str, Any]:
+    """
+    Summary:
+        Serves an allow-listed read-only command from the cache, or runs it.
+
+    Args:
+        cmd (str): Command line.
+        cwd (Optional[str]): Directory the command runs in (default: current).
+        env (Optional[Mapping[str, str]]): Environment (default: inherited).
+        run (Callable[[], Dict[str, Any]]): Runs the command on a miss.
+
+    Returns:
+        Dict[str, Any]: Result in the format of `terminal.run_command`,
+            plus `cache` (and `cache_age_s` on a hit) for cacheable commands.
+    """
+    key = _lookup(cmd, cwd, env)
+    if key is None:
+        return run()
+    cached = _cached(key)
+    if cached is not None:
+        logger.debug(f"Command served from cache: {cmd}")
+        return cached
+    return _store(key, run())
+
+
+async def arun_cached(
+    cmd: str,
+    cwd: Optional[str],
+    env: Optional[Mapping[str, str]],
+    run: Callable[[], Awaitable[Dict[str, Any]]],
+) -> Dict[str, Any]:
+    """
+    Summary:
+        Async variant of `run_cached`.
+
+    Args:
+        cmd (str): Command line.
+        cwd (Optional[str]): Directory the command runs in (default: current).
+        env (Optional[Mapping[str, str]]): Environment (default: inherited).
+        run (Callable[[], Awaitable[Dict[str, Any]]]): Runs the command on a miss.
+
+    Returns:
+        Dict[str, Any]: Result, as for `run_cached`.
+    """
+    key = _lookup(cmd, cwd, env)
+    if key is None:
+        return await run()
+    cached = _cached(key)
+    if cached is not None:
+        logger.debug(f"Command served from cache: {cmd}")
+        return cached
+    return _store(key, await run())
@@ -11,4 +11,200 @@ TOP_K=40
 TOP_P=0.9
 
 #Max output token config
-MAX_TOKEN=512
\ No newline at end of file
+MAX_TOKEN=512
+
+# Batch runner config (max in-flight agent invocations, per-item timeout in seconds)
+BATCH_MAX_CONCURRENCY=8
+BATCH_ITEM_TIMEOUT=120
+
+# Web search cache config (TTL in seconds, memory LRU size, SQLite file for the disk tier)
+SEARCH_CACHE_ENABLED=True
+SEARCH_CACHE_PATH=".cache/agent_cache.sqlite3"
+SEARCH_CACHE_TTL=24*60*60
+SEARCH_CACHE_MAX_ENTRIES=256
+
+# Terminal command config (per-command timeout in seconds, max parallel commands)
+TERMINAL_COMMAND_TIMEOUT=30
+TERMINAL_MAX_WORKERS=4
+
+# Terminal output capture config (bytes kept from start/end of each stream; full
+# output of larger streams is spilled to TERMINAL_SPILL_DIR, None = system temp dir,
+# up to TERMINAL_SPILL_MAX_BYTES per stream)
+TERMINAL_OUTPUT_HEAD_BYTES=4000
+TERMINAL_OUTPUT_TAIL_BYTES=4000
+TERMINAL_SPILL_DIR=None
+TERMINAL_SPILL_MAX_FILES=50
+TERMINAL_SPILL_MAX_BYTES=50_000_000
+
+# Logging config (LOG_ASYNC routes records through one background writer thread
+# that flushes in batches of up to LOG_FLUSH_BATCH_SIZE records)
+LOG_LEVEL="DEBUG"
+LOG_ASYNC=True
+LOG_FLUSH_BATCH_SIZE=64
+
+# Log file format ("text" or "json" for JSON lines with trace/span IDs) and the
+# level at which tracing spans (agent, LLM and tool timings) are logged
+LOG_FORMAT="text"
+TRACE_SPAN_LOG_LEVEL="DEBUG"
+
+# Serving mode config (max concurrent agent invocations, per-request timeout in
+# seconds, keep-alive connection pool size of the SerpAPI HTTP session)
+SERVER_MAX_CONCURRENCY=16
+SERVER_REQUEST_TIMEOUT=120
+SEARCH_HTTP_POOL_SIZE=16
+
+# LLM response cache config (opt-in; backend "memory" or "sqlite", TTL in seconds,
+# memory and disk entry limits)
+LLM_CACHE_ENABLED=False
+LLM_CACHE_BACKEND="sqlite"
+LLM_CACHE_PATH=".cache/agent_cache.sqlite3"
+LLM_CACHE_TTL=7*24*60*60
+LLM_CACHE_MAX_ENTRIES=128
+LLM_CACHE_MAX_DISK_ENTRIES=5000
+
+# System prompt budget config (token budget for the system prompt, None = send it
+# in full; sections are condensed, then dropped, from the end of the priority list)
+PROMPT_TOKEN_BUDGET=None
+PROMPT_SECTION_PRIORITY=[
+    "Role",
+    "Available Tools",
+    "Rules and Constraints",
+    "Don'ts",
+    "Do's",
+    "Guidelines",
+    "Decision-Making Framework",
+    "Output Standards",
+    "Interaction Style",
+    "Context",
+    "Continuous Improvement",
+    "Reminder",
+]
+PROMPT_REQUIRED_SECTIONS=["Role", "Available Tools"]
+
+# Prompt prefix cache config (None, "gemini" for Gemini context caching or "local"
+# stand-in; TTL in seconds of each cached prefix)
+PROMPT_CACHE_BACKEND=None
+PROMPT_CACHE_TTL=60*60
+
+# Metrics config (JSON snapshot file written every METRICS_SNAPSHOT_INTERVAL seconds
+# by long-running modes; None disables snapshots, /metrics is always served)
+METRICS_SNAPSHOT_PATH=None
+METRICS_SNAPSHOT_INTERVAL=60
+
+# SerpAPI HTTP client config (keep-alive expiry, read/connect timeouts in seconds,
+# retries on connection errors, 429 and 5xx with exponential backoff base in seconds)
+SEARCH_HTTP_KEEPALIVE_EXPIRY=30
+SEARCH_HTTP_TIMEOUT=20
+SEARCH_HTTP_CONNECT_TIMEOUT=5
+SEARCH_HTTP_RETRIES=3
+SEARCH_HTTP_BACKOFF=0.5
+
+# Tool concurrency config (max concurrent calls per tool across all agent runs;
+# tools not listed use TOOL_DEFAULT_CONCURRENCY, None = unlimited)
+TOOL_CONCURRENCY_LIMITS={
+    "web_search_tool": 8,
+    "execute_terminal_command": 4,
+}
+TOOL_DEFAULT_CONCURRENCY=None
+
+# Read-only environment probes, shared by the single-flight and command cache
+# allow-lists below (fnmatch patterns, matched against the command with the
+# program's directory stripped)
+READ_ONLY_COMMANDS=[
+    "python --version", "python3 --version", "python -V", "python3 -V",
+    "pip list", "pip3 list", "pip list --*", "pip freeze", "pip3 freeze",
+    "pip --version", "pip3 --version", "pip show *",
+    "python -m pip list", "python3 -m pip list", "python -m pip freeze", "python3 -m pip freeze",
+    "uname", "uname -*", "git --version", "nproc", "whoami",
+]
+
+# Single-flight config (identical in-flight searches and allow-listed read-only
+# commands share one execution)
+SINGLE_FLIGHT_ENABLED=True
+SINGLE_FLIGHT_COMMANDS=READ_ONLY_COMMANDS + ["which *"]
+
+# Conversation memory config (session checkpoints: "memory" or "sqlite" at MEMORY_PATH;
+# estimated-token budget of the history sent to the model, recent turns kept verbatim
+# when older ones are summarized, and the size in characters above which tool outputs
+# of previous turns are folded to an excerpt)
+MEMORY_BACKEND="sqlite"
+MEMORY_PATH=".cache/sessions.sqlite3"
+MEMORY_TOKEN_BUDGET=6000
+MEMORY_KEEP_RECENT_TOKENS=2500
+MEMORY_TOOL_OUTPUT_MAX_CHARS=2000
+
+# Rate limiting config (opt-in; per backend: requests and tokens per minute, None = unlimited;
+# the adaptive concurrency limit starts at initial_concurrency, grows by about one per
+# window of successful calls up to max_concurrency and halves on 429/5xx; overloaded
+# model calls are retried RATE_LIMIT_RETRIES times with jittered exponential backoff;
+# the gemini defaults match the free tier)
+RATE_LIMIT_ENABLED=False
+RATE_LIMITS={
+    "gemini": {"requests_per_minute": 15, "tokens_per_minute": 250_000,
+               "initial_concurrency": 4, "max_concurrency": 16},
+    "serpapi": {"requests_per_minute": 60, "initial_concurrency": 4, "max_concurrency": 16},
+}
+RATE_LIMIT_RETRIES=4
+RATE_LIMIT_BACKOFF=1.0
+RATE_LIMIT_MAX_BACKOFF=30
+
+# Warm Python config (opt-in: python/pip commands that resolve to the agent's own
+# interpreter run in a process forked from a separate long-lived interpreter that has
+# these modules imported)
+WARM_PYTHON_ENABLED=False
+WARM_PYTHON_PRELOAD=[]  # e.g. ["pytest"]; preloaded modules are visible in every command
+
+# Shell session config (commands of one agent session share a persistent shell,
+# keeping cwd and environment; sessions are keyed by the run's thread_id)
+SHELL_SESSIONS_ENABLED=True
+SHELL_SESSION_MAX=8
+SHELL_SESSION_IDLE_TIMEOUT=1800  # seconds
+SHELL_SESSION_ROOT=None  # e.g. ".cache/workspaces" to start every session in its own directory
+TERMINAL_ENV_DENYLIST=["*_API_KEY", "*_TOKEN", "*_SECRET", "*PASSWORD*", "LANGSMITH_*", "LANGCHAIN_*"]
+
+# Test generation config (generated tests are run with pytest and failures are
+# sent back to the model; only passing tests are returned)
+TESTGEN_MAX_REPAIR_ROUNDS=2
+TESTGEN_MAX_WORKERS=4  # parallel model calls per round
+TESTGEN_TIMEOUT=120  # seconds per pytest run
+TESTGEN_FEEDBACK_MAX_CHARS=3000  # failure output sent back per test case
+TESTGEN_MAX_TEST_CASES=10  # larger requests from the model are capped
+
+# Cassette config (record live Gemini/SerpAPI traffic once, replay it offline;
+# `--record FILE` / `--replay FILE` on the command line override these)
+CASSETTE_MODE=None  # None, "record" or "replay"
+CASSETTE_PATH=".cache/agent_cassette.jsonl.gz"
+CASSETTE_LATENCY="zero"  # replay delay: "zero" or "original" (recorded wall time)
+
+# Deadline config (every agent request runs under a time and step budget; batch
+# and server items use their timeout, or `deadline_s` / `max_steps` on the item)
+AGENT_DEADLINE_S=180  # seconds, for the examples, streaming and chat turns (None = unlimited)
+AGENT_MAX_STEPS=15  # model calls per request (None = unlimited)
+DEADLINE_GRACE_S=5  # extra time before a request is cancelled outright
+DEADLINE_PARTIAL_MAX_CHARS=2000  # tool output quoted in a partial answer
+
+# Model cascade config (opt-in; model calls start on the first tier whose max_input_tokens
+# fits the estimated prompt, and move to the next tier when the answer is cut off
+# at its output cap or a tool call is malformed; max_input_tokens None = any size)
+MODEL_CASCADE_ENABLED=False
+MODEL_TIERS=[
+    {"name": "fast", "model": MODEL_ID, "max_output_tokens": MAX_TOKEN, "max_input_tokens": 8000},
+    {"name": "long", "model": MODEL_ID, "max_output_tokens": 2048, "max_input_tokens": None},
+    {"name": "strong", "model": "gemini-2.5-flash", "max_output_tokens": 4096, "max_input_tokens": None},
+]
+
+# Sharded batch config (`--batch FILE --workers N` runs shards of up to SHARD_SIZE
+# items on N processes; SQLite caches wait up to CACHE_SQLITE_BUSY_TIMEOUT seconds
+# for a lock held by another process)
+SHARD_SIZE=16
+CACHE_SQLITE_BUSY_TIMEOUT=30
+
+# Read-only command cache config (results of these environment probes are reused
+# until the fingerprint changes: host, cwd, PATH, program and site-packages mtimes;
+# "which *" is not cached, its answer depends on programs outside the fingerprint;
+# entries share the search cache's SQLite file)
+COMMAND_CACHE_ENABLED=True
+COMMAND_CACHE_COMMANDS=READ_ONLY_COMMANDS
+COMMAND_CACHE_PATH=".cache/agent_cache.sqlite3"
+COMMAND_CACHE_TTL=24*60*60
+COMMAND_CACHE_MAX_ENTRIES=128
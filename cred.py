@@ -8,40 +8,96 @@ API credentials required by the application.
 Description:
 - Loads environment variables from a `.env` file using python-dotenv.
 - Retrieves API keys for Gemini and SerpAPI from the environment.
-- Validates the presence of required credentials at startup.
+- Validates the presence of required credentials when they are first
+  requested, so commands that never touch a service do not need its key.
 - Logs detailed status information without exposing sensitive values.
 - Raises explicit errors if mandatory credentials are missing to
   prevent the application from running in an invalid state.
+
+`gemini_api_key` and `serpapi_api_key` remain importable as module
+attributes; they are resolved lazily on first access.
 """
 import os
-from dotenv import load_dotenv
+import threading
 
 from logger_config import setup_logger
 
 # Initialize logger for this module
 logger = setup_logger(__name__)
 
-logger.info("Starting credential loading process")
+_env_loaded = False
+_env_lock = threading.Lock()
+
+
+def _load_env() -> None:
+    """
+    Summary:
+        Loads the `.env` file into the process environment once.
+    """
+    global _env_loaded
+    with _env_lock:
+        if _env_loaded:
+            return
+        from dotenv import load_dotenv
+
+        logger.info("Starting credential loading process")
+        # Load variables from .env file into environment
+        load_dotenv()
+        logger.debug(".env file loaded successfully")
+        _env_loaded = True
+
+
+def _require_key(name: str) -> str:
+    """
+    Summary:
+        Reads and validates a required API key from the environment.
+
+    Args:
+        name (str): Environment variable name.
+
+    Returns:
+        str: The API key.
+
+    Raises:
+        EnvironmentError: If the key is missing or empty.
+    """
+    _load_env()
+    value = os.getenv(name, "")
+    logger.debug("%s present: %s", name, bool(value))
+
+    # Validate API key existence
+    if not value:
+        logger.critical(f"{name} not found in .env file")
+        raise EnvironmentError(f"{name} not found in .env file")
+    return value
+
 
-# Load variables from .env file into environment
-load_dotenv()
-logger.debug(".env file loaded successfully")
+def get_gemini_api_key() -> str:
+    """
+    Summary:
+        Returns the validated Gemini API key.
 
-# Read Gemini API key from environment
-gemini_api_key = os.getenv("GEMINI_API_KEY", "")
-logger.debug(f"GEMINI_API_KEY present: {bool(gemini_api_key)}")
+    Returns:
+        str: Value of GEMINI_API_KEY.
+    """
+    return _require_key("GEMINI_API_KEY")
 
-serpapi_api_key=os.getenv("SERPAPI_API_KEY","")
-logger.debug(f"SERPAPI_API_KEY present: {bool(serpapi_api_key)}")
 
-# Validate API key existence
-if not gemini_api_key:
-    logger.critical("GEMINI_API_KEY not found in .env file")
-    raise EnvironmentError("GEMINI_API_KEY not found in .env file")
+def get_serpapi_api_key() -> str:
+    """
+    Summary:
+        Returns the validated SerpAPI key.
 
-if not serpapi_api_key:
-    logger.critical("SERPAPI_API_KEY not found in .env file")
-    raise EnvironmentError("SERPAPI_API_KEY not found in .env file")
+    Returns:
+        str: Value of SERPAPI_API_KEY.
+    """
+    return _require_key("SERPAPI_API_KEY")
 
-logger.info("All required API keys validated successfully")
 
+def __getattr__(name: str):
+    # Backwards-compatible lazy module attributes
+    if name == "gemini_api_key":
+        return get_gemini_api_key()
+    if name == "serpapi_api_key":
+        return get_serpapi_api_key()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
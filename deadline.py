@@ -0,0 +1,341 @@
+"""
+Request Deadline Module
+
+Summary:
+This module gives every agent request a deadline and a step budget, so a
+runaway tool loop ends with a partial answer instead of running unbounded.
+
+Description:
+- `deadline_scope()` starts a `Deadline` (seconds and maximum model calls)
+  and publishes it through a contextvar, like the trace ids of tracing.py.
+  Threads and asyncio tasks started by the agent graph inherit it.
+- `remaining_timeout()` clamps a timeout to the time left, so subprocesses
+  (execute_terminal_command, the test runner) and SerpAPI HTTP requests
+  never outlive the request.
+- `DeadlineMiddleware` enforces the budget inside the agent loop: before
+  each model call it stops the run when the deadline has passed or the
+  step budget is spent, model calls are bounded by the remaining time (the
+  in-flight call is cancelled on the async path and abandoned on the sync
+  path), and tool calls are skipped once time is up (cancelled on the
+  async path). The run then ends with a partial answer built from the
+  progress so far.
+- The deadline records a timing breakdown (model time, time per tool,
+  steps, stop reason), returned in the final message's
+  `response_metadata["deadline"]` and in batch/server results.
+- `deadline_config()` sets LangGraph's `recursion_limit` from the step
+  budget, and `hard_timeout()` the outer timeout of a request, as backstops.
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from langchain.agents.middleware import AgentMiddleware, hook_config
+from langchain_core.messages import AIMessage, ToolMessage
+
+from config import AGENT_DEADLINE_S, AGENT_MAX_STEPS, DEADLINE_GRACE_S, DEADLINE_PARTIAL_MAX_CHARS
+from logger_config import setup_logger
+
+# Initialize logger for this module
+logger = setup_logger(__name__)
+
+_current: contextvars.ContextVar = contextvars.ContextVar("agent_deadline", default=None)
+# Sync model calls run here so they can be abandoned when time runs out
+_model_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="deadline-model")
+
+
+class Deadline:
+    """
+    Summary:
+        Time and step budget of one agent request, with its timing breakdown.
+
+    Args:
+        seconds (Optional[float]): Time budget (None = unlimited).
+        max_steps (Optional[int]): Maximum model calls (None = unlimited).
+    """
+
+    def __init__(self, seconds: Optional[float] = AGENT_DEADLINE_S, max_steps: Optional[int] = AGENT_MAX_STEPS):
+        self.seconds = seconds
+        self.max_steps = max_steps
+        self.started = time.monotonic()
+        self.expires_at = self.started + seconds if seconds is not None else None
+        self.steps = 0
+        self.model_s = 0.0
+        self.tool_s: Dict[str, float] = {}
+        self.tool_calls = 0
+        self.stop_reason: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left (never negative), or None without a time budget."""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def exhausted(self) -> Optional[str]:
+        """Returns why no further model call may start, or None."""
+        if self.expires_at is not None and time.monotonic() >= self.expires_at:
+            return "deadline"
+        if self.max_steps is not None and self.steps >= self.max_steps:
+            return "step_budget"
+        return None
+
+    def add_model_time(self, seconds: float) -> None:
+        with self._lock:
+            self.steps += 1
+            self.model_s += seconds
+
+    def add_tool_time(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.tool_calls += 1
+            self.tool_s[name] = self.tool_s.get(name, 0.0) + seconds
+
+    def stop(self, reason: str) -> None:
+        with self._lock:
+            self.stop_reason = self.stop_reason or reason
+
+    def breakdown(self) -> Dict[str, Any]:
+        """
+        Summary:
+            Reports where the request's time went.
+
+        Returns:
+            Dict[str, Any]: `elapsed_s`, `deadline_s`, `steps`, `max_steps`,
+                `model_s`, `tools_s` (per tool), `tool_calls` and `stopped`
+                (None, "deadline" or "step_budget").
+        """
+        with self._lock:
+            return {
+                "elapsed_s": round(time.monotonic() - self.started, 3),
+                "deadline_s": self.seconds,
+                "steps": self.steps,
+                "max_steps": self.max_steps,
+                "model_s": round(self.model_s, 3),
+                "tools_s": {name: round(seconds, 3) for name, seconds in self.tool_s.items()},
+                "tool_calls": self.tool_calls,
+                "stopped": self.stop_reason,
+            }
+
+
+def current_deadline() -> Optional[Deadline]:
+    """Returns the deadline of the current request, if any."""
+    return _current.get()
+
+
+def remaining_timeout(timeout: Optional[float]) -> Optional[float]:
+    """
+    Summary:
+        Clamps a timeout to the time left before the current deadline.
+
+    Args:
+        timeout (Optional[float]): Timeout the caller would use otherwise.
+
+    Returns:
+        Optional[float]: The smaller of both (at least 0.1 s), or `timeout`
+            when no deadline is active.
+    """
+    deadline = _current.get()
+    remaining = deadline.remaining() if deadline is not None else None
+    if remaining is None:
+        return timeout
+    remaining = round(max(remaining, 0.1), 3)
+    return remaining if timeout is None else min(timeout, remaining)
+
+
+@contextmanager
+def deadline_scope(
+    seconds: Optional[float] = AGENT_DEADLINE_S,
+    max_steps: Optional[int] = AGENT_MAX_STEPS,
+) -> Iterator[Deadline]:
+    """
+    Summary:
+        Runs the enclosed agent request under a deadline and step budget.
+
+    Args:
+        seconds (Optional[float]): Time budget (None = unlimited).
+        max_steps (Optional[int]): Maximum model calls (None = unlimited).
+
+    Yields:
+        Deadline: The active deadline, e.g. for its `breakdown()`.
+    """
+    deadline = Deadline(seconds, max_steps)
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+def deadline_config(max_steps: Optional[int] = AGENT_MAX_STEPS) -> Dict[str, Any]:
+    """
+    Summary:
+        Returns runnable config entries matching a step budget.
+
+    Args:
+        max_steps (Optional[int]): Maximum model calls.
+
+    Returns:
+        Dict[str, Any]: `{"recursion_limit": ...}` (empty without a budget).
+    """
+    if max_steps is None:
+        return {}
+    # A model call plus its tool round and middleware nodes take a few graph steps
+    return {"recursion_limit": 6 * max_steps + 10}
+
+
+def hard_timeout(seconds: Optional[float]) -> Optional[float]:
+    """
+    Summary:
+        Returns the backstop timeout for a whole request with a deadline.
+
+    Description:
+        The middleware normally ends the run with a partial answer at the
+        deadline; the backstop (deadline plus `DEADLINE_GRACE_S`) only
+        fires if that does not happen, e.g. inside a non-cancellable call.
+
+    Args:
+        seconds (Optional[float]): Request deadline.
+
+    Returns:
+        Optional[float]: Timeout for `asyncio.wait_for`, or None.
+    """
+    return seconds + DEADLINE_GRACE_S if seconds is not None else None
+
+
+def _partial_answer(messages: list, deadline: Deadline) -> AIMessage:
+    """
+    Summary:
+        Builds the final message of a run stopped by its budget.
+
+    Args:
+        messages (list): Conversation so far.
+        deadline (Deadline): The exhausted deadline.
+
+    Returns:
+        AIMessage: Partial answer with the timing breakdown in its metadata.
+    """
+    timing = deadline.breakdown()
+    if deadline.stop_reason == "deadline":
+        reason = f"the {deadline.seconds}s deadline was reached"
+    else:
+        reason = f"the budget of {deadline.max_steps} steps was used up"
+    steps = f"{timing['steps']} step" + ("" if timing["steps"] == 1 else "s")
+    lines = [f"Stopped early: {reason} after {steps} ({timing['elapsed_s']}s). Partial answer:"]
+
+    last_turn = max((i for i, m in enumerate(messages) if m.type == "human"), default=-1)
+    progress = messages[last_turn + 1:]
+    answer = next((m.text for m in reversed(progress) if m.type == "ai" and m.text.strip()), "")
+    if answer:
+        lines.append(answer.strip())
+    results = [m for m in progress if isinstance(m, ToolMessage)]
+    if results:
+        lines.append("Tool results so far:")
+        budget = DEADLINE_PARTIAL_MAX_CHARS // len(results)
+        for message in results:
+            text = message.text.strip()
+            text = text if len(text) <= budget else text[:budget] + " ..."
+            lines.append(f"- {message.name}: {text}")
+    if not answer and not results:
+        lines.append("No results were produced in time.")
+    return AIMessage(content="\n".join(lines), response_metadata={"deadline": timing})
+
+
+class DeadlineMiddleware(AgentMiddleware):
+    """
+    Summary:
+        Agent middleware enforcing the current request's deadline and step budget.
+
+    Description:
+        Without an active `deadline_scope()` every hook is a no-op.
+    """
+
+    def _stop(self, state: Any) -> Optional[Dict[str, Any]]:
+        deadline = _current.get()
+        reason = deadline.exhausted() if deadline is not None else None
+        if reason is None:
+            return None
+        deadline.stop(reason)
+        logger.warning(f"Stopping agent run: {reason} ({deadline.breakdown()})")
+        return {"messages": [_partial_answer(state["messages"], deadline)], "jump_to": "end"}
+
+    @hook_config(can_jump_to=["end"])
+    def before_model(self, state: Any, runtime: Any) -> Optional[Dict[str, Any]]:
+        return self._stop(state)
+
+    @hook_config(can_jump_to=["end"])
+    async def abefore_model(self, state: Any, runtime: Any) -> Optional[Dict[str, Any]]:
+        return self._stop(state)
+
+    def _timed_out(self, request: Any, deadline: Deadline) -> AIMessage:
+        deadline.stop("deadline")
+        logger.warning(f"Model call cancelled at the deadline ({deadline.breakdown()})")
+        return _partial_answer(request.messages, deadline)
+
+    def wrap_model_call(self, request: Any, handler: Callable) -> Any:
+        deadline = _current.get()
+        if deadline is None:
+            return handler(request)
+        start = time.perf_counter()
+        context = contextvars.copy_context()
+        future = _model_pool.submit(context.run, handler, request)
+        try:
+            response = future.result(timeout=deadline.remaining())
+        except FutureTimeoutError:
+            # The call cannot be interrupted; its result is discarded
+            deadline.add_model_time(time.perf_counter() - start)
+            return self._timed_out(request, deadline)
+        deadline.add_model_time(time.perf_counter() - start)
+        return response
+
+    async def awrap_model_call(self, request: Any, handler: Callable) -> Any:
+        deadline = _current.get()
+        if deadline is None:
+            return await handler(request)
+        start = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(handler(request), timeout=deadline.remaining())
+        except asyncio.TimeoutError:
+            deadline.add_model_time(time.perf_counter() - start)
+            return self._timed_out(request, deadline)
+        deadline.add_model_time(time.perf_counter() - start)
+        return response
+
+    def _skipped(self, request: Any, what: str = "not run") -> ToolMessage:
+        call = request.tool_call
+        return ToolMessage(
+            content=f"Error: {what}, the request deadline was reached",
+            name=call["name"],
+            tool_call_id=call["id"],
+            status="error",
+        )
+
+    def wrap_tool_call(self, request: Any, handler: Callable) -> Any:
+        deadline = _current.get()
+        if deadline is None:
+            return handler(request)
+        if deadline.remaining() == 0:
+            return self._skipped(request)
+        start = time.perf_counter()
+        try:
+            # Tools clamp their own timeouts with remaining_timeout()
+            return handler(request)
+        finally:
+            deadline.add_tool_time(request.tool_call["name"], time.perf_counter() - start)
+
+    async def awrap_tool_call(self, request: Any, handler: Callable) -> Any:
+        deadline = _current.get()
+        if deadline is None:
+            return await handler(request)
+        if deadline.remaining() == 0:
+            return self._skipped(request)
+        start = time.perf_counter()
+        try:
+            return await asyncio.wait_for(handler(request), timeout=deadline.remaining())
+        except asyncio.TimeoutError:
+            return self._skipped(request, "cancelled")
+        finally:
+            deadline.add_tool_time(request.tool_call["name"], time.perf_counter() - start)
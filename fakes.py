@@ -0,0 +1,169 @@
+"""
+Offline Stand-in Clients Module
+
+Summary:
+This module provides local stand-ins for the external services used by the
+agent so that caching, batching and tooling can be exercised offline.
+
+Description:
+- `FakeSearchClient` mimics the SerpAPI client (`search` and the async
+  `asearch`) and returns deterministic organic results derived from the query.
+- `FakeChatModel` is a LangChain chat model that replays a script of
+  AI messages (including tool calls) turn by turn, or echoes the last
+  user message when no script is given.
+- Both fakes support an injected latency, and the search fake records
+  the calls it received, so cache hits and concurrency effects are observable.
+
+The fakes never perform network I/O and need no API credentials.
+"""
+
+import asyncio
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+
+class FakeSearchClient:
+    """
+    Summary:
+        Drop-in replacement for the SerpAPI client with canned results.
+
+    Args:
+        latency (float): Seconds to sleep on every search call.
+        results (Optional[List[Dict[str, Any]]]): Fixed organic results to
+            return; by default results are generated from the query text.
+    """
+
+    def __init__(self, latency: float = 0.0, results: Optional[List[Dict[str, Any]]] = None):
+        self.latency = latency
+        self.results = results
+        self.calls: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def call_count(self) -> int:
+        """Number of search calls served so far."""
+        with self._lock:
+            return len(self.calls)
+
+    def search(self, params: Optional[Dict[str, Any]] = None, **kwargs) -> Dict[str, Any]:
+        """
+        Summary:
+            Returns SerpAPI-shaped results for the given parameters.
+
+        Args:
+            params (Optional[Dict[str, Any]]): SerpAPI request parameters.
+            **kwargs: Extra parameters merged into `params`.
+
+        Returns:
+            Dict[str, Any]: A dictionary with an `organic_results` list.
+        """
+        params = self._record(params, kwargs)
+        if self.latency:
+            time.sleep(self.latency)
+        return self._respond(params)
+
+    async def asearch(self, params: Optional[Dict[str, Any]] = None, **kwargs) -> Dict[str, Any]:
+        """
+        Summary:
+            Async variant of `search`; the latency is awaited, not slept.
+
+        Args:
+            params (Optional[Dict[str, Any]]): SerpAPI request parameters.
+            **kwargs: Extra parameters merged into `params`.
+
+        Returns:
+            Dict[str, Any]: A dictionary with an `organic_results` list.
+        """
+        params = self._record(params, kwargs)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._respond(params)
+
+    def _record(self, params: Optional[Dict[str, Any]], kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        params = dict(params or {})
+        params.update(kwargs)
+        with self._lock:
+            self.calls.append(params)
+        return params
+
+    def _respond(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        if self.results is not None:
+            organic = list(self.results)
+        else:
+            query = params.get("q", "")
+            organic = [
+                {
+                    "title": f"Result {i} for {query}",
+                    "link": f"https://example.com/{i}",
+                    "snippet": f"Offline snippet {i} about {query}.",
+                }
+                for i in range(1, int(params.get("num", 5)) + 1)
+            ]
+        return {"search_parameters": params, "organic_results": organic}
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Summary:
+        Scripted stand-in for `ChatGoogleGenerativeAI`.
+
+    Description:
+        The reply for a call is chosen by the number of AI messages already
+        in the conversation, so concurrent conversations never interfere:
+        the first model turn returns `responses[0]`, the turn after the tool
+        results returns `responses[1]`, and so on. Once the script is
+        exhausted (or when none is given) the model answers with an echo of
+        the last human message, which ends the agent loop. `scripts` selects
+        a different script per query, so one model can serve a mixed workload.
+
+    Args:
+        responses (List[AIMessage]): Scripted replies, e.g. messages with
+            `tool_calls` followed by a final answer.
+        scripts (Dict[str, List[AIMessage]]): Scripts keyed by the text of the
+            conversation's first human message; used instead of `responses`
+            for matching conversations.
+        latency (float): Seconds to wait on every call.
+    """
+
+    responses: List[AIMessage] = []
+    scripts: Dict[str, List[AIMessage]] = {}
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    def bind_tools(self, tools, **kwargs):
+        # Tool schemas are irrelevant for scripted replies
+        return self
+
+    def _reply(self, messages: List[BaseMessage]) -> ChatResult:
+        responses = self.responses
+        if self.scripts:
+            first_human = next((m for m in messages if m.type == "human"), None)
+            if first_human is not None:
+                responses = self.scripts.get(first_human.text, responses)
+
+        turn = sum(1 for m in messages if m.type == "ai")
+        if turn < len(responses):
+            message = responses[turn].model_copy()
+        else:
+            last_human = next((m for m in reversed(messages) if m.type == "human"), None)
+            content = last_human.content if last_human is not None else ""
+            message = AIMessage(content=f"Fake answer to: {content}")
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._reply(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._reply(messages)
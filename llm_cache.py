@@ -0,0 +1,142 @@
+"""
+LLM Response Cache Module
+
+Summary:
+This module provides an opt-in response cache for chat model calls so
+identical requests (same messages, bound tools, model and generation
+settings) are served locally instead of being re-sent to Gemini.
+
+Description:
+- `TieredLLMCache` implements LangChain's `BaseCache` interface on top of
+  `cache.TieredCache`, so it plugs into the model via its `cache` field
+  and covers both sync and async calls made by the agent graph.
+- LangChain hands the cache the serialized messages (`prompt`) and a
+  string describing the model, its generation parameters and invocation
+  kwargs such as bound tool schemas (`llm_string`). The key is a SHA-256
+  hash of both plus `MODEL_ID`.
+- Backends: "memory" (LRU only) or "sqlite" (LRU in front of a SQLite
+  table), with TTL and size-based eviction for both tiers.
+- `bypass_llm_cache()` temporarily disables lookups and writes in the
+  current context, e.g. to force a fresh answer.
+
+Enable it with `LLM_CACHE_ENABLED = True` in config.py.
+"""
+
+import contextvars
+import warnings
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional, Sequence
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.outputs import Generation
+
+from cache import TieredCache, make_cache_key
+from config import (
+    MODEL_ID,
+    LLM_CACHE_BACKEND,
+    LLM_CACHE_PATH,
+    LLM_CACHE_TTL,
+    LLM_CACHE_MAX_ENTRIES,
+    LLM_CACHE_MAX_DISK_ENTRIES,
+)
+from logger_config import setup_logger
+
+# Initialize logger for this module
+logger = setup_logger(__name__)
+
+_bypass = contextvars.ContextVar("llm_cache_bypass", default=False)
+
+# `langchain_core.load.loads` emits a beta warning on every call
+warnings.filterwarnings("ignore", message=r"The function `loads` is in beta")
+
+
+@contextmanager
+def bypass_llm_cache() -> Iterator[None]:
+    """
+    Summary:
+        Disables the LLM cache for model calls made inside the block.
+    """
+    token = _bypass.set(True)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+class TieredLLMCache(BaseCache):
+    """
+    Summary:
+        LangChain cache backed by a memory LRU and optional SQLite store.
+
+    Args:
+        store (TieredCache): Underlying key/value cache.
+    """
+
+    def __init__(self, store: TieredCache):
+        self.store = store
+
+    def _key(self, prompt: str, llm_string: str) -> str:
+        return make_cache_key("llm", MODEL_ID, llm_string, prompt)
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        """
+        Summary:
+            Returns cached generations for a request, if any.
+
+        Args:
+            prompt (str): Serialized messages.
+            llm_string (str): Serialized model, parameters and invocation kwargs.
+
+        Returns:
+            Optional[Sequence[Generation]]: Cached generations or None.
+        """
+        if _bypass.get():
+            return None
+        payload = self.store.get(self._key(prompt, llm_string))
+        if payload is None:
+            return None
+        try:
+            return loads(payload, allowed_objects="core")
+        except Exception as e:
+            logger.warning(f"Discarding unreadable LLM cache entry: {e}")
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        """
+        Summary:
+            Stores the generations produced for a request.
+
+        Args:
+            prompt (str): Serialized messages.
+            llm_string (str): Serialized model, parameters and invocation kwargs.
+            return_val (Sequence[Generation]): Generations to cache.
+        """
+        if _bypass.get():
+            return
+        self.store.set(self._key(prompt, llm_string), dumps(list(return_val)))
+
+    def clear(self, **kwargs: Any) -> None:
+        """Removes every cached response."""
+        self.store.clear()
+
+
+def build_llm_cache() -> TieredLLMCache:
+    """
+    Summary:
+        Creates the LLM cache configured in config.py.
+
+    Returns:
+        TieredLLMCache: Cache to pass as the chat model's `cache`.
+    """
+    db_path = LLM_CACHE_PATH if LLM_CACHE_BACKEND == "sqlite" else None
+    logger.info(f"LLM response cache enabled (backend={LLM_CACHE_BACKEND}, ttl={LLM_CACHE_TTL}s)")
+    return TieredLLMCache(
+        TieredCache(
+            "llm",
+            db_path=db_path,
+            ttl=LLM_CACHE_TTL,
+            max_entries=LLM_CACHE_MAX_ENTRIES,
+            max_disk_entries=LLM_CACHE_MAX_DISK_ENTRIES,
+        )
+    )
@@ -3,64 +3,354 @@ logger_config.py
 ----------------
 Centralized logging configuration for the entire project.
 Provides consistent logging format, levels, and handlers across all modules.
+
+When `LOG_ASYNC` is enabled in config.py, module loggers only enqueue
+records through a `QueueHandler`; a single background `QueueListener`
+thread per log file formats them and writes them in batches, so logging
+never blocks the agent on file or console I/O.
+
+Console output goes to stdout, or to stderr when the `AGENT_LOG_CONSOLE`
+environment variable is "stderr" (set by main.py in modes whose stdout
+carries JSONL results, and inherited by worker processes).
+
+With `LOG_FORMAT = "json"` the log file is written as JSON lines. Every
+record carries the trace and span IDs of the active span (see tracing.py).
 """
 
+import atexit
+import contextvars
+import copy
+import json
 import logging
+import os
+import queue
 import sys
-from logging.handlers import RotatingFileHandler
-from datetime import datetime
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from datetime import datetime, timezone
+
+from config import LOG_ASYNC, LOG_LEVEL, LOG_FLUSH_BATCH_SIZE, LOG_FORMAT
+
+# Environment variable selecting the console stream ("stdout" or "stderr")
+CONSOLE_ENV = "AGENT_LOG_CONSOLE"
 
+# Trace context of the current agent invocation, propagated across threads
+# and asyncio tasks by contextvars; maintained by tracing.span()
+trace_id_var = contextvars.ContextVar("trace_id", default=None)
+span_id_var = contextvars.ContextVar("span_id", default=None)
 
-def setup_logger(name: str, log_file: str = "agent_app.log", level=logging.DEBUG) -> logging.Logger:
+
+class _TraceContextFilter(logging.Filter):
     """
     Summary
-    Creates and configures a logger with both file and console handlers.
-    
+    Stamps every record with the active trace and span IDs. Runs in the
+    calling thread, before records are handed to the background writer.
+    """
+
+    def filter(self, record):
+        record.trace_id = trace_id_var.get()
+        record.span_id = span_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Summary
+    Formats records as single-line JSON objects including trace context and,
+    for span records, the span timing fields.
+    """
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "func": record.funcName,
+            "line": record.lineno,
+            "message": record.getMessage(),
+            "trace_id": getattr(record, "trace_id", None),
+            "span_id": getattr(record, "span_id", None),
+        }
+        span = getattr(record, "span", None)
+        if span is not None:
+            entry["span"] = span
+        if record.exc_info or record.exc_text:
+            entry["exc_info"] = record.exc_text or self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _DeferredFlushMixin:
+    """
+    Summary
+    Suppresses the per-record flush of stream handlers so that the queue
+    listener can flush once per batch of records via `commit()`.
+
+    Records for a stream that was closed underneath the handler (e.g. a
+    console stream at interpreter exit) are dropped instead of raising in
+    the listener thread.
+    """
+
+    def _stream_closed(self):
+        return bool(self.stream) and getattr(self.stream, "closed", False)
+
+    def emit(self, record):
+        if self._stream_closed():
+            return
+        super().emit(record)
+
+    def flush(self):
+        if getattr(self, "_defer_flush", False):
+            return
+        super().flush()
+
+    def commit(self):
+        """Flushes buffered output unconditionally."""
+        self.acquire()
+        try:
+            if self.stream and hasattr(self.stream, "flush") and not self._stream_closed():
+                self.stream.flush()
+        finally:
+            self.release()
+
+
+class _BatchingFileHandler(_DeferredFlushMixin, RotatingFileHandler):
+    """Rotating file handler whose flushes are driven by the queue listener."""
+
+
+class _BatchingStreamHandler(_DeferredFlushMixin, logging.StreamHandler):
+    """Console handler whose flushes are driven by the queue listener."""
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    Summary
+    Queue handler that leaves layout formatting to the listener thread.
+
+    Like the standard `QueueHandler.prepare`, the message is merged with its
+    arguments and the traceback rendered in the calling thread, so objects
+    that change after the call cannot alter the record; the handlers'
+    formatters (timestamps, levels, JSON) run in the listener.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_exception_formatter = logging.Formatter()
+
+
+class _BatchingQueueListener(QueueListener):
+    """
+    Summary
+    Queue listener that drains records in batches and flushes its handlers
+    once per batch instead of once per record.
+    """
+
+    def _monitor(self):
+        q = self.queue
+        has_task_done = hasattr(q, "task_done")
+        stopping = False
+        while not stopping:
+            try:
+                batch = [self.dequeue(True)]
+                while len(batch) < LOG_FLUSH_BATCH_SIZE:
+                    try:
+                        batch.append(self.dequeue(False))
+                    except queue.Empty:
+                        break
+
+                for record in batch:
+                    if record is self._sentinel:
+                        stopping = True
+                    else:
+                        self.handle(record)
+                    if has_task_done:
+                        q.task_done()
+
+                for handler in self.handlers:
+                    if isinstance(handler, _DeferredFlushMixin):
+                        handler.commit()
+            except queue.Empty:
+                break
+
+
+# One listener (and background writer thread) per log file, shared by all loggers
+_listeners = {}
+_listeners_lock = threading.Lock()
+
+# Console handlers created so far, so their stream can be redirected
+_console_handlers = []
+
+
+def _build_handlers(log_file: str, defer_flush: bool):
+    """
+    Summary
+    Creates the file and console handlers used by every logger.
+
     Args:
-        name: Logger name (typically __name__ of the calling module)
         log_file: Path to log file
-        level: Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
-    
+        defer_flush: Leave flushing to the queue listener (async mode)
+
     Returns:
-        Configured logger instance
+        Tuple of (file_handler, console_handler)
     """
-    # Create logger
-    logger = logging.getLogger(name)
-    logger.setLevel(level)
-    
-    # Prevent duplicate handlers if logger already exists
-    if logger.handlers:
-        return logger
-    
     # Create formatters
     detailed_formatter = logging.Formatter(
         fmt='%(asctime)s | %(levelname)-8s | %(name)s:%(funcName)s:%(lineno)d | %(message)s',
         datefmt='%Y-%m-%d %H:%M:%S'
     )
-    
+
     console_formatter = logging.Formatter(
         fmt='%(levelname)-8s | %(name)s | %(message)s'
     )
-    
+
     # File handler with rotation (max 5MB per file, keep 5 backups)
-    file_handler = RotatingFileHandler(
+    file_handler = _BatchingFileHandler(
         log_file,
         maxBytes=5*1024*1024,  # 5 MB
         backupCount=5,
         encoding='utf-8'
     )
     file_handler.setLevel(logging.DEBUG)
-    file_handler.setFormatter(detailed_formatter)
-    
+    file_handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else detailed_formatter)
+
     # Console handler (less verbose)
-    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler = _BatchingStreamHandler(_console_stream())
     console_handler.setLevel(logging.INFO)
     console_handler.setFormatter(console_formatter)
-    
+
+    file_handler._defer_flush = defer_flush
+    console_handler._defer_flush = defer_flush
+    _console_handlers.append(console_handler)
+    return file_handler, console_handler
+
+
+def _console_stream():
+    """
+    Summary
+    Returns the console stream chosen by the `AGENT_LOG_CONSOLE` environment
+    variable ("stdout" by default, or "stderr"), so a process whose stdout
+    carries results logs to stderr from its first record on.
+
+    Returns:
+        Text stream for console handlers
+    """
+    return sys.stderr if os.environ.get(CONSOLE_ENV) == "stderr" else sys.stdout
+
+
+def redirect_console_logging(stream=sys.stderr) -> None:
+    """
+    Summary
+    Points every console handler at another stream, e.g. stderr when stdout
+    carries machine-readable output such as JSONL results. Redirecting to
+    stderr also sets `AGENT_LOG_CONSOLE`, so child processes (sharding.py
+    workers) never log to stdout either.
+
+    Args:
+        stream: Target text stream
+    """
+    if stream is sys.stderr:
+        os.environ[CONSOLE_ENV] = "stderr"
+    for handler in _console_handlers:
+        handler.setStream(stream)
+
+
+def set_console_level(level) -> None:
+    """
+    Summary
+    Sets the level of every console handler, e.g. WARNING to keep progress
+    output quiet during benchmarks while the log file stays complete.
+
+    Args:
+        level: Logging level name or number
+    """
+    for handler in _console_handlers:
+        handler.setLevel(level)
+
+
+def _get_queue_handler(log_file: str) -> QueueHandler:
+    """
+    Summary
+    Returns the shared queue handler for a log file, starting its listener
+    thread on first use.
+
+    Args:
+        log_file: Path to log file
+
+    Returns:
+        Queue handler feeding the background writer thread
+    """
+    with _listeners_lock:
+        if log_file not in _listeners:
+            handlers = _build_handlers(log_file, defer_flush=True)
+            log_queue = queue.Queue(-1)
+            queue_handler = _DeferredQueueHandler(log_queue)
+            queue_handler.setLevel(min(h.level for h in handlers))
+            queue_handler.addFilter(_TraceContextFilter())
+            listener = _BatchingQueueListener(log_queue, *handlers, respect_handler_level=True)
+            listener.start()
+            _listeners[log_file] = (queue_handler, listener)
+        return _listeners[log_file][0]
+
+
+def shutdown_logging() -> None:
+    """
+    Summary
+    Stops all background writer threads after draining queued records.
+    Registered with `atexit`; safe to call more than once.
+    """
+    with _listeners_lock:
+        for _, listener in _listeners.values():
+            if listener._thread is not None:
+                listener.stop()
+            for handler in listener.handlers:
+                handler.close()
+        _listeners.clear()
+
+
+atexit.register(shutdown_logging)
+
+
+def setup_logger(name: str, log_file: str = "agent_app.log", level=LOG_LEVEL, async_mode: bool = LOG_ASYNC) -> logging.Logger:
+    """
+    Summary
+    Creates and configures a logger with both file and console handlers.
+
+    Args:
+        name: Logger name (typically __name__ of the calling module)
+        log_file: Path to log file
+        level: Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
+        async_mode: Route records through the shared background writer thread
+
+    Returns:
+        Configured logger instance
+    """
+    # Create logger
+    logger = logging.getLogger(name)
+    logger.setLevel(level)
+
+    # Prevent duplicate handlers if logger already exists
+    if logger.handlers:
+        return logger
+
+    if async_mode:
+        logger.addHandler(_get_queue_handler(log_file))
+        return logger
+
+    file_handler, console_handler = _build_handlers(log_file, defer_flush=False)
+    file_handler.addFilter(_TraceContextFilter())
+    console_handler.addFilter(_TraceContextFilter())
+
     # Add handlers to logger
     logger.addHandler(file_handler)
     logger.addHandler(console_handler)
-    
+
     return logger
 
 
@@ -68,5 +358,5 @@ def setup_logger(name: str, log_file: str = "agent_app.log", level=logging.DEBUG
 app_logger = setup_logger('agent_app')
 app_logger.info("="*50)
 app_logger.info("Logging system initialized")
-app_logger.info(f"Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+app_logger.info("Timestamp: %s", datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
 app_logger.info("="*50)
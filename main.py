@@ -3,50 +3,332 @@ main.py
 -------
 Non-interactive example demonstrations without context memory.
 Each example runs independently with comprehensive logging for debugging.
+
+Run `python main.py --batch queries.jsonl` to push a JSONL workload of
+independent queries through the agent concurrently (see batch.py; add
+`--workers N` to shard it across N processes, see sharding.py), or
+`python main.py --serve http|jsonl` to keep a warm agent serving
+requests (see server.py). `--stream` prints tokens and tool calls as
+they arrive (see streaming.py). `--prompt-report` prints the token cost
+of each system prompt section (see prompt_budget.py). `--chat` starts
+an interactive multi-turn session with conversation memory; resume it
+later with `--chat --session ID` (see memory.py). `--record FILE` and
+`--replay FILE` capture and replay the Gemini/SerpAPI traffic of any
+mode (see cassette.py).
 """
 
+import argparse
+import json
+import logging
+import os
+import sys
 import traceback
 
-from langchain_core.messages import HumanMessage
 
-from agent import agent
-from prompt import system_prompt, example_1_query, example_2_query, example_3_query
-from logger_config import setup_logger
+def _results_on_stdout(argv) -> bool:
+    # Batch mode without --output and JSONL serving write their results to stdout
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--batch")
+    parser.add_argument("--output")
+    parser.add_argument("--serve")
+    known, _ = parser.parse_known_args(argv)
+    return bool(known.batch and not known.output) or known.serve == "jsonl"
+
+
+if __name__ == "__main__" and _results_on_stdout(sys.argv[1:]):
+    # Must be set before logger_config is imported and logs its banner
+    os.environ["AGENT_LOG_CONSOLE"] = "stderr"
+
+from config import (
+    BATCH_MAX_CONCURRENCY,
+    BATCH_ITEM_TIMEOUT,
+    SERVER_MAX_CONCURRENCY,
+    SERVER_REQUEST_TIMEOUT,
+    CASSETTE_MODE,
+    CASSETTE_PATH,
+    CASSETTE_LATENCY,
+)
+from logger_config import redirect_console_logging, setup_logger
 
 # Initialize logger for main module
 logger = setup_logger(__name__)
 
 
-# Define example queries
+def parse_args(argv=None) -> argparse.Namespace:
+    """
+    Summary:
+        Parses command-line options for the example and batch modes.
 
+    Args:
+        argv: Optional argument list (defaults to sys.argv).
 
-# Message structures (no context memory - each is independent)
-message1 = {
-    "messages": [
-        system_prompt,
-        example_1_query
-    ]
-}
+    Returns:
+        argparse.Namespace: Parsed options.
+    """
+    parser = argparse.ArgumentParser(description="Autonomous development agent runner")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="JSONL file of independent queries to run concurrently")
+    parser.add_argument("--output", metavar="FILE",
+                        help="Write batch results as JSONL to FILE instead of stdout")
+    parser.add_argument("--concurrency", type=int,
+                        help="Maximum number of agent invocations in flight (default from config.py)")
+    parser.add_argument("--timeout", type=float,
+                        help="Per-item timeout in seconds (default from config.py)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Shard the batch across N worker processes (see sharding.py)")
+    parser.add_argument("--serve", choices=["http", "jsonl"],
+                        help="Run a long-lived server (HTTP, or JSONL over stdin/stdout)")
+    parser.add_argument("--host", default="127.0.0.1", help="HTTP server bind address")
+    parser.add_argument("--port", type=int, default=8080, help="HTTP server port")
+    parser.add_argument("--fake-backends", action="store_true",
+                        help="Use offline fake Gemini and SerpAPI backends (see fakes.py)")
+    parser.add_argument("--record", metavar="FILE",
+                        help="Record Gemini and SerpAPI traffic to a cassette file (see cassette.py)")
+    parser.add_argument("--replay", metavar="FILE",
+                        help="Serve Gemini and SerpAPI traffic from a recorded cassette, offline")
+    parser.add_argument("--replay-latency", choices=["zero", "original"],
+                        help="Replay with no delay or with the recorded latency (default from config.py)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Print model tokens and tool calls as they arrive")
+    parser.add_argument("--query", help="Run a single ad-hoc query instead of the examples")
+    parser.add_argument("--prompt-report", action="store_true",
+                        help="Print the token cost of each system prompt section and exit")
+    parser.add_argument("--chat", action="store_true",
+                        help="Interactive multi-turn session with conversation memory")
+    parser.add_argument("--session", metavar="ID",
+                        help="Session id to resume in chat mode (a new one is created by default)")
+    args = parser.parse_args(argv)
+    if args.workers > 1 and cassette_selection(args)[0] == "record":
+        # One cassette file cannot take writes from several processes
+        parser.error("recording a cassette needs a single process; drop --workers")
+    return args
 
-message2 = {
-    "messages": [
-        system_prompt,
-        example_2_query
-    ]
-}
 
-message3 = {
-    "messages": [
-        system_prompt,
-        example_3_query
+def run_prompt_report() -> int:
+    """
+    Summary:
+        Prints per-section token counts of the full and the budgeted system prompt.
+
+    Returns:
+        int: Process exit code.
+    """
+    from prompt_budget import get_system_prompt, section_token_report
+
+    report = {"full": section_token_report(), "active": section_token_report(get_system_prompt())}
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return 0
+
+
+def run_chat_mode(args: argparse.Namespace) -> int:
+    """
+    Summary:
+        Runs an interactive session that remembers earlier turns.
+
+    Args:
+        args (argparse.Namespace): Parsed command-line options.
+
+    Returns:
+        int: Process exit code.
+    """
+    from memory import Session
+
+    logger.info("="*70)
+    logger.info("APPLICATION STARTED - CHAT MODE")
+    logger.info("="*70)
+
+    if args.fake_backends:
+        from server import use_fake_backends
+        use_fake_backends()
+
+    session = Session(args.session)
+    print(f"Session: {session.session_id} (type 'exit' to quit)")
+    while True:
+        try:
+            query = input("\nYou: ").strip()
+        except (EOFError, KeyboardInterrupt):
+            print()
+            break
+        if query.lower() in ("exit", "quit"):
+            break
+        if not query:
+            continue
+        try:
+            print(f"\nAgent: {session.send(query)}")
+        except Exception as e:
+            logger.error(f"[CHAT] Unexpected error occurred: {e}", exc_info=True)
+            print(f"\nError: {e}")
+
+    print(f"Resume with: python main.py --chat --session {session.session_id}")
+    return 0
+
+
+def run_stream_mode(args: argparse.Namespace) -> int:
+    """
+    Summary:
+        Streams the agent's answer for an ad-hoc query or the example queries.
+
+    Args:
+        args (argparse.Namespace): Parsed command-line options.
+
+    Returns:
+        int: Process exit code (1 if any query failed).
+    """
+    from batch import build_message_set
+    from prompt import example_1_query, example_2_query, example_3_query
+    from streaming import print_stream
+
+    logger.info("="*70)
+    logger.info("APPLICATION STARTED - STREAMING MODE")
+    logger.info("="*70)
+
+    if args.fake_backends:
+        from server import use_fake_backends
+        use_fake_backends()
+
+    queries = [args.query] if args.query else [
+        example_1_query.content, example_2_query.content, example_3_query.content
     ]
-}
+    exit_code = 0
+    for query in queries:
+        print("\n" + "="*70)
+        print(f"Query: {query}")
+        print("="*70)
+        try:
+            print_stream(build_message_set(query))
+        except Exception as e:
+            logger.error(f"[STREAM] Unexpected error occurred: {e}", exc_info=True)
+            print(f"\nError: {e}")
+            exit_code = 1
+    return exit_code
 
 
-if __name__ == "__main__":
+def run_server_mode(args: argparse.Namespace) -> int:
+    """
+    Summary:
+        Runs the agent as a long-lived HTTP or JSONL server.
+
+    Args:
+        args (argparse.Namespace): Parsed command-line options.
+
+    Returns:
+        int: Process exit code.
+    """
+    from server import AgentServer, serve_http, serve_jsonl, use_fake_backends
+
+    if args.serve == "jsonl":
+        # stdout carries the JSONL results
+        redirect_console_logging(sys.stderr)
+
+    logger.info("="*70)
+    logger.info("APPLICATION STARTED - SERVER MODE (%s)", args.serve)
+    logger.info("="*70)
+
+    if args.fake_backends:
+        use_fake_backends()
+
+    server = AgentServer(
+        max_concurrency=args.concurrency or SERVER_MAX_CONCURRENCY,
+        timeout=args.timeout or SERVER_REQUEST_TIMEOUT,
+    ).start()
+    if args.serve == "http":
+        serve_http(args.host, args.port, server=server)
+    else:
+        serve_jsonl(server=server)
+    return 0
+
+
+def run_batch_mode(args: argparse.Namespace) -> int:
+    """
+    Summary:
+        Runs a JSONL workload concurrently and streams results as JSONL.
+
+    Args:
+        args (argparse.Namespace): Parsed command-line options.
+
+    Returns:
+        int: Process exit code (1 if any item failed).
+    """
+    from batch import load_message_sets, run_batch
+    from metrics import start_snapshot_writer
+    from sharding import run_sharded_batch
+
+    start_snapshot_writer()
+    if not args.output:
+        # stdout carries the JSONL results
+        redirect_console_logging(sys.stderr)
+
+    logger.info("="*70)
+    logger.info("APPLICATION STARTED - BATCH MODE")
+    logger.info("="*70)
+
+    if args.fake_backends:
+        from server import use_fake_backends
+        use_fake_backends()
+
+    items = load_message_sets(args.batch)
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+
+    def _write(result):
+        out.write(json.dumps(result, ensure_ascii=False) + "\n")
+        out.flush()
+
+    max_concurrency = args.concurrency or BATCH_MAX_CONCURRENCY
+    timeout = args.timeout or BATCH_ITEM_TIMEOUT
+    try:
+        if args.workers > 1:
+            results = run_sharded_batch(items, args.workers, max_concurrency, timeout, on_result=_write,
+                                        backends=worker_backends(args))
+        else:
+            results = run_batch(items, max_concurrency=max_concurrency, timeout=timeout, on_result=_write)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    return 1 if any(r["status"] != "ok" for r in results) else 0
+
+
+def run_examples() -> None:
+    """
+    Summary:
+        Runs the three predefined examples one after another.
+    """
+    # Heavy imports are deferred so that `--help` and batch mode stay cheap
+    from agent import get_agent
+    from deadline import deadline_config, deadline_scope
+    from prompt import example_1_query, example_2_query, example_3_query
+    from prompt_budget import get_system_prompt
+    from tracing import callback_config, span
+
+    # Full prompt, or its compact variant when PROMPT_TOKEN_BUDGET is set
+    system_prompt = get_system_prompt()
+
+    # Message structures (no context memory - each is independent)
+    message1 = {
+        "messages": [
+            system_prompt,
+            example_1_query
+        ]
+    }
+
+    message2 = {
+        "messages": [
+            system_prompt,
+            example_2_query
+        ]
+    }
+
+    message3 = {
+        "messages": [
+            system_prompt,
+            example_3_query
+        ]
+    }
+
     logger.info("="*70)
     logger.info("APPLICATION STARTED - NON-INTERACTIVE MODE")
     logger.info("="*70)
+
+    agent = get_agent()
     
     # ==================== Example 1: Web Search ====================
     try:
@@ -59,11 +341,12 @@ if __name__ == "__main__":
         print(f"\nQuery: {example_1_query.content}\n")
         print("Processing...\n")
         
-        response1 = agent.invoke(message1)
+        with span("agent.invoke", kind="agent", example=1), deadline_scope():
+            response1 = agent.invoke(message1, config=callback_config(**deadline_config()))
         
         logger.info(f"[EXAMPLE 1] Agent invocation completed successfully")
-        logger.debug(f"[EXAMPLE 1] Response messages count: {len(response1['messages'])}")
-        logger.debug(f"[EXAMPLE 1] Final message type: {type(response1['messages'][-1])}")
+        logger.debug("[EXAMPLE 1] Response messages count: %d", len(response1['messages']))
+        logger.debug("[EXAMPLE 1] Final message type: %s", type(response1['messages'][-1]))
         
         print("Response:")
         print("-" * 70)
@@ -79,7 +362,8 @@ if __name__ == "__main__":
         
     except Exception as e:
         logger.error(f"[EXAMPLE 1] Unexpected error occurred: {e}", exc_info=True)
-        logger.debug(f"[EXAMPLE 1] Full traceback:\n{traceback.format_exc()}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[EXAMPLE 1] Full traceback:\n%s", traceback.format_exc())
         print(f"\n--- Example 1 FAILED ---")
         print(f"Error: {e}")
     
@@ -94,10 +378,11 @@ if __name__ == "__main__":
         print(f"\nQuery: Generate tests for calculate_discount function\n")
         print("Processing...\n")
 
-        response2 = agent.invoke(message2)
+        with span("agent.invoke", kind="agent", example=2), deadline_scope():
+            response2 = agent.invoke(message2, config=callback_config(**deadline_config()))
         
         logger.info(f"[EXAMPLE 2] Agent invocation completed successfully")
-        logger.debug(f"[EXAMPLE 2] Response messages count: {len(response2['messages'])}")
+        logger.debug("[EXAMPLE 2] Response messages count: %d", len(response2['messages']))
         
         print("Response:")
         print("-" * 70)
@@ -113,7 +398,8 @@ if __name__ == "__main__":
         
     except Exception as e:
         logger.error(f"[EXAMPLE 2] Unexpected error occurred: {e}", exc_info=True)
-        logger.debug(f"[EXAMPLE 2] Full traceback:\n{traceback.format_exc()}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[EXAMPLE 2] Full traceback:\n%s", traceback.format_exc())
         print(f"\n--- Example 2 FAILED ---")
         print(f"Error: {e}")
     
@@ -128,10 +414,11 @@ if __name__ == "__main__":
         print(f"\nQuery: {example_3_query.content}\n")
         print("Processing...\n")
         
-        response3 = agent.invoke(message3)
+        with span("agent.invoke", kind="agent", example=3), deadline_scope():
+            response3 = agent.invoke(message3, config=callback_config(**deadline_config()))
         
         logger.info(f"[EXAMPLE 3] Agent invocation completed successfully")
-        logger.debug(f"[EXAMPLE 3] Response messages count: {len(response3['messages'])}")
+        logger.debug("[EXAMPLE 3] Response messages count: %d", len(response3['messages']))
         
         print("Response:")
         print("-" * 70)
@@ -147,7 +434,8 @@ if __name__ == "__main__":
         
     except Exception as e:
         logger.error(f"[EXAMPLE 3] Unexpected error occurred: {e}", exc_info=True)
-        logger.debug(f"[EXAMPLE 3] Full traceback:\n{traceback.format_exc()}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[EXAMPLE 3] Full traceback:\n%s", traceback.format_exc())
         print(f"\n--- Example 3 FAILED ---")
         print(f"Error: {e}")
     
@@ -157,4 +445,71 @@ if __name__ == "__main__":
     
     print("\n" + "="*70)
     print("✅ ALL EXAMPLES COMPLETED")
-    print("="*70 + "\n")
\ No newline at end of file
+    print("="*70 + "\n")
+
+
+def worker_backends(args: argparse.Namespace) -> dict:
+    """
+    Summary:
+        Describes the backends selected for this process, for sharded workers.
+
+    Args:
+        args (argparse.Namespace): Parsed command-line options.
+
+    Returns:
+        dict: `fake_backends` flag and the replayed `cassette`, if any.
+    """
+    mode, path = cassette_selection(args)
+    backends = {"fake_backends": args.fake_backends}
+    if mode == "replay":
+        backends["cassette"] = (mode, path, args.replay_latency or CASSETTE_LATENCY)
+    return backends
+
+
+def cassette_selection(args: argparse.Namespace) -> tuple:
+    """
+    Summary:
+        Returns the cassette mode and path chosen on the command line or in config.py.
+
+    Args:
+        args (argparse.Namespace): Parsed command-line options.
+
+    Returns:
+        tuple: (mode, path); mode is None without a cassette.
+    """
+    if args.record:
+        return "record", args.record
+    if args.replay:
+        return "replay", args.replay
+    return CASSETTE_MODE, CASSETTE_PATH
+
+
+def apply_cassette(args: argparse.Namespace) -> None:
+    """
+    Summary:
+        Installs the record/replay cassette selected on the command line or in config.py.
+
+    Args:
+        args (argparse.Namespace): Parsed command-line options.
+    """
+    mode, path = cassette_selection(args)
+    if mode is None:
+        return
+    from cassette import use_cassette
+    use_cassette(mode, path, args.replay_latency or CASSETTE_LATENCY)
+
+
+if __name__ == "__main__":
+    cli_args = parse_args()
+    if cli_args.prompt_report:
+        sys.exit(run_prompt_report())
+    apply_cassette(cli_args)
+    if cli_args.chat:
+        sys.exit(run_chat_mode(cli_args))
+    if cli_args.serve:
+        sys.exit(run_server_mode(cli_args))
+    if cli_args.batch:
+        sys.exit(run_batch_mode(cli_args))
+    if cli_args.stream or cli_args.query:
+        sys.exit(run_stream_mode(cli_args))
+    run_examples()
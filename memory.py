@@ -0,0 +1,370 @@
+"""
+Conversation Memory Module
+
+Summary:
+This module gives the agent multi-turn sessions: conversation state is
+checkpointed per session id, and the history sent to the model is kept
+within a token budget.
+
+Description:
+- `build_checkpointer()` creates the LangGraph checkpointer selected by
+  `MEMORY_BACKEND`: `"memory"` (process-local `InMemorySaver`) or
+  `"sqlite"` (`SqliteSaver` on `MEMORY_PATH`, from the optional
+  `langgraph-checkpoint-sqlite` package), so sessions survive restarts.
+- `ContextWindowMiddleware` runs before every model call of the session
+  agent and rewrites the checkpointed history in place:
+  * the leading system prompt is always kept verbatim;
+  * tool outputs of previous turns longer than `MEMORY_TOOL_OUTPUT_MAX_CHARS`
+    are folded to a head/tail excerpt;
+  * once the history exceeds `MEMORY_TOKEN_BUDGET`, the oldest whole turns
+    are folded into a rolling summary (one model call that updates the
+    previous summary), keeping the most recent turns verbatim up to
+    `MEMORY_KEEP_RECENT_TOKENS`. The current turn is never folded.
+  The prompt size per model call therefore stays roughly flat however long
+  a session runs, and so does the size of each checkpoint.
+- `Session` is the entry point: `Session(session_id).send(query)` sends only
+  the new user message; the system prompt is added on the first turn.
+
+Token counts are estimated with `prompt_budget.estimate_tokens`.
+"""
+
+import os
+import sqlite3
+import threading
+import uuid
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain.agents.middleware import AgentMiddleware
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    RemoveMessage,
+    SystemMessage,
+    ToolMessage,
+)
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+
+from config import (
+    MEMORY_BACKEND,
+    MEMORY_PATH,
+    MEMORY_TOKEN_BUDGET,
+    MEMORY_KEEP_RECENT_TOKENS,
+    MEMORY_TOOL_OUTPUT_MAX_CHARS,
+)
+from logger_config import setup_logger
+from prompt_budget import estimate_tokens
+
+# Initialize logger for this module
+logger = setup_logger(__name__)
+
+SUMMARY_MARKER = "context_summary"
+SUMMARY_HEADER = "Summary of the earlier conversation:\n"
+
+SUMMARY_PROMPT = SystemMessage(content="""You maintain the running summary of a conversation between a user and a Python development assistant.
+Update the existing summary with the new turns. Keep facts the assistant may need later: the user's goals and constraints, file names, code and commands discussed, tool results that were relied on, decisions made and open questions.
+Drop greetings and repetition. Answer with the updated summary only, as concise bullet points.""")
+
+# Characters of each message rendered into the summarization transcript
+_TRANSCRIPT_MESSAGE_CHARS = 1500
+
+
+def build_checkpointer(backend: str = MEMORY_BACKEND, path: str = MEMORY_PATH):
+    """
+    Summary:
+        Creates the checkpointer that stores session state.
+
+    Args:
+        backend (str): `"memory"` or `"sqlite"`.
+        path (str): SQLite database file for the `"sqlite"` backend.
+
+    Returns:
+        BaseCheckpointSaver: The LangGraph checkpointer.
+    """
+    if backend == "memory":
+        from langgraph.checkpoint.memory import InMemorySaver
+
+        return InMemorySaver()
+    if backend == "sqlite":
+        try:
+            from langgraph.checkpoint.sqlite import SqliteSaver
+        except ImportError as e:
+            logger.error("MEMORY_BACKEND='sqlite' requires the langgraph-checkpoint-sqlite package", exc_info=True)
+            raise ImportError(
+                "MEMORY_BACKEND='sqlite' requires langgraph-checkpoint-sqlite "
+                "(pip install langgraph-checkpoint-sqlite)"
+            ) from e
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        logger.info(f"Storing session checkpoints in {path}")
+        return SqliteSaver(sqlite3.connect(path, check_same_thread=False))
+    raise ValueError(f"Unknown MEMORY_BACKEND: {backend!r} (expected 'memory' or 'sqlite')")
+
+
+def is_summary(message: BaseMessage) -> bool:
+    """Whether `message` is the rolling summary inserted by this module."""
+    return isinstance(message, HumanMessage) and bool(message.additional_kwargs.get(SUMMARY_MARKER))
+
+
+def message_tokens(message: BaseMessage) -> int:
+    """
+    Summary:
+        Estimates the tokens a message adds to a model request.
+
+    Args:
+        message (BaseMessage): Any conversation message.
+
+    Returns:
+        int: Approximate token count, including tool-call arguments.
+    """
+    tokens = estimate_tokens(message.text) + 4
+    for call in getattr(message, "tool_calls", None) or []:
+        tokens += estimate_tokens(f"{call['name']}{call.get('args')}")
+    return tokens
+
+
+def fold_text(text: str, max_chars: int, label: str = "tool output") -> str:
+    """
+    Summary:
+        Shortens a bulky text to a head/tail excerpt of at most `max_chars`.
+
+    Args:
+        text (str): Text to fold.
+        max_chars (int): Maximum length of the result.
+        label (str): What was folded, for the elision marker.
+
+    Returns:
+        str: `text` unchanged if short enough, else the excerpt with a marker.
+    """
+    if len(text) <= max_chars:
+        return text
+    marker = f"\n[... {len(text)} characters of {label} folded ...]\n"
+    room = max(0, max_chars - len(marker))
+    head = room * 3 // 4
+    tail = room - head
+    return text[:head] + marker + (text[-tail:] if tail else "")
+
+
+def _render_transcript(messages: Sequence[BaseMessage]) -> str:
+    lines = []
+    for message in messages:
+        text = fold_text(message.text, _TRANSCRIPT_MESSAGE_CHARS)
+        if isinstance(message, HumanMessage):
+            lines.append(f"User: {text}")
+        elif isinstance(message, AIMessage):
+            if text:
+                lines.append(f"Assistant: {text}")
+            for call in message.tool_calls:
+                lines.append(f"Assistant called {call['name']}({call.get('args')})")
+        elif isinstance(message, ToolMessage):
+            lines.append(f"Tool result ({message.name or 'tool'}): {text}")
+    return "\n".join(lines)
+
+
+class ContextWindowMiddleware(AgentMiddleware):
+    """
+    Summary:
+        Keeps a session's history within a token budget before each model call.
+
+    Args:
+        token_budget (int): Maximum estimated tokens of the history (system
+            prompt excluded) before older turns are summarized.
+        keep_recent_tokens (int): Tokens of the most recent turns kept verbatim
+            when summarizing.
+        tool_output_max_chars (int): Tool outputs of previous turns longer than
+            this are folded to an excerpt.
+        model (Optional[BaseChatModel]): Model that writes the summaries
+            (defaults to `client.get_model()` at call time).
+    """
+
+    def __init__(
+        self,
+        token_budget: int = MEMORY_TOKEN_BUDGET,
+        keep_recent_tokens: int = MEMORY_KEEP_RECENT_TOKENS,
+        tool_output_max_chars: int = MEMORY_TOOL_OUTPUT_MAX_CHARS,
+        model: Any = None,
+    ):
+        super().__init__()
+        self.token_budget = token_budget
+        self.keep_recent_tokens = min(keep_recent_tokens, token_budget)
+        self.tool_output_max_chars = tool_output_max_chars
+        self.model = model
+
+    def _summary_model(self):
+        if self.model is not None:
+            return self.model
+        from client import get_model
+
+        return get_model()
+
+    def _plan(self, messages: List[BaseMessage]) -> Dict[str, Any]:
+        """
+        Summary:
+            Decides which tool outputs to fold and which turns to summarize.
+
+        Args:
+            messages (List[BaseMessage]): Current state messages.
+
+        Returns:
+            Dict[str, Any]: `system`, `summary` (previous text), `history`
+                (with folded tool outputs), `folded` (replaced tool messages)
+                and `cutoff` (number of history messages to summarize, 0 = none).
+        """
+        rest = list(messages)
+        system = rest.pop(0) if rest and isinstance(rest[0], SystemMessage) else None
+        summary = rest.pop(0).text.removeprefix(SUMMARY_HEADER) if rest and is_summary(rest[0]) else ""
+
+        turn_starts = [i for i, m in enumerate(rest) if isinstance(m, HumanMessage)]
+        current_turn = turn_starts[-1] if turn_starts else len(rest)
+
+        history, folded = [], []
+        for i, message in enumerate(rest):
+            if i < current_turn and isinstance(message, ToolMessage) and len(message.text) > self.tool_output_max_chars:
+                message = message.model_copy(update={"content": fold_text(message.text, self.tool_output_max_chars)})
+                folded.append(message)
+            history.append(message)
+
+        plan = {"system": system, "summary": summary, "history": history, "folded": folded, "cutoff": 0}
+        sizes = [message_tokens(m) for m in history]
+        if estimate_tokens(summary) + sum(sizes) <= self.token_budget:
+            return plan
+
+        # Keep the longest suffix of whole turns that fits; always keep the current turn
+        cutoff = current_turn
+        for start in turn_starts:
+            if sum(sizes[start:]) <= self.keep_recent_tokens:
+                cutoff = min(start, current_turn)
+                break
+        plan["cutoff"] = cutoff
+        return plan
+
+    def _summary_request(self, summary: str, messages: Sequence[BaseMessage]) -> List[BaseMessage]:
+        existing = summary or "(none yet)"
+        return [
+            SUMMARY_PROMPT,
+            HumanMessage(content=f"Existing summary:\n{existing}\n\nNew conversation turns:\n{_render_transcript(messages)}"),
+        ]
+
+    def _update(self, plan: Dict[str, Any], new_summary: Optional[str]) -> Optional[Dict[str, Any]]:
+        if new_summary == "":
+            logger.warning("Summarizer returned an empty summary; keeping the full history")
+            new_summary = None
+        if new_summary is None:
+            return {"messages": plan["folded"]} if plan["folded"] else None
+
+        # Cap the summary at half the budget not reserved for recent turns, so
+        # that new turns fit before the next summarization
+        summary_chars = 2 * (self.token_budget - self.keep_recent_tokens)
+        new_summary = fold_text(new_summary, max(summary_chars, 400), label="summary")
+        cutoff = plan["cutoff"]
+        logger.info(f"Folding {cutoff} older messages into the conversation summary")
+        rebuilt = [RemoveMessage(id=REMOVE_ALL_MESSAGES)]
+        if plan["system"] is not None:
+            rebuilt.append(plan["system"])
+        rebuilt.append(HumanMessage(
+            content=SUMMARY_HEADER + new_summary,
+            additional_kwargs={SUMMARY_MARKER: True},
+        ))
+        rebuilt.extend(plan["history"][cutoff:])
+        return {"messages": rebuilt}
+
+    def _summarize_failed(self, error: Exception) -> None:
+        # The turn still proceeds with the full history; the next call retries
+        logger.error(f"Conversation summarization failed: {str(error)}", exc_info=True)
+
+    def before_model(self, state: Dict[str, Any], runtime: Any) -> Optional[Dict[str, Any]]:
+        plan = self._plan(state["messages"])
+        new_summary = None
+        if plan["cutoff"]:
+            request = self._summary_request(plan["summary"], plan["history"][:plan["cutoff"]])
+            try:
+                new_summary = self._summary_model().invoke(request).text.strip()
+            except Exception as e:
+                self._summarize_failed(e)
+        return self._update(plan, new_summary)
+
+    async def abefore_model(self, state: Dict[str, Any], runtime: Any) -> Optional[Dict[str, Any]]:
+        plan = self._plan(state["messages"])
+        new_summary = None
+        if plan["cutoff"]:
+            request = self._summary_request(plan["summary"], plan["history"][:plan["cutoff"]])
+            try:
+                new_summary = (await self._summary_model().ainvoke(request)).text.strip()
+            except Exception as e:
+                self._summarize_failed(e)
+        return self._update(plan, new_summary)
+
+
+class Session:
+    """
+    Summary:
+        One multi-turn conversation with the agent, resumable by id.
+
+    Args:
+        session_id (Optional[str]): Id of the conversation to continue; a new
+            random id is generated when omitted.
+        agent (Any): Checkpointed agent graph (defaults to
+            `agent.get_session_agent()`).
+    """
+
+    def __init__(self, session_id: Optional[str] = None, agent: Any = None):
+        self.session_id = session_id or uuid.uuid4().hex
+        self._agent = agent
+        self._lock = threading.Lock()
+
+    @property
+    def agent(self):
+        """The checkpointed agent graph this session runs on."""
+        if self._agent is None:
+            from agent import get_session_agent
+
+            self._agent = get_session_agent()
+        return self._agent
+
+    @property
+    def config(self) -> Dict[str, Any]:
+        """Runnable config selecting this session's checkpoint thread."""
+        return {"configurable": {"thread_id": self.session_id}}
+
+    def messages(self) -> List[BaseMessage]:
+        """
+        Summary:
+            Returns the session's current (possibly summarized) history.
+
+        Returns:
+            List[BaseMessage]: Checkpointed messages, empty for a new session.
+        """
+        snapshot = self.agent.get_state(self.config)
+        return list(snapshot.values.get("messages", []))
+
+    def _inputs(self, query: str) -> Dict[str, Any]:
+        messages: List[BaseMessage] = []
+        if not self.messages():
+            from prompt_budget import get_system_prompt
+
+            messages.append(get_system_prompt())
+        messages.append(HumanMessage(content=query))
+        return {"messages": messages}
+
+    def send(self, query: str) -> str:
+        """
+        Summary:
+            Sends one user message and returns the agent's answer.
+
+        Args:
+            query (str): The user's message.
+
+        Returns:
+            str: Text of the final AI message.
+        """
+        from deadline import deadline_config, deadline_scope
+        from tracing import callback_config, span
+
+        # Turns of one session are serialized; different sessions run freely
+        with self._lock:
+            with span("agent.invoke", kind="agent", session=self.session_id), deadline_scope():
+                config = callback_config(**self.config, **deadline_config())
+                result = self.agent.invoke(self._inputs(query), config=config)
+        return result["messages"][-1].text
@@ -0,0 +1,564 @@
+"""
+Metrics Module
+
+Summary:
+This module collects in-process metrics for tool calls, LLM calls and agent
+invocations and exposes them as Prometheus text or JSON snapshots.
+
+Description:
+- `MetricsRegistry` holds labelled counters and histograms (thread-safe,
+  no external dependency). `registry` is the shared instance.
+- `instrument_tool()` wraps a tool function (below `@tool`) and records its
+  duration, output size, call count by status and errors. Tools that turn
+  exceptions into result strings call `mark_tool_error()` so those calls
+  are still counted as errors; `record_cache_lookup()` counts cache hits.
+- `MetricsCallbackHandler` records LLM call duration, status and token
+  usage; it is attached by `tracing.callback_config()`.
+- Agent spans (`agent.invoke`, `agent.stream`, ...) are recorded by
+  tracing.py through `observe_agent_span()`.
+- `render_prometheus()` returns the text exposition format (served by
+  server.py at `GET /metrics`); `snapshot()` returns the same data as JSON,
+  with approximate p50/p95/p99 per histogram, and
+  `start_snapshot_writer()` writes it to `METRICS_SNAPSHOT_PATH` every
+  `METRICS_SNAPSHOT_INTERVAL` seconds.
+- `MetricsRegistry.drain()` / `merge()` move metric values between
+  processes, so sharded batch runs (sharding.py) report one aggregate.
+"""
+
+import atexit
+import contextvars
+import functools
+import inspect
+import json
+import math
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from config import METRICS_SNAPSHOT_PATH, METRICS_SNAPSHOT_INTERVAL
+from logger_config import setup_logger
+
+# Initialize logger for this module
+logger = setup_logger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = (100, 1000, 4000, 10000, 50000, 100000, 1000000)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Sequence[Tuple[str, str]] = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """
+    Summary:
+        Monotonic counter with labels.
+
+    Args:
+        name (str): Metric name.
+        help (str): Help text.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self) -> Dict[LabelKey, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_format_labels(k)} {_format_value(v)}" for k, v in sorted(self.collect().items())]
+
+    def to_json(self) -> List[Dict[str, Any]]:
+        return [{"labels": dict(k), "value": v} for k, v in sorted(self.collect().items())]
+
+
+class Histogram:
+    """
+    Summary:
+        Cumulative-bucket histogram with labels.
+
+    Args:
+        name (str): Metric name.
+        help (str): Help text.
+        buckets (Sequence[float]): Upper bounds of the buckets.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = DURATION_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series: Dict[LabelKey, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    def collect(self) -> Dict[LabelKey, Dict[str, Any]]:
+        with self._lock:
+            return {k: {"counts": list(s["counts"]), "sum": s["sum"], "count": s["count"]} for k, s in self._series.items()}
+
+    def quantile(self, q: float, series: Dict[str, Any]) -> Optional[float]:
+        """
+        Summary:
+            Estimates a quantile by linear interpolation inside its bucket.
+
+        Args:
+            q (float): Quantile between 0 and 1.
+            series (Dict[str, Any]): One collected series.
+
+        Returns:
+            Optional[float]: Estimated value, or None without observations.
+        """
+        if not series["count"]:
+            return None
+        rank = q * series["count"]
+        cumulative, lower = 0, 0.0
+        for bound, count in zip(self.buckets, series["counts"]):
+            if cumulative + count >= rank and count:
+                if bound == math.inf:
+                    return lower
+                return lower + (bound - lower) * (rank - cumulative) / count
+            cumulative += count
+            lower = bound if bound != math.inf else lower
+        return lower
+
+    def render(self) -> List[str]:
+        lines = []
+        for key, series in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series["counts"]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', _format_value(bound))])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(series['sum'])}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+    def to_json(self) -> List[Dict[str, Any]]:
+        out = []
+        for key, series in sorted(self.collect().items()):
+            count = series["count"]
+            out.append({
+                "labels": dict(key),
+                "count": count,
+                "sum": round(series["sum"], 6),
+                "mean": round(series["sum"] / count, 6) if count else None,
+                "p50": self.quantile(0.5, series),
+                "p95": self.quantile(0.95, series),
+                "p99": self.quantile(0.99, series),
+            })
+        return out
+
+
+class MetricsRegistry:
+    """
+    Summary:
+        Named collection of counters and histograms.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, help: str, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, **kwargs)
+            return metric
+
+    def counter(self, name: str, help: str) -> Counter:
+        """Returns the counter with this name, creating it if needed."""
+        return self._get_or_create(Counter, name, help)
+
+    def histogram(self, name: str, help: str, buckets: Sequence[float] = DURATION_BUCKETS) -> Histogram:
+        """Returns the histogram with this name, creating it if needed."""
+        return self._get_or_create(Histogram, name, help, buckets=buckets)
+
+    def metrics(self) -> Iterable[Any]:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def clear(self) -> None:
+        """Drops every metric (used between benchmark runs)."""
+        with self._lock:
+            self._metrics.clear()
+
+    def drain(self) -> List[Dict[str, Any]]:
+        """
+        Summary:
+            Returns the raw values of every metric and resets them to zero.
+
+        Description:
+            Used by sharding.py workers to ship their metrics to the
+            coordinator; the metric objects stay registered.
+
+        Returns:
+            List[Dict[str, Any]]: Picklable state for `merge()`.
+        """
+        state = []
+        for metric in self.metrics():
+            with metric._lock:
+                if metric.kind == "counter":
+                    values, metric._values = metric._values, {}
+                    entry = {"values": values}
+                else:
+                    values, metric._series = metric._series, {}
+                    entry = {"series": values, "buckets": metric.buckets[:-1]}
+            state.append({"kind": metric.kind, "name": metric.name, "help": metric.help, **entry})
+        return state
+
+    def merge(self, state: List[Dict[str, Any]]) -> None:
+        """
+        Summary:
+            Adds metric values drained from another registry.
+
+        Args:
+            state (List[Dict[str, Any]]): Result of `drain()`.
+        """
+        for entry in state:
+            if entry["kind"] == "counter":
+                counter = self.counter(entry["name"], entry["help"])
+                with counter._lock:
+                    for key, value in entry["values"].items():
+                        counter._values[key] = counter._values.get(key, 0) + value
+                continue
+            histogram = self.histogram(entry["name"], entry["help"], buckets=entry["buckets"])
+            with histogram._lock:
+                for key, series in entry["series"].items():
+                    total = histogram._series.setdefault(
+                        key, {"counts": [0] * len(histogram.buckets), "sum": 0.0, "count": 0}
+                    )
+                    total["counts"] = [a + b for a, b in zip(total["counts"], series["counts"])]
+                    total["sum"] += series["sum"]
+                    total["count"] += series["count"]
+
+
+registry = MetricsRegistry()
+
+
+def render_prometheus(reg: Optional[MetricsRegistry] = None) -> str:
+    """
+    Summary:
+        Renders all metrics in the Prometheus text exposition format.
+
+    Args:
+        reg (Optional[MetricsRegistry]): Registry to render (shared one by default).
+
+    Returns:
+        str: Exposition text (content type `text/plain; version=0.0.4`).
+    """
+    lines = []
+    for metric in (reg or registry).metrics():
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def snapshot(reg: Optional[MetricsRegistry] = None) -> Dict[str, Any]:
+    """
+    Summary:
+        Returns all metrics as a JSON-serializable dictionary.
+
+    Args:
+        reg (Optional[MetricsRegistry]): Registry to export (shared one by default).
+
+    Returns:
+        Dict[str, Any]: `timestamp` and one entry per metric.
+    """
+    return {
+        "timestamp": time.time(),
+        "metrics": {m.name: {"type": m.kind, "help": m.help, "series": m.to_json()} for m in (reg or registry).metrics()},
+    }
+
+
+# ------------------------------------------------------------------ tool metrics
+
+def _tool_metrics():
+    return (
+        registry.histogram("agent_tool_duration_seconds", "Tool call duration in seconds"),
+        registry.histogram("agent_tool_output_bytes", "Size of tool results in bytes", buckets=SIZE_BUCKETS),
+        registry.counter("agent_tool_calls_total", "Tool calls by status"),
+    )
+
+
+_tool_error = contextvars.ContextVar("tool_error", default=None)
+
+
+def mark_tool_error(error: Any = None) -> None:
+    """
+    Summary:
+        Flags the running tool call as failed even though it returns normally.
+
+    Args:
+        error (Any): The error (exception or message), for the log.
+    """
+    state = _tool_error.get()
+    if state is not None:
+        state["error"] = error if error is not None else True
+
+
+def record_cache_lookup(tool_name: str, hit: bool) -> None:
+    """
+    Summary:
+        Counts a tool cache lookup.
+
+    Args:
+        tool_name (str): Tool that performed the lookup.
+        hit (bool): Whether the lookup was served from the cache.
+    """
+    registry.counter("agent_tool_cache_lookups_total", "Tool cache lookups by result").inc(
+        tool=tool_name, result="hit" if hit else "miss"
+    )
+
+
+def _record_tool_call(tool_name: str, start: float, result: Any, status: str) -> None:
+    duration, size, calls = _tool_metrics()
+    duration.observe(time.perf_counter() - start, tool=tool_name)
+    if result is not None:
+        size.observe(len(str(result).encode("utf-8", "replace")), tool=tool_name)
+    calls.inc(tool=tool_name, status=status)
+
+
+def instrument_tool(name: Optional[str] = None) -> Callable:
+    """
+    Summary:
+        Decorator that records duration, output size and status of a tool.
+
+    Description:
+        Apply it below `@tool` so the recorded time covers only the tool
+        body. A call counts as an error when it raises or when the tool calls
+        `mark_tool_error()`.
+
+    Args:
+        name (Optional[str]): Tool name label (defaults to the function name).
+
+    Returns:
+        Callable: The decorator.
+    """
+
+    def decorator(func):
+        tool_name = name or func.__name__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                token = _tool_error.set({})
+                start = time.perf_counter()
+                result, status = None, "ok"
+                try:
+                    result = await func(*args, **kwargs)
+                    return result
+                except BaseException:
+                    status = "error"
+                    raise
+                finally:
+                    if _tool_error.get().get("error") is not None:
+                        status = "error"
+                    _tool_error.reset(token)
+                    _record_tool_call(tool_name, start, result, status)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            token = _tool_error.set({})
+            start = time.perf_counter()
+            result, status = None, "ok"
+            try:
+                result = func(*args, **kwargs)
+                return result
+            except BaseException:
+                status = "error"
+                raise
+            finally:
+                if _tool_error.get().get("error") is not None:
+                    status = "error"
+                _tool_error.reset(token)
+                _record_tool_call(tool_name, start, result, status)
+        return wrapper
+
+    return decorator
+
+
+# ------------------------------------------------------------- agent and LLM
+
+def observe_agent_span(name: str, duration_s: float, status: str) -> None:
+    """
+    Summary:
+        Records a finished agent invocation span.
+
+    Args:
+        name (str): Span name, e.g. "agent.invoke".
+        duration_s (float): Span duration in seconds.
+        status (str): "ok" or "error".
+    """
+    registry.histogram("agent_invoke_duration_seconds", "Agent invocation duration in seconds").observe(
+        duration_s, entry=name
+    )
+    registry.counter("agent_invocations_total", "Agent invocations by status").inc(entry=name, status=status)
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    Summary:
+        LangChain callback handler that records LLM call metrics.
+
+    Description:
+        Runs are tracked by `run_id`, so one shared instance serves all
+        concurrent invocations. Token usage is taken from the message's
+        `usage_metadata` when the provider reports it.
+    """
+
+    def __init__(self):
+        self._runs: Dict[UUID, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id: UUID, serialized: Optional[Dict[str, Any]], kwargs: Dict[str, Any]) -> None:
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model") or params.get("model_name") or (serialized or {}).get("name") or "unknown"
+        with self._lock:
+            self._runs[run_id] = (str(model), time.perf_counter())
+
+    def _finish(self, run_id: UUID, status: str) -> Optional[str]:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return None
+        model, start = run
+        registry.histogram("agent_llm_duration_seconds", "LLM call duration in seconds").observe(
+            time.perf_counter() - start, model=model
+        )
+        registry.counter("agent_llm_calls_total", "LLM calls by status").inc(model=model, status=status)
+        return model
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id, serialized, kwargs)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id, serialized, kwargs)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        model = self._finish(run_id, "ok")
+        if model is None:
+            return
+        try:
+            usage = getattr(response.generations[0][0].message, "usage_metadata", None) or {}
+        except (IndexError, AttributeError):
+            usage = {}
+        tokens = registry.counter("agent_llm_tokens_total", "LLM tokens by direction")
+        for direction in ("input", "output"):
+            if usage.get(f"{direction}_tokens"):
+                tokens.inc(usage[f"{direction}_tokens"], model=model, direction=direction)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, "error")
+
+
+# Shared handler; attached to every agent invocation by tracing.callback_config()
+metrics_handler = MetricsCallbackHandler()
+
+
+# ------------------------------------------------------------- JSON snapshots
+
+_snapshot_thread: Optional[threading.Thread] = None
+_snapshot_stop = threading.Event()
+
+
+def write_snapshot(path: str = METRICS_SNAPSHOT_PATH) -> None:
+    """
+    Summary:
+        Atomically writes the current metrics snapshot to a JSON file.
+
+    Args:
+        path (str): Destination file.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(snapshot(), f)
+    os.replace(tmp_path, path)
+
+
+def start_snapshot_writer(
+    path: Optional[str] = METRICS_SNAPSHOT_PATH,
+    interval: float = METRICS_SNAPSHOT_INTERVAL,
+) -> None:
+    """
+    Summary:
+        Starts a background thread writing JSON snapshots periodically.
+
+    Description:
+        Does nothing when `path` is None or a writer is already running. A
+        final snapshot is written at interpreter exit.
+
+    Args:
+        path (Optional[str]): Destination file.
+        interval (float): Seconds between snapshots.
+    """
+    global _snapshot_thread
+    if not path or _snapshot_thread is not None:
+        return
+
+    def _loop():
+        while not _snapshot_stop.wait(interval):
+            try:
+                write_snapshot(path)
+            except Exception as e:
+                logger.warning(f"Failed to write metrics snapshot to {path}: {e}")
+
+    def _final():
+        _snapshot_stop.set()
+        try:
+            write_snapshot(path)
+        except Exception as e:
+            logger.warning(f"Failed to write final metrics snapshot to {path}: {e}")
+
+    _snapshot_thread = threading.Thread(target=_loop, name="metrics-snapshot", daemon=True)
+    _snapshot_thread.start()
+    atexit.register(_final)
+    logger.info(f"Writing metrics snapshots to {path} every {interval}s")
@@ -0,0 +1,230 @@
+"""
+System Prompt Budgeting Module
+
+Summary:
+This module measures the token cost of `prompt.system_prompt` section by
+section and builds compact variants of it that fit a token budget.
+
+Description:
+- Splits the prompt on its top-level "## " headings (Role, Context,
+  Available Tools, Guidelines, Do's, Don'ts, ...); the closing "---"
+  reminder is treated as its own "Reminder" section.
+- Counts tokens per section with a fast local estimate (about four
+  characters per token) or any callable passed as `counter`, e.g. a
+  chat model's `get_num_tokens`.
+- `build_compact_prompt()` first condenses and then drops sections from the
+  low-priority end of `PROMPT_SECTION_PRIORITY` until the prompt fits the
+  budget; `PROMPT_REQUIRED_SECTIONS` are never dropped. Sections keep their
+  original order.
+- `get_system_prompt()` returns the prompt to send with every message set:
+  the full prompt, or the compact variant when `PROMPT_TOKEN_BUDGET` is set.
+  Variants are memoized per budget, so every request shares one identical
+  prefix (which keeps the prompt prefix cache effective).
+"""
+
+import math
+import re
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Sequence
+
+from langchain_core.messages import SystemMessage
+
+from config import PROMPT_TOKEN_BUDGET, PROMPT_SECTION_PRIORITY, PROMPT_REQUIRED_SECTIONS
+from logger_config import setup_logger
+from prompt import system_prompt
+
+# Initialize logger for this module
+logger = setup_logger(__name__)
+
+TokenCounter = Callable[[str], int]
+
+_HEADING = re.compile(r"^## (.+)$", re.MULTILINE)
+_REMINDER = re.compile(r"^---\s*$", re.MULTILINE)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Summary:
+        Estimates the number of tokens in a text without calling a tokenizer.
+
+    Args:
+        text (str): Text to measure.
+
+    Returns:
+        int: Approximate token count (about four characters per token).
+    """
+    return math.ceil(len(text) / 4)
+
+
+def split_sections(text: str) -> List[Dict[str, str]]:
+    """
+    Summary:
+        Splits a markdown prompt into its top-level sections.
+
+    Args:
+        text (str): Prompt text.
+
+    Returns:
+        List[Dict[str, str]]: Sections in order, each with `title` and `text`
+            (the heading line included).
+    """
+    sections = []
+    matches = list(_HEADING.finditer(text))
+    preamble = text[: matches[0].start()] if matches else text
+    if preamble.strip():
+        sections.append({"title": "Preamble", "text": preamble.strip()})
+
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        body = text[match.start():end]
+        reminder = _REMINDER.search(body)
+        if reminder:
+            sections.append({"title": match.group(1).strip(), "text": body[: reminder.start()].strip()})
+            sections.append({"title": "Reminder", "text": body[reminder.end():].strip()})
+        else:
+            sections.append({"title": match.group(1).strip(), "text": body.strip()})
+    return sections
+
+
+def section_token_report(
+    prompt: Optional[SystemMessage] = None,
+    counter: TokenCounter = estimate_tokens,
+) -> Dict[str, object]:
+    """
+    Summary:
+        Reports the token cost of each prompt section.
+
+    Args:
+        prompt (Optional[SystemMessage]): Prompt to measure (the full system
+            prompt by default).
+        counter (TokenCounter): Token counting function.
+
+    Returns:
+        Dict[str, object]: `sections` (title, tokens, chars) and `total_tokens`.
+    """
+    prompt = prompt or system_prompt
+    sections = [
+        {"title": s["title"], "tokens": counter(s["text"]), "chars": len(s["text"])}
+        for s in split_sections(prompt.text)
+    ]
+    return {"sections": sections, "total_tokens": counter(prompt.text)}
+
+
+def condense_section(text: str) -> str:
+    """
+    Summary:
+        Produces a shorter rendering of a section with the same instructions.
+
+    Description:
+        Removes markdown emphasis, "Use Cases" lines (examples of when a tool
+        applies, not how to call it), trailing whitespace and blank lines.
+
+    Args:
+        text (str): Section text.
+
+    Returns:
+        str: Condensed section text.
+    """
+    lines = []
+    for line in text.splitlines():
+        line = line.replace("**", "").rstrip()
+        if not line or line.lstrip().startswith("Use Cases:"):
+            continue
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def _priority(title: str, priority: Sequence[str]) -> int:
+    for rank, name in enumerate(priority):
+        if title.startswith(name):
+            return rank
+    return len(priority)
+
+
+def _is_required(title: str, required: Sequence[str]) -> bool:
+    return any(title.startswith(name) for name in required)
+
+
+def build_compact_prompt(
+    budget_tokens: int,
+    prompt: Optional[SystemMessage] = None,
+    priority: Sequence[str] = PROMPT_SECTION_PRIORITY,
+    required: Sequence[str] = PROMPT_REQUIRED_SECTIONS,
+    counter: TokenCounter = estimate_tokens,
+) -> SystemMessage:
+    """
+    Summary:
+        Builds a variant of the system prompt that fits a token budget.
+
+    Description:
+        Sections are condensed one at a time from the lowest priority
+        upwards; if the prompt still does not fit, non-required sections are
+        dropped in the same order. If even the required sections exceed the
+        budget, the smallest achievable prompt is returned and a warning is
+        logged.
+
+    Args:
+        budget_tokens (int): Maximum number of prompt tokens.
+        prompt (Optional[SystemMessage]): Prompt to compact (the full system
+            prompt by default).
+        priority (Sequence[str]): Section titles (prefixes) from most to least
+            important; unlisted sections rank last.
+        required (Sequence[str]): Section titles that are never dropped.
+        counter (TokenCounter): Token counting function.
+
+    Returns:
+        SystemMessage: Compact system prompt.
+    """
+    prompt = prompt or system_prompt
+    sections = split_sections(prompt.text)
+    texts = [s["text"] for s in sections]
+
+    def render() -> str:
+        return "\n\n".join(t for t in texts if t) + "\n"
+
+    if counter(render()) <= budget_tokens:
+        return prompt
+
+    # Lowest priority first; stable, so ties keep document order
+    order = sorted(range(len(sections)), key=lambda i: -_priority(sections[i]["title"], priority))
+
+    for i in order:
+        texts[i] = condense_section(texts[i])
+        if counter(render()) <= budget_tokens:
+            break
+    else:
+        for i in order:
+            if _is_required(sections[i]["title"], required):
+                continue
+            texts[i] = ""
+            if counter(render()) <= budget_tokens:
+                break
+
+    content = render()
+    tokens = counter(content)
+    kept = [s["title"] for s, t in zip(sections, texts) if t]
+    if tokens > budget_tokens:
+        logger.warning(f"System prompt cannot fit {budget_tokens} tokens; smallest variant has {tokens}")
+    logger.info(f"Compact system prompt: {tokens} tokens (budget {budget_tokens}), sections kept: {kept}")
+    return SystemMessage(content=content)
+
+
+@lru_cache(maxsize=8)
+def _compact_for_budget(budget_tokens: int) -> SystemMessage:
+    return build_compact_prompt(budget_tokens)
+
+
+def get_system_prompt(budget_tokens: Optional[int] = PROMPT_TOKEN_BUDGET) -> SystemMessage:
+    """
+    Summary:
+        Returns the system prompt to send with each message set.
+
+    Args:
+        budget_tokens (Optional[int]): Token budget, or None for the full prompt.
+
+    Returns:
+        SystemMessage: The full prompt or its memoized compact variant.
+    """
+    if budget_tokens is None:
+        return system_prompt
+    return _compact_for_budget(budget_tokens)
@@ -0,0 +1,203 @@
+"""
+Prompt Prefix Cache Module
+
+Summary:
+This module lets the agent upload its static prompt prefix (system prompt
+plus tool declarations) once and reference it from every model call,
+instead of re-sending it on each turn of the tool loop.
+
+Description:
+- `PromptPrefixCache` maps a prefix (hash of model, system prompt text and
+  tool schemas) to a cache handle and refreshes it before its TTL expires.
+- Backends:
+    "gemini": Gemini context caching. The prefix is stored server-side with
+              `create_context_cache` and requests pass its name as
+              `cached_content`; Gemini bills cached input tokens at a reduced
+              rate and skips re-processing them.
+    "local":  In-process stand-in for offline runs (e.g. with fakes.py). It
+              registers prefixes and reports the tokens that would have been
+              served from the cache, but leaves requests unchanged.
+- `PromptPrefixCacheMiddleware` applies the cache to agent model calls.
+  With Gemini, a request using cached content must not also carry a system
+  instruction or tools, so the middleware strips both from the request; the
+  agent's tool node still executes the tool calls the model returns.
+- If a prefix cannot be cached (e.g. unsupported model or prefix below the
+  provider's minimum size), the failure is logged once and calls for that
+  prefix fall back to sending it in full.
+
+Enable it with `PROMPT_CACHE_BACKEND` in config.py.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Sequence
+
+from langchain.agents.middleware import AgentMiddleware, ModelRequest
+from langchain_core.messages import SystemMessage
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from cache import make_cache_key
+from config import MODEL_ID, PROMPT_CACHE_BACKEND, PROMPT_CACHE_TTL
+from logger_config import setup_logger
+from prompt_budget import estimate_tokens
+
+# Initialize logger for this module
+logger = setup_logger(__name__)
+
+# Refresh a cached prefix this many seconds before it expires
+_REFRESH_MARGIN = 60
+
+
+def _tool_schemas(tools: Sequence[Any]) -> list:
+    return [t if isinstance(t, dict) else convert_to_openai_tool(t) for t in tools]
+
+
+class PromptPrefixCache:
+    """
+    Summary:
+        Registry of uploaded prompt prefixes and their cache handles.
+
+    Args:
+        backend (str): "gemini" or "local".
+        ttl (int): Lifetime of each cached prefix in seconds.
+    """
+
+    def __init__(self, backend: str = "local", ttl: int = PROMPT_CACHE_TTL):
+        if backend not in ("gemini", "local"):
+            raise ValueError(f"Unknown prompt cache backend: {backend!r}")
+        self.backend = backend
+        self.ttl = ttl
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._failed: set = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+
+    @property
+    def references_prefix(self) -> bool:
+        """Whether requests are rewritten to reference the cached prefix."""
+        return self.backend == "gemini"
+
+    def resolve(self, model: Any, system_message: SystemMessage, tools: Sequence[Any]) -> Optional[str]:
+        """
+        Summary:
+            Returns the cache handle for a prefix, creating it if needed.
+
+        Args:
+            model: Chat model the prefix is used with.
+            system_message (SystemMessage): System prompt of the request.
+            tools (Sequence[Any]): Tools bound to the request.
+
+        Returns:
+            Optional[str]: Cache handle, or None if the prefix cannot be cached.
+        """
+        schemas = _tool_schemas(tools)
+        # Cached prefixes belong to one model, so cascade tiers do not share them
+        key = make_cache_key(getattr(model, "model", None) or MODEL_ID, system_message.text, schemas)
+
+        with self._lock:
+            if key in self._failed:
+                return None
+            entry = self._entries.get(key)
+            if entry and entry["expires_at"] - _REFRESH_MARGIN > time.time():
+                self.hits += 1
+                self.tokens_saved += entry["tokens"]
+                return entry["handle"]
+
+            self.misses += 1
+            try:
+                handle = self._create(model, system_message, tools, key)
+            except Exception as e:
+                self._failed.add(key)
+                logger.warning(f"Prompt prefix not cached ({self.backend}), sending it in full: {e}")
+                return None
+
+            tokens = estimate_tokens(system_message.text) + estimate_tokens(json.dumps(schemas))
+            self._entries[key] = {"handle": handle, "expires_at": time.time() + self.ttl, "tokens": tokens}
+            logger.info(f"Cached prompt prefix {handle} (~{tokens} tokens, ttl={self.ttl}s)")
+            return handle
+
+    def _create(self, model: Any, system_message: SystemMessage, tools: Sequence[Any], key: str) -> str:
+        if self.backend == "local":
+            return f"local/{key[:16]}"
+
+        from langchain_google_genai import ChatGoogleGenerativeAI, create_context_cache
+
+        if not isinstance(model, ChatGoogleGenerativeAI):
+            raise TypeError(f"Gemini context caching needs ChatGoogleGenerativeAI, got {type(model).__name__}")
+        return create_context_cache(model, [system_message], ttl=f"{self.ttl}s", tools=list(tools) or None)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Summary:
+            Reports prefix cache counters.
+
+        Returns:
+            Dict[str, Any]: Backend, cached prefixes, hits, misses and the
+                estimated number of prompt tokens served from the cache.
+        """
+        with self._lock:
+            return {
+                "backend": self.backend,
+                "prefixes": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "tokens_saved": self.tokens_saved,
+            }
+
+
+class PromptPrefixCacheMiddleware(AgentMiddleware):
+    """
+    Summary:
+        Agent middleware that routes model calls through the prefix cache.
+
+    Args:
+        cache (PromptPrefixCache): Prefix cache to use.
+    """
+
+    def __init__(self, cache: PromptPrefixCache):
+        super().__init__()
+        self.cache = cache
+
+    def _prepare(self, request: ModelRequest) -> ModelRequest:
+        """
+        Summary:
+            Replaces the system prompt and tools with a cache reference.
+
+        Args:
+            request (ModelRequest): Model request built by the agent.
+
+        Returns:
+            ModelRequest: Request to send to the model.
+        """
+        system, messages = request.system_message, request.messages
+        # main.py and batch.py pass the system prompt as the first message
+        if system is None and messages and isinstance(messages[0], SystemMessage):
+            system, messages = messages[0], messages[1:]
+        if system is None:
+            return request
+
+        handle = self.cache.resolve(request.model, system, request.tools)
+        if handle is None or not self.cache.references_prefix:
+            return request
+        return request.override(
+            messages=list(messages),
+            system_message=None,
+            tools=[],
+            tool_choice=None,
+            model_settings={**request.model_settings, "cached_content": handle},
+        )
+
+    def wrap_model_call(self, request: ModelRequest, handler: Callable) -> Any:
+        return handler(self._prepare(request))
+
+    async def awrap_model_call(self, request: ModelRequest, handler: Callable) -> Any:
+        # Creating a cache entry is a blocking API call
+        request = await asyncio.to_thread(self._prepare, request)
+        return await handler(request)
+
+
+prompt_cache = PromptPrefixCache(PROMPT_CACHE_BACKEND) if PROMPT_CACHE_BACKEND else None
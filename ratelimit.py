@@ -0,0 +1,709 @@
+"""
+Backend Rate Limiting Module
+
+Summary:
+This module throttles calls to the external backends (Gemini, SerpAPI) so
+that concurrent agent runs stay within their quotas instead of running
+into HTTP 429 errors.
+
+Description:
+- `TokenBucket` enforces a per-minute quota (requests or tokens). Callers
+  reserve capacity up front and wait until their reservation is covered,
+  so waiting callers are served in arrival order. Token reservations are
+  estimates and are settled with the real usage after the call.
+- `AdaptiveConcurrency` bounds the calls in flight with an AIMD
+  (additive-increase, multiplicative-decrease) limit: every successful call
+  grows the limit by about one slot per window of calls, an overload
+  response (429 or 5xx) halves it. Only calls started after the last
+  decrease can decrease it again, so one burst of 429s counts once.
+- `RateLimiter` combines both for one backend and retries overloaded calls
+  with exponential backoff and full jitter, honouring `Retry-After`.
+- Limiters are configured per backend in `RATE_LIMITS` (config.py) and
+  shared process-wide through `get_limiter(name)`.
+- `RateLimitedChatModel` applies the Gemini limiter to every request the
+  model sends to the backend, after LangChain's response cache lookup, so
+  cached answers never use up quota; `SerpApiHttpClient` applies the
+  SerpAPI limiter to every HTTP attempt. Offline fakes are never throttled.
+
+Wait time, overloads and retries are exported as the
+`agent_ratelimit_wait_seconds`, `agent_ratelimit_overloads_total` and
+`agent_ratelimit_retries_total` metrics.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, Optional
+
+from langchain_core.language_models import BaseChatModel
+
+from config import (
+    RATE_LIMIT_ENABLED,
+    RATE_LIMITS,
+    RATE_LIMIT_RETRIES,
+    RATE_LIMIT_BACKOFF,
+    RATE_LIMIT_MAX_BACKOFF,
+)
+from logger_config import setup_logger
+from metrics import registry
+
+# Initialize logger for this module
+logger = setup_logger(__name__)
+
+_OVERLOAD_STATUS = {429, 500, 502, 503, 504}
+
+
+def status_code(error: BaseException) -> Optional[int]:
+    """
+    Summary:
+        Extracts the HTTP status of a backend error, following the exception chain.
+
+    Args:
+        error (BaseException): Error raised by a backend client.
+
+    Returns:
+        Optional[int]: Status code, or None if the error carries none.
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        for candidate in (
+            getattr(error, "status_code", None),
+            getattr(error, "code", None),
+            getattr(getattr(error, "response", None), "status_code", None),
+        ):
+            if isinstance(candidate, int):
+                return candidate
+        error = error.__cause__ or error.__context__
+    return None
+
+
+def is_overload(error: BaseException) -> bool:
+    """Whether `error` means the backend is overloaded or out of quota (429/5xx)."""
+    return status_code(error) in _OVERLOAD_STATUS
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """
+    Summary:
+        Reads the `Retry-After` header (in seconds) from a backend error.
+
+    Args:
+        error (BaseException): Error raised by a backend client.
+
+    Returns:
+        Optional[float]: Seconds the backend asked to wait, if any.
+    """
+    while error is not None:
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None)
+        if headers is not None:
+            try:
+                return float(headers.get("retry-after"))
+            except (TypeError, ValueError):
+                return None
+        error = error.__cause__
+    return None
+
+
+def backoff_delay(
+    attempt: int,
+    base: float = RATE_LIMIT_BACKOFF,
+    cap: float = RATE_LIMIT_MAX_BACKOFF,
+    hint: Optional[float] = None,
+) -> float:
+    """
+    Summary:
+        Exponential backoff with full jitter, at least the backend's hint.
+
+    Args:
+        attempt (int): Zero-based retry attempt.
+        base (float): Base delay in seconds.
+        cap (float): Upper bound of the exponential term in seconds.
+        hint (Optional[float]): `Retry-After` value, if the backend sent one.
+
+    Returns:
+        float: Seconds to wait before the next attempt.
+    """
+    delay = random.uniform(0, min(cap, base * (2 ** attempt)))
+    return max(delay, hint or 0.0)
+
+
+class TokenBucket:
+    """
+    Summary:
+        Thread-safe token bucket refilled at a per-minute rate.
+
+    Args:
+        per_minute (float): Quota refilled per minute.
+        burst (Optional[float]): Bucket capacity (defaults to the per-minute quota).
+    """
+
+    def __init__(self, per_minute: float, burst: Optional[float] = None):
+        self.capacity = float(burst or per_minute)
+        self.rate = per_minute / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float = 1.0) -> float:
+        """
+        Summary:
+            Takes `amount` from the bucket, going into debt if needed.
+
+        Args:
+            amount (float): Quota units to consume (capped at the capacity).
+
+        Returns:
+            float: Seconds the caller must wait before its reservation is covered.
+        """
+        with self._lock:
+            self._refill()
+            self._tokens -= min(amount, self.capacity)
+            return max(0.0, -self._tokens / self.rate)
+
+    def settle(self, amount: float) -> None:
+        """
+        Summary:
+            Corrects an earlier reservation once the real usage is known.
+
+        Args:
+            amount (float): Extra units used (positive) or units to refund (negative).
+        """
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens - amount)
+
+
+class AdaptiveConcurrency:
+    """
+    Summary:
+        AIMD concurrency limit shared by threads and event loops.
+
+    Args:
+        initial (int): Starting limit.
+        minimum (int): Lowest limit after decreases.
+        maximum (int): Highest limit after increases.
+        decrease (float): Factor applied to the limit on overload.
+    """
+
+    def __init__(self, initial: int = 4, minimum: int = 1, maximum: int = 32, decrease: float = 0.5):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.decrease = decrease
+        self._limit = float(min(max(initial, self.minimum), self.maximum))
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._waiters: deque = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self) -> int:
+        """Current number of calls allowed in flight."""
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        """Number of calls currently holding a slot."""
+        return self._in_flight
+
+    def _try_enter(self) -> bool:
+        if self._in_flight < int(self._limit):
+            self._in_flight += 1
+            return True
+        return False
+
+    def _wake(self) -> None:
+        # Called with the lock held; woken waiters re-check the limit themselves.
+        # A waiter returns False when it was abandoned, so its slot goes to the next
+        free = int(self._limit) - self._in_flight
+        while free > 0 and self._waiters:
+            if self._waiters.popleft()():
+                free -= 1
+
+    def acquire(self) -> float:
+        """
+        Summary:
+            Blocks until a slot is free.
+
+        Returns:
+            float: Start time of the call, to pass to `release`.
+        """
+        while True:
+            with self._lock:
+                if self._try_enter():
+                    return time.monotonic()
+                event = threading.Event()
+                self._waiters.append(lambda: event.set() or True)
+            event.wait()
+
+    async def aacquire(self) -> float:
+        """
+        Summary:
+            Async variant of `acquire`; waits without blocking the event loop.
+
+        Returns:
+            float: Start time of the call, to pass to `release`.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                if self._try_enter():
+                    return time.monotonic()
+                future = loop.create_future()
+
+                def wake(future=future) -> bool:
+                    if future.done():
+                        return False
+                    loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+                    return True
+
+                self._waiters.append(wake)
+            try:
+                await future
+            except asyncio.CancelledError:
+                with self._lock:
+                    try:
+                        self._waiters.remove(wake)
+                    except ValueError:
+                        # Already woken: hand the wake-up on to the next waiter
+                        self._wake()
+                raise
+
+    def release(self, started: float, overloaded: bool = False) -> None:
+        """
+        Summary:
+            Frees a slot and adapts the limit to the call's outcome.
+
+        Args:
+            started (float): Value returned by `acquire`.
+            overloaded (bool): Whether the backend answered 429/5xx.
+        """
+        with self._lock:
+            self._in_flight -= 1
+            if overloaded:
+                if started >= self._last_decrease:
+                    self._limit = max(self.minimum, self._limit * self.decrease)
+                    self._last_decrease = time.monotonic()
+                    logger.warning(f"Backend overloaded, concurrency limit lowered to {self.limit}")
+            else:
+                self._limit = min(self.maximum, self._limit + 1.0 / self._limit)
+            self._wake()
+
+
+class RateLimiter:
+    """
+    Summary:
+        Request/token quotas plus adaptive concurrency for one backend.
+
+    Args:
+        name (str): Backend name used in logs and metrics.
+        requests_per_minute (Optional[float]): Request quota (None = unlimited).
+        tokens_per_minute (Optional[float]): Token quota (None = unlimited).
+        initial_concurrency (int): Starting concurrency limit.
+        max_concurrency (int): Upper bound of the concurrency limit.
+        min_concurrency (int): Lower bound of the concurrency limit.
+        retries (int): Retries of overloaded calls in `call`/`acall`.
+        backoff (float): Base retry delay in seconds.
+        max_backoff (float): Upper bound of the exponential retry delay.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        initial_concurrency: int = 4,
+        max_concurrency: int = 32,
+        min_concurrency: int = 1,
+        retries: int = RATE_LIMIT_RETRIES,
+        backoff: float = RATE_LIMIT_BACKOFF,
+        max_backoff: float = RATE_LIMIT_MAX_BACKOFF,
+    ):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.concurrency = AdaptiveConcurrency(initial_concurrency, min_concurrency, max_concurrency)
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def _quota_wait(self, tokens: float) -> float:
+        wait = self.requests.reserve(1) if self.requests else 0.0
+        if self.tokens and tokens:
+            wait = max(wait, self.tokens.reserve(tokens))
+        return wait
+
+    def _record_wait(self, seconds: float) -> None:
+        registry.histogram("agent_ratelimit_wait_seconds", "Time calls waited for quota or a concurrency slot").observe(
+            seconds, backend=self.name
+        )
+
+    def acquire(self, tokens: float = 0) -> float:
+        """
+        Summary:
+            Waits for a concurrency slot and the request/token quota.
+
+        Args:
+            tokens (float): Estimated tokens the call will consume.
+
+        Returns:
+            float: Start time to pass to `release`.
+        """
+        start = time.perf_counter()
+        started = self.concurrency.acquire()
+        wait = self._quota_wait(tokens)
+        if wait:
+            time.sleep(wait)
+        self._record_wait(time.perf_counter() - start)
+        return started
+
+    async def aacquire(self, tokens: float = 0) -> float:
+        """
+        Summary:
+            Async variant of `acquire`.
+
+        Args:
+            tokens (float): Estimated tokens the call will consume.
+
+        Returns:
+            float: Start time to pass to `release`.
+        """
+        start = time.perf_counter()
+        started = await self.concurrency.aacquire()
+        try:
+            wait = self._quota_wait(tokens)
+            if wait:
+                await asyncio.sleep(wait)
+        except asyncio.CancelledError:
+            self.concurrency.release(started)
+            raise
+        self._record_wait(time.perf_counter() - start)
+        return started
+
+    def release(self, started: float, overloaded: bool = False, tokens_used: Optional[float] = None,
+                tokens_reserved: float = 0) -> None:
+        """
+        Summary:
+            Frees the call's slot and settles its token reservation.
+
+        Args:
+            started (float): Value returned by `acquire`.
+            overloaded (bool): Whether the backend answered 429/5xx.
+            tokens_used (Optional[float]): Real token usage, if reported.
+            tokens_reserved (float): Tokens reserved by `acquire`.
+        """
+        if self.tokens and tokens_used is not None:
+            self.tokens.settle(tokens_used - tokens_reserved)
+        if overloaded:
+            registry.counter("agent_ratelimit_overloads_total", "Backend 429/5xx responses").inc(backend=self.name)
+        self.concurrency.release(started, overloaded)
+
+    def _retry_delay(self, attempt: int, error: BaseException) -> float:
+        delay = backoff_delay(attempt, self.backoff, self.max_backoff, hint=retry_after(error))
+        registry.counter("agent_ratelimit_retries_total", "Retries of overloaded backend calls").inc(backend=self.name)
+        logger.warning(f"[{self.name}] overloaded ({status_code(error)}), retrying in {delay:.2f}s")
+        return delay
+
+    def call(self, fn: Callable[[], Any], tokens: float = 0,
+             usage: Optional[Callable[[Any], Optional[float]]] = None) -> Any:
+        """
+        Summary:
+            Runs `fn` within the limits, retrying overloaded calls with jitter.
+
+        Args:
+            fn (Callable[[], Any]): The backend call.
+            tokens (float): Estimated tokens per attempt.
+            usage (Optional[Callable[[Any], Optional[float]]]): Extracts the
+                real token usage from the result.
+
+        Returns:
+            Any: Result of `fn`.
+        """
+        for attempt in range(self.retries + 1):
+            started = self.acquire(tokens)
+            try:
+                result = fn()
+            except Exception as e:
+                overloaded = is_overload(e)
+                self.release(started, overloaded)
+                if not overloaded or attempt >= self.retries:
+                    raise
+                time.sleep(self._retry_delay(attempt, e))
+                continue
+            self.release(started, tokens_used=usage(result) if usage else None, tokens_reserved=tokens)
+            return result
+
+    async def acall(self, fn: Callable[[], Awaitable[Any]], tokens: float = 0,
+                    usage: Optional[Callable[[Any], Optional[float]]] = None) -> Any:
+        """
+        Summary:
+            Async variant of `call` for coroutine functions.
+
+        Args:
+            fn (Callable[[], Awaitable[Any]]): The backend call.
+            tokens (float): Estimated tokens per attempt.
+            usage (Optional[Callable[[Any], Optional[float]]]): Extracts the
+                real token usage from the result.
+
+        Returns:
+            Any: Result of `fn`.
+        """
+        for attempt in range(self.retries + 1):
+            started = await self.aacquire(tokens)
+            try:
+                result = await fn()
+            except asyncio.CancelledError:
+                self.release(started)
+                raise
+            except Exception as e:
+                overloaded = is_overload(e)
+                self.release(started, overloaded)
+                if not overloaded or attempt >= self.retries:
+                    raise
+                await asyncio.sleep(self._retry_delay(attempt, e))
+                continue
+            self.release(started, tokens_used=usage(result) if usage else None, tokens_reserved=tokens)
+            return result
+
+    def stream(self, fn: Callable[[], Iterator[Any]], tokens: float = 0,
+               usage: Optional[Callable[[Any], Optional[float]]] = None) -> Iterator[Any]:
+        """
+        Summary:
+            Streams the items of `fn()` within the limits, holding the slot
+            until the stream ends. Overloaded calls are retried only while
+            nothing has been yielded yet.
+
+        Args:
+            fn (Callable[[], Iterator[Any]]): Starts the backend stream.
+            tokens (float): Estimated tokens per attempt.
+            usage (Optional[Callable[[Any], Optional[float]]]): Extracts the
+                token usage of one item; the items' usage is summed.
+
+        Yields:
+            Any: Items of the stream.
+        """
+        for attempt in range(self.retries + 1):
+            started = self.acquire(tokens)
+            used, yielded, overloaded = None, False, False
+            try:
+                for item in fn():
+                    yielded = True
+                    item_tokens = usage(item) if usage else None
+                    if item_tokens is not None:
+                        used = (used or 0) + item_tokens
+                    yield item
+                return
+            except Exception as e:
+                overloaded = is_overload(e)
+                if not overloaded or yielded or attempt >= self.retries:
+                    raise
+                delay = self._retry_delay(attempt, e)
+            finally:
+                self.release(started, overloaded, tokens_used=used, tokens_reserved=tokens)
+            time.sleep(delay)
+
+    async def astream(self, fn: Callable[[], AsyncIterator[Any]], tokens: float = 0,
+                      usage: Optional[Callable[[Any], Optional[float]]] = None) -> AsyncIterator[Any]:
+        """
+        Summary:
+            Async variant of `stream`.
+
+        Args:
+            fn (Callable[[], AsyncIterator[Any]]): Starts the backend stream.
+            tokens (float): Estimated tokens per attempt.
+            usage (Optional[Callable[[Any], Optional[float]]]): Extracts the
+                token usage of one item; the items' usage is summed.
+
+        Yields:
+            Any: Items of the stream.
+        """
+        for attempt in range(self.retries + 1):
+            started = await self.aacquire(tokens)
+            used, yielded, overloaded = None, False, False
+            try:
+                async for item in fn():
+                    yielded = True
+                    item_tokens = usage(item) if usage else None
+                    if item_tokens is not None:
+                        used = (used or 0) + item_tokens
+                    yield item
+                return
+            except Exception as e:
+                overloaded = is_overload(e)
+                if not overloaded or yielded or attempt >= self.retries:
+                    raise
+                delay = self._retry_delay(attempt, e)
+            finally:
+                self.release(started, overloaded, tokens_used=used, tokens_reserved=tokens)
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        """Current concurrency limit and calls in flight."""
+        return {"backend": self.name, "limit": self.concurrency.limit, "in_flight": self.concurrency.in_flight}
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name: str) -> Optional[RateLimiter]:
+    """
+    Summary:
+        Returns the shared limiter of a backend configured in `RATE_LIMITS`.
+
+    Args:
+        name (str): Backend name, e.g. `"gemini"` or `"serpapi"`.
+
+    Returns:
+        Optional[RateLimiter]: The limiter, or None when rate limiting is
+            disabled or the backend is not configured.
+    """
+    if not RATE_LIMIT_ENABLED or name not in RATE_LIMITS:
+        return None
+    with _limiters_lock:
+        if name not in _limiters:
+            _limiters[name] = RateLimiter(name, **RATE_LIMITS[name])
+        return _limiters[name]
+
+
+def model_limiter(model: Any) -> Optional[RateLimiter]:
+    """
+    Summary:
+        Returns the limiter for a chat model's backend (Gemini models only).
+
+    Args:
+        model (Any): Chat model instance.
+
+    Returns:
+        Optional[RateLimiter]: The `"gemini"` limiter, or None for other models.
+    """
+    if getattr(model, "_llm_type", None) != "chat-google-generative-ai":
+        return None
+    return get_limiter("gemini")
+
+
+def estimate_request_tokens(messages: Any, max_output_tokens: int = 0) -> int:
+    """
+    Summary:
+        Estimates the tokens a model request will consume.
+
+    Args:
+        messages (Any): Request messages.
+        max_output_tokens (int): Output tokens to reserve.
+
+    Returns:
+        int: Approximate prompt plus output tokens.
+    """
+    from prompt_budget import estimate_tokens
+
+    return sum(estimate_tokens(str(m.content)) for m in messages) + max_output_tokens
+
+
+def _usage_tokens(message: Any) -> Optional[float]:
+    usage = getattr(message, "usage_metadata", None)
+    return usage.get("total_tokens") if usage else None
+
+
+def _result_tokens(result: Any) -> Optional[float]:
+    generations = getattr(result, "generations", None)
+    return _usage_tokens(generations[0].message) if generations else None
+
+
+def _chunk_tokens(chunk: Any) -> Optional[float]:
+    return _usage_tokens(chunk.message)
+
+
+class RateLimitedChatModel:
+    """
+    Summary:
+        Chat model mixin that runs every backend request through the model's limiter.
+
+    Description:
+        LangChain looks a request up in the model's response cache before it
+        calls `_generate`/`_stream`, so cache hits never reserve quota or a
+        concurrency slot. Streams hold their slot until the last chunk.
+        Build the limited variant of a model class with `rate_limited(cls)`.
+    """
+
+    def _request_limits(self, messages: Any):
+        limiter = model_limiter(self)
+        if limiter is None:
+            return None, 0
+        return limiter, estimate_request_tokens(messages, getattr(self, "max_output_tokens", None) or 0)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        generate = super()._generate
+        limiter, tokens = self._request_limits(messages)
+        if limiter is None:
+            return generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        return limiter.call(
+            lambda: generate(messages, stop=stop, run_manager=run_manager, **kwargs),
+            tokens=tokens, usage=_result_tokens,
+        )
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        agenerate = super()._agenerate
+        limiter, tokens = self._request_limits(messages)
+        if limiter is None:
+            return await agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        return await limiter.acall(
+            lambda: agenerate(messages, stop=stop, run_manager=run_manager, **kwargs),
+            tokens=tokens, usage=_result_tokens,
+        )
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        stream = super()._stream
+        limiter, tokens = self._request_limits(messages)
+        if limiter is None:
+            return stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+        return limiter.stream(
+            lambda: stream(messages, stop=stop, run_manager=run_manager, **kwargs),
+            tokens=tokens, usage=_chunk_tokens,
+        )
+
+    def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        astream = super()._astream
+        limiter, tokens = self._request_limits(messages)
+        if limiter is None:
+            return astream(messages, stop=stop, run_manager=run_manager, **kwargs)
+        return limiter.astream(
+            lambda: astream(messages, stop=stop, run_manager=run_manager, **kwargs),
+            tokens=tokens, usage=_chunk_tokens,
+        )
+
+
+_limited_classes: Dict[type, type] = {}
+
+
+def rate_limited(model_cls: type) -> type:
+    """
+    Summary:
+        Returns a subclass of a chat model class whose backend requests are rate limited.
+
+    Args:
+        model_cls (type): Chat model class, e.g. `ChatGoogleGenerativeAI`.
+
+    Returns:
+        type: The class with `RateLimitedChatModel` mixed in (memoized).
+    """
+    with _limiters_lock:
+        if model_cls not in _limited_classes:
+            # LangChain falls back to `_generate` for the methods a model leaves at
+            # their BaseChatModel default; keep those, so no request is limited twice
+            namespace = {
+                name: getattr(BaseChatModel, name)
+                for name in ("_agenerate", "_stream", "_astream")
+                if getattr(model_cls, name) is getattr(BaseChatModel, name)
+            }
+            # Same name and module, so serialized models (and LLM cache keys) are unchanged
+            namespace.update(__module__=model_cls.__module__, __qualname__=model_cls.__qualname__)
+            _limited_classes[model_cls] = type(model_cls.__name__, (RateLimitedChatModel, model_cls), namespace)
+        return _limited_classes[model_cls]
@@ -0,0 +1,244 @@
+"""
+Pooled SerpAPI HTTP Client Module
+
+Summary:
+This module talks to the SerpAPI search endpoint over pooled keep-alive
+HTTP connections, with a synchronous and an asyncio-native entry point.
+
+Description:
+- `SerpApiHttpClient.search()` mirrors `serpapi.Client.search()` (same
+  parameters, same JSON response) on a shared `httpx.Client`.
+- `SerpApiHttpClient.asearch()` is the non-blocking variant used by the
+  async `web_search_tool` path. It runs on an `httpx.AsyncClient`, one per
+  event loop because async connections are bound to the loop that opened them.
+- Both pools are limited to `SEARCH_HTTP_POOL_SIZE` connections, keep idle
+  connections alive for `SEARCH_HTTP_KEEPALIVE_EXPIRY` seconds and apply
+  `SEARCH_HTTP_TIMEOUT` / `SEARCH_HTTP_CONNECT_TIMEOUT`, clamped to the time
+  left before the current request's deadline (deadline.py).
+- Connection errors, timeouts, HTTP 429 and 5xx responses are retried up to
+  `SEARCH_HTTP_RETRIES` times with exponential backoff and jitter
+  (`SEARCH_HTTP_BACKOFF` seconds base, or longer if the response carries
+  `Retry-After`) unless the wait would pass the deadline; other HTTP
+  errors fail immediately.
+- With a `ratelimit.RateLimiter`, every attempt first waits for the SerpAPI
+  request quota and a concurrency slot; 429/5xx responses lower the
+  adaptive concurrency limit.
+"""
+
+import asyncio
+import random
+import threading
+import time
+import weakref
+from typing import Any, Dict, Optional
+
+import httpx
+
+from config import (
+    SEARCH_HTTP_POOL_SIZE,
+    SEARCH_HTTP_KEEPALIVE_EXPIRY,
+    SEARCH_HTTP_TIMEOUT,
+    SEARCH_HTTP_CONNECT_TIMEOUT,
+    SEARCH_HTTP_RETRIES,
+    SEARCH_HTTP_BACKOFF,
+)
+from deadline import remaining_timeout
+from logger_config import setup_logger
+
+# Initialize logger for this module
+logger = setup_logger(__name__)
+
+SERPAPI_SEARCH_URL = "https://serpapi.com/search"
+_RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+def _backoff_delay(attempt: int, base: float = SEARCH_HTTP_BACKOFF, hint: Optional[float] = None) -> float:
+    """
+    Summary:
+        Exponential backoff with full jitter for a retry attempt.
+
+    Args:
+        attempt (int): Zero-based retry attempt.
+        base (float): Base delay in seconds.
+        hint (Optional[float]): `Retry-After` seconds sent by the server.
+
+    Returns:
+        float: Seconds to wait before the next attempt.
+    """
+    return max(random.uniform(0, base * (2 ** attempt)), hint or 0.0)
+
+
+def _is_retryable(error: Optional[Exception], response: Optional[httpx.Response]) -> bool:
+    if error is not None:
+        return isinstance(error, httpx.TransportError)
+    return _is_overload(response)
+
+
+def _is_overload(response: Optional[httpx.Response]) -> bool:
+    return response is not None and response.status_code in _RETRY_STATUS
+
+
+def _retry_hint(response: Optional[httpx.Response]) -> Optional[float]:
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def _raise_for_status(response: httpx.Response) -> None:
+    # httpx's own message includes the request URL, which carries the API key
+    raise httpx.HTTPStatusError(
+        f"SerpAPI returned HTTP {response.status_code}: {response.text[:200]}",
+        request=response.request,
+        response=response,
+    )
+
+
+class SerpApiHttpClient:
+    """
+    Summary:
+        SerpAPI client with pooled sync/async sessions and retries.
+
+    Args:
+        api_key (str): SerpAPI key.
+        pool_size (int): Maximum connections per pool.
+        timeout (float): Read/write/pool timeout in seconds.
+        connect_timeout (float): Connect timeout in seconds.
+        retries (int): Retries after the first attempt.
+        limiter (Optional[RateLimiter]): Quota and adaptive concurrency
+            limiter applied to every attempt.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        pool_size: int = SEARCH_HTTP_POOL_SIZE,
+        timeout: float = SEARCH_HTTP_TIMEOUT,
+        connect_timeout: float = SEARCH_HTTP_CONNECT_TIMEOUT,
+        retries: int = SEARCH_HTTP_RETRIES,
+        limiter: Any = None,
+    ):
+        self.api_key = api_key
+        self.limiter = limiter
+        self.retries = max(0, retries)
+        self._limits = httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=SEARCH_HTTP_KEEPALIVE_EXPIRY,
+        )
+        self._timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self._client: Optional[httpx.Client] = None
+        self._async_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _params(self, params: Optional[Dict[str, Any]], kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        merged = dict(params or {})
+        merged.update(kwargs)
+        merged.setdefault("api_key", self.api_key)
+        merged.setdefault("output", "json")
+        return merged
+
+    @property
+    def session(self) -> httpx.Client:
+        """Shared synchronous connection pool."""
+        with self._lock:
+            if self._client is None:
+                self._client = httpx.Client(limits=self._limits, timeout=self._timeout)
+            return self._client
+
+    def async_session(self) -> httpx.AsyncClient:
+        """Connection pool for the running event loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = httpx.AsyncClient(limits=self._limits, timeout=self._timeout)
+                self._async_clients[loop] = client
+            return client
+
+    def _request_timeout(self) -> httpx.Timeout:
+        # Never wait past the current request's deadline (deadline.py)
+        read = remaining_timeout(self._timeout.read)
+        return httpx.Timeout(read, connect=min(self._timeout.connect, read))
+
+    def search(self, params: Optional[Dict[str, Any]] = None, **kwargs) -> Dict[str, Any]:
+        """
+        Summary:
+            Runs a SerpAPI search on the shared synchronous pool.
+
+        Args:
+            params (Optional[Dict[str, Any]]): SerpAPI request parameters.
+            **kwargs: Extra parameters merged into `params`.
+
+        Returns:
+            Dict[str, Any]: Decoded JSON response.
+        """
+        params = self._params(params, kwargs)
+        for attempt in range(self.retries + 1):
+            error, response = None, None
+            started = self.limiter.acquire() if self.limiter else None
+            try:
+                response = self.session.get(SERPAPI_SEARCH_URL, params=params, timeout=self._request_timeout())
+            except httpx.HTTPError as e:
+                error = e
+            finally:
+                if self.limiter:
+                    self.limiter.release(started, overloaded=_is_overload(response))
+            if error is None and response.status_code == 200:
+                return response.json()
+            if attempt >= self.retries or not _is_retryable(error, response):
+                break
+            delay = _backoff_delay(attempt, hint=_retry_hint(response))
+            if delay >= (remaining_timeout(None) or float("inf")):
+                break  # the request deadline would pass before the retry
+            logger.warning(f"SerpAPI request failed ({error or response.status_code}), retrying in {delay:.2f}s")
+            time.sleep(delay)
+
+        if error is not None:
+            raise error
+        _raise_for_status(response)
+
+    async def asearch(self, params: Optional[Dict[str, Any]] = None, **kwargs) -> Dict[str, Any]:
+        """
+        Summary:
+            Async variant of `search` on the event loop's pool.
+
+        Args:
+            params (Optional[Dict[str, Any]]): SerpAPI request parameters.
+            **kwargs: Extra parameters merged into `params`.
+
+        Returns:
+            Dict[str, Any]: Decoded JSON response.
+        """
+        params = self._params(params, kwargs)
+        session = self.async_session()
+        for attempt in range(self.retries + 1):
+            error, response = None, None
+            started = await self.limiter.aacquire() if self.limiter else None
+            try:
+                response = await session.get(SERPAPI_SEARCH_URL, params=params, timeout=self._request_timeout())
+            except httpx.HTTPError as e:
+                error = e
+            finally:
+                if self.limiter:
+                    self.limiter.release(started, overloaded=_is_overload(response))
+            if error is None and response.status_code == 200:
+                return response.json()
+            if attempt >= self.retries or not _is_retryable(error, response):
+                break
+            delay = _backoff_delay(attempt, hint=_retry_hint(response))
+            if delay >= (remaining_timeout(None) or float("inf")):
+                break  # the request deadline would pass before the retry
+            logger.warning(f"SerpAPI request failed ({error or response.status_code}), retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+        if error is not None:
+            raise error
+        _raise_for_status(response)
+
+    def close(self) -> None:
+        """Closes the synchronous pool (async pools close with their loop)."""
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
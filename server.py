@@ -0,0 +1,365 @@
+"""
+Agent Serving Module
+
+Summary:
+This module keeps one warm agent in a long-lived process and serves
+queries over HTTP or a stdin/stdout JSONL stream.
+
+Description:
+- The model, SerpAPI client and agent graph are built once at startup and
+  reused for every request, so HTTP keep-alive pools and TLS sessions to
+  Gemini and SerpAPI stay warm between queries.
+- Requests are executed on a single background asyncio event loop through
+  `agent.ainvoke`, limited by a semaphore (`SERVER_MAX_CONCURRENCY`).
+- Every request runs under a deadline and step budget (deadline.py), the
+  server timeout unless the request sets `deadline_s` / `max_steps`; runs
+  that hit it answer with status "partial" and every result carries its
+  timing breakdown.
+- `AgentServer.stats()` reports queue depth (requests waiting for a slot),
+  in-flight count and completion counters.
+- HTTP mode: `POST /invoke` with `{"query": "..."}` (or `{"messages": [...]}`),
+  `GET /stats` for counters, `GET /metrics` for tool, LLM and agent
+  metrics in Prometheus text format (see metrics.py) and `GET /health`
+  for liveness.
+- JSONL mode: one request object per stdin line, one result per stdout
+  line in completion order; a line `{"op": "stats"}` prints counters and
+  `{"op": "metrics"}` a JSON metrics snapshot.
+- `use_fake_backends()` swaps in the offline stand-ins from fakes.py.
+"""
+
+import asyncio
+import json
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+from agent import get_agent, reset_agent
+from batch import item_budget, normalize_message_set
+from config import SERVER_MAX_CONCURRENCY, SERVER_REQUEST_TIMEOUT, AGENT_MAX_STEPS
+from deadline import deadline_config, deadline_scope, hard_timeout
+from logger_config import setup_logger
+from metrics import render_prometheus, snapshot, start_snapshot_writer
+from tracing import callback_config, span
+
+# Initialize logger for this module
+logger = setup_logger(__name__)
+
+
+def use_fake_backends(model_latency: float = 0.0, search_latency: float = 0.0) -> None:
+    """
+    Summary:
+        Replaces Gemini and SerpAPI with the offline fakes from fakes.py.
+
+    Args:
+        model_latency (float): Injected latency per model call, in seconds.
+        search_latency (float): Injected latency per search call, in seconds.
+    """
+    from client import set_model, set_search_client
+    from fakes import FakeChatModel, FakeSearchClient
+
+    set_model(FakeChatModel(latency=model_latency))
+    set_search_client(FakeSearchClient(latency=search_latency))
+    reset_agent()
+
+
+class AgentServer:
+    """
+    Summary:
+        Runs agent requests on a dedicated event loop with bounded concurrency.
+
+    Args:
+        max_concurrency (int): Maximum number of agent invocations in flight.
+        timeout (Optional[float]): Default per-request deadline in seconds.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = SERVER_MAX_CONCURRENCY,
+        timeout: Optional[float] = SERVER_REQUEST_TIMEOUT,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+
+        self._queued = 0
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+        self._next_id = 0
+        self._started_at = time.time()
+        self._lock = threading.Lock()
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="agent-server-loop", daemon=True)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def start(self) -> "AgentServer":
+        """
+        Summary:
+            Builds the agent (warming up all clients) and starts the event loop.
+
+        Returns:
+            AgentServer: The started server.
+        """
+        get_agent()
+        start_snapshot_writer()
+        self._thread.start()
+        self._semaphore = asyncio.run_coroutine_threadsafe(self._make_semaphore(), self._loop).result()
+        logger.info(f"Agent server started (max_concurrency={self.max_concurrency}, timeout={self.timeout})")
+        return self
+
+    async def _make_semaphore(self) -> asyncio.Semaphore:
+        return asyncio.Semaphore(self.max_concurrency)
+
+    def stop(self) -> None:
+        """Stops the event loop thread."""
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        logger.info("Agent server stopped")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Summary:
+            Reports queue depth, in-flight requests and completion counters.
+
+        Returns:
+            Dict[str, Any]: Current server counters.
+        """
+        with self._lock:
+            return {
+                "queue_depth": self._queued,
+                "in_flight": self._in_flight,
+                "completed": self._completed,
+                "failed": self._failed,
+                "max_concurrency": self.max_concurrency,
+                "uptime_s": round(time.time() - self._started_at, 1),
+            }
+
+    def submit(self, request: Dict[str, Any]) -> Future:
+        """
+        Summary:
+            Schedules a request from any thread.
+
+        Args:
+            request (Dict[str, Any]): `{"query": ...}` or `{"messages": [...]}`,
+                with an optional `id`.
+
+        Returns:
+            Future: Resolves to the result dictionary.
+        """
+        with self._lock:
+            self._queued += 1
+            index = self._next_id
+            self._next_id += 1
+        return asyncio.run_coroutine_threadsafe(self._handle(request, index), self._loop)
+
+    async def _handle(self, request: Dict[str, Any], index: int) -> Dict[str, Any]:
+        """
+        Summary:
+            Executes one request once a concurrency slot is free.
+
+        Args:
+            request (Dict[str, Any]): Raw request payload.
+            index (int): Server-assigned sequence number (fallback id).
+
+        Returns:
+            Dict[str, Any]: Result dictionary in the batch runner's format.
+        """
+        request_id = request.get("id", index) if isinstance(request, dict) else index
+        result = {"id": str(request_id), "status": "ok", "output": None, "error": None, "elapsed_s": 0.0}
+
+        async with self._semaphore:
+            with self._lock:
+                self._queued -= 1
+                self._in_flight += 1
+
+            start = time.perf_counter()
+            deadline = None
+            try:
+                try:
+                    if not isinstance(request, dict):
+                        raise ValueError(f"Request must be a JSON object, got {type(request).__name__}")
+                    entry = normalize_message_set(request, index)
+                    result["id"] = entry["id"]
+                    seconds, max_steps = item_budget(entry, self.timeout)
+                except ValueError as e:
+                    result["status"] = "error"
+                    result["error"] = f"Invalid request: {e}"
+                    logger.error(f"[SERVER {result['id']}] Invalid request: {e}")
+                else:
+                    with deadline_scope(seconds, max_steps) as deadline:
+                        try:
+                            with span("agent.invoke", kind="agent", request_id=entry["id"]):
+                                response = await asyncio.wait_for(
+                                    get_agent().ainvoke(entry["input"], config=callback_config(**deadline_config(max_steps))),
+                                    timeout=hard_timeout(seconds),
+                                )
+                            result["output"] = response["messages"][-1].content
+                            if deadline.stop_reason:
+                                result["status"] = "partial"
+                        except asyncio.TimeoutError:
+                            result["status"] = "timeout"
+                            result["error"] = f"Timed out after {seconds}s"
+                            logger.warning(f"[SERVER {result['id']}] Timed out after {seconds}s")
+                        except Exception as e:
+                            result["status"] = "error"
+                            result["error"] = f"{type(e).__name__}: {e}"
+                            logger.error(f"[SERVER {result['id']}] Failed: {e}", exc_info=True)
+            finally:
+                result["elapsed_s"] = round(time.perf_counter() - start, 3)
+                if deadline is not None:
+                    result["timing"] = deadline.breakdown()
+                with self._lock:
+                    self._in_flight -= 1
+                    self._completed += 1
+                    if result["status"] != "ok":
+                        self._failed += 1
+
+        return result
+
+
+def _make_handler(server: AgentServer):
+    """
+    Summary:
+        Builds the HTTP request handler class bound to an AgentServer.
+
+    Args:
+        server (AgentServer): Started agent server.
+
+    Returns:
+        type: BaseHTTPRequestHandler subclass.
+    """
+
+    class AgentRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_text(self, status: int, text: str, content_type: str) -> None:
+            body = text.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._send_json(200, server.stats())
+            elif self.path == "/metrics":
+                self._send_text(200, render_prometheus(), "text/plain; version=0.0.4; charset=utf-8")
+            elif self.path == "/health":
+                self._send_json(200, {"status": "ok"})
+            else:
+                self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+        def do_POST(self):
+            if self.path != "/invoke":
+                self._send_json(404, {"error": f"Unknown path {self.path}"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+            except (ValueError, json.JSONDecodeError) as e:
+                self._send_json(400, {"error": f"Invalid JSON body: {e}"})
+                return
+            if not isinstance(request, dict):
+                self._send_json(400, {"error": "Request body must be a JSON object"})
+                return
+            result = server.submit(request).result()
+            self._send_json(200, result)
+
+        def log_message(self, format, *args):
+            logger.debug("HTTP %s - %s", self.address_string(), format % args)
+
+    return AgentRequestHandler
+
+
+def serve_http(host: str = "127.0.0.1", port: int = 8080, server: Optional[AgentServer] = None) -> None:
+    """
+    Summary:
+        Serves the agent over HTTP until interrupted.
+
+    Args:
+        host (str): Interface to bind.
+        port (int): TCP port to bind.
+        server (Optional[AgentServer]): Server to use (a new one by default).
+    """
+    server = server or AgentServer().start()
+    httpd = ThreadingHTTPServer((host, port), _make_handler(server))
+    httpd.daemon_threads = True
+    logger.info(f"Serving agent over HTTP on http://{host}:{port}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("HTTP server interrupted")
+    finally:
+        httpd.server_close()
+        server.stop()
+
+
+def serve_jsonl(infile=sys.stdin, outfile=sys.stdout, server: Optional[AgentServer] = None) -> None:
+    """
+    Summary:
+        Serves JSONL requests from a stream, writing results as they complete.
+
+    Args:
+        infile: Text stream of JSON request lines (stdin by default).
+        outfile: Text stream for JSON result lines (stdout by default).
+        server (Optional[AgentServer]): Server to use (a new one by default).
+    """
+    server = server or AgentServer().start()
+    write_lock = threading.Lock()
+    # Requests in flight; each one leaves the set once its result is written,
+    # so a long-running server does not accumulate finished futures
+    pending = set()
+    idle = threading.Condition()
+
+    def _write(payload: Dict[str, Any]) -> None:
+        with write_lock:
+            outfile.write(json.dumps(payload, ensure_ascii=False) + "\n")
+            outfile.flush()
+
+    def _finish(future: Future) -> None:
+        try:
+            _write(future.result())
+        finally:
+            with idle:
+                pending.discard(future)
+                idle.notify_all()
+
+    def _track(future: Future) -> None:
+        with idle:
+            pending.add(future)
+        future.add_done_callback(_finish)
+
+    for line in infile:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            _write({"status": "error", "error": f"Invalid JSON: {e}"})
+            continue
+        if isinstance(request, dict) and request.get("op") == "stats":
+            _write({"stats": server.stats()})
+            continue
+        if isinstance(request, dict) and request.get("op") == "metrics":
+            _write({"metrics": snapshot()})
+            continue
+        if isinstance(request, str):
+            request = {"query": request}
+        _track(server.submit(request))
+
+    with idle:
+        idle.wait_for(lambda: not pending)
+    server.stop()
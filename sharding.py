@@ -0,0 +1,213 @@
+"""
+Sharded Batch Execution Module
+
+Summary:
+This module spreads a batch workload over several worker processes, so
+message serialization, prompt templating and tool-output formatting use
+every CPU core instead of one.
+
+Description:
+- The items are cut into shards of `SHARD_SIZE` items (fewer when the
+  workload is small), which a pool of spawned worker processes picks up
+  one at a time, so a slow shard does not hold back the others.
+- Every worker builds its agent lazily on its first item (agent.py) and
+  runs each shard through `run_batch` with its own concurrency cap.
+  Workers share the on-disk search and LLM caches; their SQLite file runs
+  in WAL mode with a busy timeout (cache.py).
+- Items keep their position in the workload as `index` and, without an
+  own `id`, the position as their id. The coordinator yields results in
+  that order as soon as all earlier items are done.
+- Each worker drains its metrics after every shard and the coordinator
+  merges them into its own registry (metrics.py), so snapshots cover the
+  whole run.
+- Workers replay a cassette or use the offline fakes when the coordinator
+  does; recording needs a single process.
+"""
+
+import atexit
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing.util import Finalize
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from config import BATCH_MAX_CONCURRENCY, BATCH_ITEM_TIMEOUT, SHARD_SIZE
+from logger_config import CONSOLE_ENV, setup_logger
+from metrics import registry
+
+# Initialize logger for this module
+logger = setup_logger(__name__)
+
+
+def make_shards(items: List[Any], workers: int, shard_size: int = SHARD_SIZE) -> List[List[Tuple[int, Any]]]:
+    """
+    Summary:
+        Cuts batch items into shards that remember each item's position.
+
+    Args:
+        items (List[Any]): Raw batch items (query strings or dicts).
+        workers (int): Number of worker processes.
+        shard_size (int): Maximum items per shard.
+
+    Returns:
+        List[List[Tuple[int, Any]]]: Shards of `(index, item)` pairs; items
+            are passed on unchanged, so malformed ones fail in `run_batch`.
+    """
+    size = max(1, min(shard_size, math.ceil(len(items) / max(1, workers))))
+    indexed = list(enumerate(items))
+    return [indexed[start:start + size] for start in range(0, len(indexed), size)]
+
+
+def _item_id(index: int, item: Any) -> str:
+    # Same fallback as batch.py: the item's own id, else its position
+    return str(item["id"]) if isinstance(item, dict) and "id" in item else str(index)
+
+
+def _init_worker(backends: Dict[str, Any]) -> None:
+    """
+    Summary:
+        Prepares a worker process before its first shard.
+
+    Args:
+        backends (Dict[str, Any]): `fake_backends` flag and the `cassette`
+            (mode, path, latency) of the coordinator.
+    """
+    # Pool workers skip atexit; flush logs and close sessions on shutdown
+    Finalize(None, atexit._run_exitfuncs, exitpriority=0)
+
+    if backends.get("fake_backends"):
+        from server import use_fake_backends
+        use_fake_backends()
+    if backends.get("cassette"):
+        from cassette import use_cassette
+        use_cassette(*backends["cassette"])
+
+
+def _run_shard(shard: List[Tuple[int, Any]], max_concurrency: int, timeout: Optional[float]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Summary:
+        Runs one shard in a worker process.
+
+    Args:
+        shard (List[Tuple[int, Any]]): `(index, item)` pairs from `make_shards`.
+        max_concurrency (int): Agent invocations in flight in this worker.
+        timeout (Optional[float]): Per-item timeout in seconds.
+
+    Returns:
+        Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]: Results with their
+            workload `index`, and the worker's drained metrics.
+    """
+    from batch import run_batch
+
+    results = run_batch([item for _, item in shard], max_concurrency=max_concurrency, timeout=timeout)
+    for result in results:
+        index, item = shard[result["index"]]
+        result["index"], result["id"] = index, _item_id(index, item)
+    return results, registry.drain()
+
+
+def _failed(index: int, item: Any, error: Exception) -> Dict[str, Any]:
+    return {
+        "id": _item_id(index, item),
+        "index": index,
+        "status": "error",
+        "output": None,
+        "error": f"{type(error).__name__}: {error}",
+        "elapsed_s": 0.0,
+    }
+
+
+def iter_sharded_batch(
+    items: List[Any],
+    workers: int,
+    max_concurrency: int = BATCH_MAX_CONCURRENCY,
+    timeout: Optional[float] = BATCH_ITEM_TIMEOUT,
+    backends: Optional[Dict[str, Any]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Summary:
+        Runs batch items on worker processes and yields results in input order.
+
+    Args:
+        items (List[Any]): Raw batch items (query strings or dicts).
+        workers (int): Number of worker processes.
+        max_concurrency (int): Agent invocations in flight per worker.
+        timeout (Optional[float]): Per-item timeout in seconds.
+        backends (Optional[Dict[str, Any]]): Backend setup for the workers
+            (see `_init_worker`).
+
+    Yields:
+        Dict[str, Any]: One result per item, ordered by `index`.
+    """
+    shards = make_shards(items, workers)
+    workers = max(1, min(workers, len(shards)))
+    logger.info(
+        f"Starting sharded batch of {len(items)} items in {len(shards)} shards on {workers} workers "
+        f"(max_concurrency={max_concurrency} per worker, timeout={timeout})"
+    )
+
+    # Workers log to stderr from their first record on: stdout belongs to
+    # the coordinator's results (logger_config reads this at import)
+    os.environ[CONSOLE_ENV] = "stderr"
+    # Spawned workers inherit no threads, locks or open SQLite handles
+    context = multiprocessing.get_context("spawn")
+    pending: Dict[int, Dict[str, Any]] = {}
+    next_index = 0
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker, initargs=(backends or {},)) as pool:
+        futures = {pool.submit(_run_shard, shard, max_concurrency, timeout): shard for shard in shards}
+        try:
+            for future in as_completed(futures):
+                try:
+                    results, metrics = future.result()
+                    registry.merge(metrics)
+                except Exception as e:
+                    # A crashed worker fails its shard, not the whole workload
+                    logger.error(f"Shard of {len(futures[future])} items failed: {e}", exc_info=True)
+                    results = [_failed(index, item, e) for index, item in futures[future]]
+                for result in results:
+                    pending[result["index"]] = result
+                while next_index in pending:
+                    yield pending.pop(next_index)
+                    next_index += 1
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def run_sharded_batch(
+    items: List[Any],
+    workers: int,
+    max_concurrency: int = BATCH_MAX_CONCURRENCY,
+    timeout: Optional[float] = BATCH_ITEM_TIMEOUT,
+    on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+    backends: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Summary:
+        Synchronous entry point for `iter_sharded_batch`.
+
+    Args:
+        items (List[Any]): Raw batch items (query strings or dicts).
+        workers (int): Number of worker processes.
+        max_concurrency (int): Agent invocations in flight per worker.
+        timeout (Optional[float]): Per-item timeout in seconds.
+        on_result (Optional[Callable]): Called with each result in input order.
+        backends (Optional[Dict[str, Any]]): Backend setup for the workers.
+
+    Returns:
+        List[Dict[str, Any]]: All results in input order.
+    """
+    start = time.perf_counter()
+    results = []
+    for result in iter_sharded_batch(items, workers, max_concurrency, timeout, backends):
+        if on_result is not None:
+            on_result(result)
+        results.append(result)
+    failed = sum(1 for r in results if r["status"] != "ok")
+    logger.info(
+        f"Sharded batch finished: {len(results)} items, {failed} failed, "
+        f"{time.perf_counter() - start:.2f}s total"
+    )
+    return results
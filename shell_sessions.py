@@ -0,0 +1,548 @@
+"""
+Persistent Shell Sessions Module
+
+Summary:
+This module keeps one long-lived shell per agent session, so the working
+directory, exported variables and an activated virtualenv carry over from
+one `execute_terminal_command` call to the next.
+
+Description:
+- `ShellSession` wraps a `bash --noprofile --norc` process started with a
+  scrubbed environment (variables matching `TERMINAL_ENV_DENYLIST`, such as
+  API keys, are removed) in its own process group.
+- Commands keep the no-shell-syntax rule of terminal.py: each command is
+  split with `shlex` and re-quoted with `shlex.join`, so the shell only
+  ever sees one plain argument vector. Pipes, redirections, globs and
+  variable expansion are never interpreted.
+- State-changing builtins (`cd`, `export`, `source`, ...) run in the shell
+  itself. Every other command runs as a background job in its own process
+  group, so a per-command timeout kills the command and its children
+  while the session survives. A command that cannot be interrupted this
+  way restarts the session in its last working directory.
+- Command boundaries are detected with per-command random sentinels on
+  stdout/stderr and a separate control pipe carrying the job pid, exit
+  status and resulting working directory.
+- `python`/`pip` commands that resolve to the agent's interpreter run on the
+  shared warm interpreter (warm_python.py) with the session's directory
+  and environment, skipping interpreter startup.
+- `ShellSessionPool` maps session ids (the `thread_id` of the agent run) to
+  sessions, closing idle ones after `SHELL_SESSION_IDLE_TIMEOUT` seconds
+  and the least recently used one beyond `SHELL_SESSION_MAX`. With
+  `SHELL_SESSION_ROOT` set, every session starts in its own directory below it.
+- `run_stateless()` / `arun_stateless()` run a single command without a
+  session (optionally in a given directory and environment), also using
+  the warm interpreter when possible.
+
+Results have the format returned by `terminal.run_command`.
+"""
+
+import asyncio
+import atexit
+import fnmatch
+import os
+import queue
+import shlex
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Mapping, Optional
+
+from config import (
+    TERMINAL_COMMAND_TIMEOUT,
+    TERMINAL_ENV_DENYLIST,
+    SHELL_SESSION_MAX,
+    SHELL_SESSION_IDLE_TIMEOUT,
+    SHELL_SESSION_ROOT,
+)
+from logger_config import setup_logger
+from terminal import BoundedCapture, _build_result, arun_command, run_command
+from warm_python import get_warm_interpreter, is_python_command, parse_python_command
+
+# Initialize logger for this module
+logger = setup_logger(__name__)
+
+# Builtins that change the shell's own state and must not run as a job
+_STATE_BUILTINS = {
+    "cd", "pushd", "popd", "dirs", "export", "unset", "source", ".", "alias",
+    "unalias", "set", "shopt", "umask", "hash", "declare", "typeset", "readonly",
+    "deactivate",
+}
+# Commands that would end or replace the session's shell
+_FORBIDDEN = {"exit", "logout", "exec"}
+_READ_CHUNK_SIZE = 4096
+_KILL_GRACE_S = 5.0
+
+
+def scrubbed_environment(env: Optional[Mapping[str, str]] = None) -> Dict[str, str]:
+    """
+    Summary:
+        Copies an environment without the variables in `TERMINAL_ENV_DENYLIST`.
+
+    Args:
+        env (Optional[Mapping[str, str]]): Source environment (default: os.environ).
+
+    Returns:
+        Dict[str, str]: Environment safe to hand to commands run by the agent.
+    """
+    env = os.environ if env is None else env
+    return {
+        key: value for key, value in env.items()
+        if not any(fnmatch.fnmatchcase(key, pattern) for pattern in TERMINAL_ENV_DENYLIST)
+    }
+
+
+def _kill_group(pid: int) -> None:
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        # Not a group leader (yet) or already gone
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+
+def _pump(stream, name: str, events: "queue.Queue") -> None:
+    try:
+        while True:
+            chunk = os.read(stream.fileno(), _READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            events.put((name, chunk))
+    except (OSError, ValueError):
+        pass
+    finally:
+        events.put((name, None))
+
+
+class _SentinelCapture:
+    """Feeds a stream into a capture until the command's sentinel appears."""
+
+    def __init__(self, name: str, sentinel: bytes):
+        self.capture = BoundedCapture(name)
+        self.sentinel = sentinel
+        self.done = False
+        self._carry = b""
+
+    def feed(self, chunk: bytes) -> None:
+        if self.done:
+            return
+        data = self._carry + chunk
+        index = data.find(self.sentinel)
+        if index >= 0:
+            self.capture.write(data[:index])
+            self._carry = b""
+            self.done = True
+            return
+        keep = len(self.sentinel) - 1
+        if len(data) > keep:
+            self.capture.write(data[:-keep])
+            data = data[-keep:]
+        self._carry = data
+
+
+class ShellSession:
+    """
+    Summary:
+        A persistent bash process that runs one command at a time.
+
+    Args:
+        session_id (str): Id of the owning agent session.
+        cwd (Optional[str]): Start directory (default: the current directory).
+        env (Optional[Mapping[str, str]]): Start environment (default: the
+            scrubbed process environment).
+    """
+
+    def __init__(self, session_id: str, cwd: Optional[str] = None, env: Optional[Mapping[str, str]] = None):
+        self.session_id = session_id
+        self.cwd = os.path.abspath(cwd or os.getcwd())
+        self._start_env = dict(env) if env is not None else scrubbed_environment()
+        self._lock = threading.Lock()
+        self._env_cache: Optional[Dict[str, str]] = None
+        self._process: Optional[subprocess.Popen] = None
+        self.last_used = time.monotonic()
+        self._spawn()
+
+    def _spawn(self) -> None:
+        control_read, control_write = os.pipe()
+        self._process = subprocess.Popen(
+            ["bash", "--noprofile", "--norc"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=self.cwd,
+            env=self._start_env,
+            pass_fds=(control_write,),
+            start_new_session=True,
+        )
+        os.close(control_write)
+        self._control_fd = control_write
+        self._control = os.fdopen(control_read, "rb", buffering=0)
+        self._events: "queue.Queue" = queue.Queue()
+        for stream, name in ((self._process.stdout, "stdout"), (self._process.stderr, "stderr"), (self._control, "control")):
+            threading.Thread(target=_pump, args=(stream, name, self._events), daemon=True).start()
+        self._env_cache = None
+        self._setsid = shutil.which("setsid", path=self._start_env.get("PATH", os.defpath)) is not None
+        logger.info(f"[{self.session_id}] shell session started in {self.cwd}")
+
+    @property
+    def alive(self) -> bool:
+        """Whether the shell process is still running."""
+        return self._process is not None and self._process.poll() is None
+
+    def _restart(self, reason: str) -> None:
+        logger.warning(f"[{self.session_id}] restarting shell session: {reason}")
+        self._terminate()
+        self._spawn()
+
+    def _terminate(self) -> None:
+        if self._process is None:
+            return
+        _kill_group(self._process.pid)
+        self._process.wait()
+        for stream in (self._process.stdin, self._process.stdout, self._process.stderr, self._control):
+            try:
+                stream.close()
+            except OSError:
+                pass
+        self._process = None
+
+    def _script(self, argv: List[str], token: str, working_directory: Optional[str]) -> str:
+        quoted = shlex.join(argv)
+        ctl = self._control_fd
+        if argv[0] in _STATE_BUILTINS:
+            body = f"{quoted} </dev/null"
+        else:
+            launcher = "setsid " if self._setsid else ""
+            body = (
+                f"{launcher}{quoted} </dev/null & __ada_pid=$!; "
+                f"printf '%s pid %d\\0' {token} \"$__ada_pid\" >&{ctl}; wait \"$__ada_pid\""
+            )
+        if working_directory:
+            lines = [
+                "__ada_prev=$PWD",
+                f"if builtin cd -- {shlex.quote(working_directory)}; then",
+                f"  {body}",
+                "  __ada_rc=$?",
+                "  builtin cd -- \"$__ada_prev\"",
+                "else __ada_rc=1; fi",
+            ]
+        else:
+            lines = [body, "__ada_rc=$?"]
+        lines += [
+            f"printf '%s exit %d %s\\0' {token} \"$__ada_rc\" \"$PWD\" >&{ctl}",
+            f"printf '%s' {token}",
+            f"printf '%s' {token} >&2",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def _execute(self, argv: List[str], command: str, timeout: float, working_directory: Optional[str]) -> Dict[str, Any]:
+        # Called with the lock held
+        token = f"__ada_{uuid.uuid4().hex}__"
+        sentinel = token.encode()
+        streams = {name: _SentinelCapture(name, sentinel) for name in ("stdout", "stderr")}
+        start = time.perf_counter()
+        exit_code, pid, error = None, None, None
+        control = b""
+        exited = False
+
+        try:
+            self._process.stdin.write(self._script(argv, token, working_directory).encode())
+            self._process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            self._restart(f"shell not writable ({e})")
+            for capture in streams.values():
+                capture.capture.close()
+            return _build_result(command, {n: c.capture for n, c in streams.items()}, {
+                "exit_code": None, "wall_time_s": round(time.perf_counter() - start, 3),
+                "error": "Shell session was restarted, please retry the command",
+            })
+
+        deadline = start + timeout
+        killed_at = None
+        while not (exited and all(c.done for c in streams.values())):
+            limit = (killed_at + _KILL_GRACE_S) if killed_at else deadline
+            # Checked on every read: a command that keeps writing never leaves the queue empty
+            remaining = limit - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    raise queue.Empty
+                name, chunk = self._events.get(timeout=remaining)
+            except queue.Empty:
+                if killed_at is None:
+                    error = f"Command timed out after {timeout} seconds"
+                    logger.warning(f"[{self.session_id}] {error}: {command!r}")
+                    killed_at = time.perf_counter()
+                    if pid is not None:
+                        _kill_group(pid)
+                        continue
+                self._restart("command could not be interrupted")
+                break
+            if chunk is None:
+                if name == "control" or not self.alive:
+                    self._restart("shell exited")
+                    error = error or "Shell session exited unexpectedly and was restarted"
+                    break
+                continue
+            if name != "control":
+                streams[name].feed(chunk)
+                continue
+            control += chunk
+            while b"\0" in control:
+                record, control = control.split(b"\0", 1)
+                parts = record.decode("utf-8", errors="replace").split(" ", 3)
+                if parts[0] != token:
+                    continue  # left over from an earlier, interrupted command
+                if parts[1] == "pid":
+                    pid = int(parts[2])
+                elif parts[1] == "exit":
+                    exit_code = int(parts[2])
+                    self.cwd = parts[3] if len(parts) > 3 else self.cwd
+                    exited = True
+
+        if killed_at is not None and exited:
+            exit_code = -signal.SIGKILL
+        for capture in streams.values():
+            capture.capture.close()
+        if argv[0] in _STATE_BUILTINS:
+            # Only the shell's own builtins change its environment; jobs
+            # cannot, so the snapshot stays valid across them
+            self._env_cache = None
+        return _build_result(command, {n: c.capture for n, c in streams.items()}, {
+            "exit_code": exit_code,
+            "wall_time_s": round(time.perf_counter() - start, 3),
+            "error": error,
+        })
+
+    def environment(self) -> Dict[str, str]:
+        """
+        Summary:
+            Returns the session's current exported environment.
+
+        Returns:
+            Dict[str, str]: Environment variables of the shell.
+        """
+        with self._lock:
+            return dict(self._environment())
+
+    def _environment(self) -> Dict[str, str]:
+        # Called with the lock held
+        if self._env_cache is None:
+            fd, path = tempfile.mkstemp(prefix="session_env_")
+            os.close(fd)
+            try:
+                self._execute(["bash", "-c", f"env -0 > {shlex.quote(path)}"], "env", 10, None)
+                with open(path, "rb") as handle:
+                    records = handle.read().split(b"\0")
+            finally:
+                os.unlink(path)
+            env = {}
+            for record in records:
+                key, sep, value = record.decode("utf-8", errors="replace").partition("=")
+                if sep:
+                    env[key] = value
+            self._env_cache = env
+        return self._env_cache
+
+    def run(
+        self,
+        command: str,
+        timeout: float = TERMINAL_COMMAND_TIMEOUT,
+        working_directory: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Summary:
+            Runs one command in the session.
+
+        Args:
+            command (str): Command line; split with `shlex`, never interpreted
+                by the shell.
+            timeout (float): Seconds before the command is killed.
+            working_directory (Optional[str]): Directory for this command only
+                (relative paths are resolved against the session directory).
+
+        Returns:
+            Dict[str, Any]: Result in the format returned by `terminal.run_command`.
+        """
+        try:
+            argv = shlex.split(command)
+        except ValueError as e:
+            argv, parse_error = [], f"Invalid command syntax: {e}"
+        else:
+            parse_error = None if argv else "Empty command"
+        if not parse_error and argv[0] in _FORBIDDEN:
+            parse_error = f"'{argv[0]}' is not allowed in a shell session"
+        if parse_error:
+            return {"command": command, "exit_code": None, "stdout": "", "stderr": "",
+                    "wall_time_s": 0.0, "error": parse_error, "spill_files": []}
+
+        with self._lock:
+            self.last_used = time.monotonic()
+            if not self.alive:
+                self._restart("shell not running")
+            warm = get_warm_interpreter() if is_python_command(argv) else None
+            if warm is not None:
+                env = self._environment()
+                spec = parse_python_command(argv, env)
+                if spec is not None:
+                    cwd = os.path.join(self.cwd, working_directory) if working_directory else self.cwd
+                    return warm.run(command, spec, cwd, env, timeout)
+            return self._execute(argv, command, timeout, working_directory)
+
+    def close(self) -> None:
+        """Kills the shell and everything it started."""
+        with self._lock:
+            self._terminate()
+        logger.info(f"[{self.session_id}] shell session closed")
+
+
+class ShellSessionPool:
+    """
+    Summary:
+        Shell sessions keyed by agent session id.
+
+    Args:
+        max_sessions (int): Maximum live sessions; the least recently used
+            idle one is closed beyond it.
+        idle_timeout (float): Seconds after which an unused session is closed.
+        root (Optional[str]): Parent directory of per-session start
+            directories (None = start in the current directory).
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = SHELL_SESSION_MAX,
+        idle_timeout: float = SHELL_SESSION_IDLE_TIMEOUT,
+        root: Optional[str] = SHELL_SESSION_ROOT,
+    ):
+        self.max_sessions = max(1, max_sessions)
+        self.idle_timeout = idle_timeout
+        self.root = root
+        self._sessions: "OrderedDict[str, ShellSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _start_dir(self, session_id: str) -> Optional[str]:
+        if self.root is None:
+            return None
+        safe_id = "".join(c if c.isalnum() or c in "-_." else "_" for c in session_id)
+        directory = os.path.join(self.root, safe_id)
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    def get(self, session_id: str) -> ShellSession:
+        """
+        Summary:
+            Returns the session's shell, starting it on first use.
+
+        Args:
+            session_id (str): Agent session id.
+
+        Returns:
+            ShellSession: The live shell session.
+        """
+        expired: List[ShellSession] = []
+        with self._lock:
+            now = time.monotonic()
+            for sid, session in list(self._sessions.items()):
+                if sid != session_id and now - session.last_used > self.idle_timeout:
+                    expired.append(self._sessions.pop(sid))
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = ShellSession(session_id, cwd=self._start_dir(session_id))
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                _, oldest = self._sessions.popitem(last=False)
+                expired.append(oldest)
+            session.last_used = now
+        for stale in expired:
+            stale.close()
+        return session
+
+    def close(self, session_id: str) -> None:
+        """Closes one session's shell, if it is running."""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is not None:
+            session.close()
+
+    def close_all(self) -> None:
+        """Closes every shell session."""
+        with self._lock:
+            sessions, self._sessions = list(self._sessions.values()), OrderedDict()
+        for session in sessions:
+            session.close()
+
+
+shell_sessions = ShellSessionPool()
+atexit.register(shell_sessions.close_all)
+
+
+def run_stateless(
+    command: str,
+    timeout: float = TERMINAL_COMMAND_TIMEOUT,
+    cwd: Optional[str] = None,
+    env: Optional[Mapping[str, str]] = None,
+) -> Dict[str, Any]:
+    """
+    Summary:
+        Runs one command outside any session, on the warm interpreter if possible.
+
+    Args:
+        command (str): Command line to execute.
+        timeout (float): Seconds before the command is killed.
+        cwd (Optional[str]): Working directory (default: the current directory).
+        env (Optional[Mapping[str, str]]): Environment (default: inherited).
+
+    Returns:
+        Dict[str, Any]: Result in the format returned by `terminal.run_command`.
+    """
+    warm = _warm_spec(command, env)
+    if warm is not None:
+        interpreter, spec = warm
+        return interpreter.run(command, spec, os.path.abspath(cwd or os.getcwd()), env or os.environ, timeout)
+    return run_command(command, timeout, cwd=cwd, env=env)
+
+
+async def arun_stateless(
+    command: str,
+    timeout: float = TERMINAL_COMMAND_TIMEOUT,
+    cwd: Optional[str] = None,
+    env: Optional[Mapping[str, str]] = None,
+) -> Dict[str, Any]:
+    """
+    Summary:
+        Async variant of `run_stateless`.
+
+    Args:
+        command (str): Command line to execute.
+        timeout (float): Seconds before the command is killed.
+        cwd (Optional[str]): Working directory (default: the current directory).
+        env (Optional[Mapping[str, str]]): Environment (default: inherited).
+
+    Returns:
+        Dict[str, Any]: Result in the format returned by `terminal.run_command`.
+    """
+    warm = _warm_spec(command, env)
+    if warm is not None:
+        interpreter, spec = warm
+        return await asyncio.to_thread(
+            interpreter.run, command, spec, os.path.abspath(cwd or os.getcwd()), env or os.environ, timeout
+        )
+    return await arun_command(command, timeout, cwd=cwd, env=env)
+
+
+def _warm_spec(command: str, env: Optional[Mapping[str, str]]):
+    try:
+        argv = shlex.split(command)
+    except ValueError:
+        return None
+    if not is_python_command(argv):
+        return None
+    interpreter = get_warm_interpreter()
+    spec = parse_python_command(argv, env or os.environ) if interpreter is not None else None
+    return (interpreter, spec) if spec is not None else None
@@ -0,0 +1,128 @@
+"""
+Single-Flight Request Coalescing Module
+
+Summary:
+This module collapses identical in-flight calls into one execution whose
+result is shared by every caller that asked for it meanwhile.
+
+Description:
+- `SingleFlight.do(key, fn)` runs `fn()` for the first caller of a key
+  (the leader); callers arriving with the same key while it runs wait and
+  receive the same result or exception instead of starting their own call.
+- `SingleFlight.ado(key, fn)` is the asyncio variant. The shared work runs
+  as its own task, so a cancelled caller never cancels it for the others.
+- Nothing is cached: once a call finishes, the next caller starts a new
+  one. Caching is layered separately (cache.py).
+- Leader/follower counts are exported as the
+  `agent_singleflight_calls_total` metric.
+
+tools.py uses one group for web searches and one for allow-listed
+read-only terminal commands.
+"""
+
+import asyncio
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from logger_config import setup_logger
+from metrics import registry
+
+# Initialize logger for this module
+logger = setup_logger(__name__)
+
+
+class _Call:
+    """One in-flight synchronous call."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+
+
+class SingleFlight:
+    """
+    Summary:
+        Coalesces concurrent calls that share a key.
+
+    Args:
+        name (str): Group name used in logs and metrics.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._tasks: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+    def _count(self, role: str) -> None:
+        registry.counter("agent_singleflight_calls_total", "Coalesced calls by role").inc(group=self.name, role=role)
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Summary:
+            Runs `fn` once for all concurrent callers with the same key.
+
+        Args:
+            key (Hashable): Identity of the call.
+            fn (Callable[[], Any]): Work to run if no identical call is in flight.
+
+        Returns:
+            Any: Result of the (possibly shared) call; its exception is
+                re-raised in every waiting caller.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            self._count("follower")
+            logger.debug("[%s] joining in-flight call %r", self.name, key)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        self._count("leader")
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Summary:
+            Async variant of `do` for coroutine functions.
+
+        Args:
+            key (Hashable): Identity of the call.
+            fn (Callable[[], Awaitable[Any]]): Coroutine function to run if no
+                identical call is in flight on this event loop.
+
+        Returns:
+            Any: Result of the (possibly shared) call.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            tasks = self._tasks.setdefault(loop, {})
+            task = tasks.get(key)
+            leader = task is None
+            if leader:
+                task = tasks[key] = loop.create_task(fn())
+                task.add_done_callback(lambda _t: tasks.pop(key, None))
+
+        if leader:
+            self._count("leader")
+        else:
+            self._count("follower")
+            logger.debug("[%s] joining in-flight call %r", self.name, key)
+        return await asyncio.shield(task)
@@ -0,0 +1,229 @@
+"""
+Agent Response Streaming Module
+
+Summary:
+This module exposes the agent's output as a stream of events so callers
+can show model tokens and tool activity while a multi-step turn is still
+running, instead of waiting for `agent.invoke` to return.
+
+Description:
+- Uses the agent graph's `stream` / `astream` with the "messages" mode
+  (model tokens as they are generated), the "updates" mode (completed
+  node outputs, used to detect tool calls and tool results) and the
+  "custom" mode (model cascade escalations, see cascade.py).
+- Normalizes them into plain event dictionaries:
+    {"type": "token", "content": str}
+    {"type": "reset", "reason": str}
+    {"type": "tool_call", "name": str, "args": dict, "id": str}
+    {"type": "tool_result", "name": str, "content": str}
+    {"type": "final", "content": str}
+  A "reset" event voids the tokens since the last tool call or reset: the
+  model tier that streamed them was escalated, and the next tier's answer
+  follows.
+- `stream_agent` is a generator for synchronous callers,
+  `astream_agent` an async generator for asyncio callers, and
+  `print_stream` renders a stream to the terminal.
+
+Tracing callbacks are attached to every streamed invocation, the same as
+for `agent.invoke` in main.py. The stream's span and deadline live in a
+private context that is entered for each step of the underlying graph
+stream only, so they never leak into the consumer's code between events.
+"""
+
+import asyncio
+import contextvars
+import sys
+from contextlib import ExitStack
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional
+
+from langchain_core.messages import AIMessage, ToolMessage
+
+from agent import get_agent
+from deadline import deadline_config, deadline_scope
+from logger_config import setup_logger
+from tracing import callback_config, span
+
+# Initialize logger for this module
+logger = setup_logger(__name__)
+
+_STREAM_MODES = ["messages", "updates", "custom"]
+
+
+def _events_from_chunk(mode: str, chunk: Any, state: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """
+    Summary:
+        Converts one raw graph stream item into normalized events.
+
+    Args:
+        mode (str): Stream mode the chunk came from ("messages", "updates"
+            or "custom").
+        chunk (Any): Raw chunk produced by the graph.
+        state (Dict[str, Any]): Mutable per-stream state; tracks the last
+            complete AI answer for the final event.
+
+    Yields:
+        Dict[str, Any]: Normalized events.
+    """
+    if mode == "messages":
+        message, _metadata = chunk
+        # Streaming models emit AIMessageChunks; non-streaming ones a whole AIMessage
+        if isinstance(message, AIMessage):
+            text = message.text
+            if text:
+                yield {"type": "token", "content": text}
+        return
+    if mode == "custom":
+        if isinstance(chunk, dict) and chunk.get("cascade") == "escalated":
+            yield {"type": "reset", "reason": chunk.get("reason", "")}
+        return
+
+    for _node, update in (chunk or {}).items():
+        if not isinstance(update, dict):
+            continue
+        for message in update.get("messages", []) or []:
+            if isinstance(message, AIMessage):
+                for call in message.tool_calls:
+                    yield {"type": "tool_call", "name": call["name"], "args": call["args"], "id": call.get("id")}
+                if not message.tool_calls:
+                    state["final"] = message.text
+            elif isinstance(message, ToolMessage):
+                yield {"type": "tool_result", "name": message.name, "content": message.text}
+
+
+class _StreamScope:
+    """
+    Summary:
+        Span and deadline of one streamed agent run, kept in a private context.
+
+    Args:
+        name (str): Span name.
+    """
+
+    def __init__(self, name: str):
+        self.context = contextvars.copy_context()
+        self._stack = ExitStack()
+        self.context.run(self._stack.enter_context, span(name, kind="agent"))
+        self.context.run(self._stack.enter_context, deadline_scope())
+
+    def run(self, func: Callable, *args: Any) -> Any:
+        """Calls `func(*args)` inside the stream's context."""
+        return self.context.run(func, *args)
+
+    async def arun(self, awaitable_func: Callable, *args: Any) -> Any:
+        """Awaits `awaitable_func(*args)` inside the stream's context."""
+        return await asyncio.get_running_loop().create_task(awaitable_func(*args), context=self.context)
+
+    def close(self, error: Optional[BaseException] = None) -> None:
+        """Ends the span and the deadline, in the context that started them."""
+        details = (type(error), error, error.__traceback__) if error is not None else (None, None, None)
+        self.context.run(self._stack.__exit__, *details)
+
+
+def _stream_config(config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    return callback_config(**deadline_config(), **(config or {}))
+
+
+def stream_agent(inputs: Dict[str, Any], config: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Summary:
+        Runs the agent and yields token and tool events as they happen.
+
+    Args:
+        inputs (Dict[str, Any]): Agent input, e.g. `{"messages": [system_prompt, query]}`.
+        config (Optional[Dict[str, Any]]): Extra runnable config.
+
+    Yields:
+        Dict[str, Any]: Normalized events, ending with one "final" event.
+    """
+    state: Dict[str, Any] = {"final": ""}
+    scope = _StreamScope("agent.stream")
+    try:
+        chunks = scope.run(lambda: get_agent().stream(inputs, config=_stream_config(config), stream_mode=_STREAM_MODES))
+        try:
+            for mode, chunk in iter(lambda: scope.run(next, chunks, None), None):
+                yield from _events_from_chunk(mode, chunk, state)
+        finally:
+            scope.run(chunks.close)
+    except BaseException as e:
+        scope.close(e)
+        raise
+    scope.close()
+    yield {"type": "final", "content": state["final"]}
+
+
+async def astream_agent(inputs: Dict[str, Any], config: Optional[Dict[str, Any]] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Summary:
+        Async variant of `stream_agent`.
+
+    Args:
+        inputs (Dict[str, Any]): Agent input.
+        config (Optional[Dict[str, Any]]): Extra runnable config.
+
+    Yields:
+        Dict[str, Any]: Normalized events, ending with one "final" event.
+    """
+    state: Dict[str, Any] = {"final": ""}
+    scope = _StreamScope("agent.astream")
+    try:
+        chunks = scope.run(lambda: get_agent().astream(inputs, config=_stream_config(config), stream_mode=_STREAM_MODES))
+        try:
+            while True:
+                try:
+                    mode, chunk = await scope.arun(chunks.__anext__)
+                except StopAsyncIteration:
+                    break
+                for event in _events_from_chunk(mode, chunk, state):
+                    yield event
+        finally:
+            await scope.arun(chunks.aclose)
+    except BaseException as e:
+        scope.close(e)
+        raise
+    scope.close()
+    yield {"type": "final", "content": state["final"]}
+
+
+def print_stream(inputs: Dict[str, Any], out=sys.stdout) -> str:
+    """
+    Summary:
+        Streams an agent run to the terminal.
+
+    Description:
+        Tokens are printed as they arrive; tool calls and tool results are
+        printed on their own lines. Tokens voided by a "reset" event are
+        marked as discarded before the retried answer. If the model produced
+        no streamed tokens (e.g. a non-streaming backend), the final answer
+        is printed instead.
+
+    Args:
+        inputs (Dict[str, Any]): Agent input.
+        out: Text stream to write to.
+
+    Returns:
+        str: The final answer.
+    """
+    streamed_tokens = False
+    final = ""
+    for event in stream_agent(inputs):
+        if event["type"] == "token":
+            streamed_tokens = True
+            out.write(event["content"])
+        elif event["type"] == "reset":
+            if streamed_tokens:
+                out.write(f"\n[discarded: {event['reason']}, retrying on a larger model]\n")
+            streamed_tokens = False
+        elif event["type"] == "tool_call":
+            out.write(f"\n[tool call] {event['name']}({event['args']})\n")
+        elif event["type"] == "tool_result":
+            preview = event["content"] if len(event["content"]) <= 200 else event["content"][:200] + "..."
+            out.write(f"[tool result] {event['name']}: {preview}\n")
+        elif event["type"] == "final":
+            final = event["content"]
+        out.flush()
+
+    if not streamed_tokens and final:
+        out.write(final)
+    out.write("\n")
+    out.flush()
+    return final
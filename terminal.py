@@ -0,0 +1,687 @@
+"""
+Terminal Command Execution Module
+
+Summary:
+This module implements the subprocess machinery behind the
+`execute_terminal_command` tool.
+
+Description:
+- Runs commands without a shell (arguments are split with `shlex`) to
+  avoid shell injection.
+- Reads stdout and stderr incrementally on background threads, so output
+  can be streamed while the command is still running.
+- Records the exit code and wall time of every command and enforces a
+  per-command timeout by killing the process.
+- Runs independent commands concurrently on a bounded worker pool while
+  keeping results in the original command order.
+- Caps captured output with a head/tail ring buffer; large output is
+  elided in the middle and spilled in full to a temporary file that can
+  be paged through later, keeping memory and prompt size bounded. Spill
+  files stop growing at `TERMINAL_SPILL_MAX_BYTES`.
+
+`stream_commands` yields events as they happen; `run_commands` collects
+the same events into one result dictionary per command. `arun_command` /
+`arun_commands` produce the same results with asyncio subprocesses, so
+async callers never block the event loop or hold a thread per command.
+"""
+
+import asyncio
+import codecs
+import os
+import queue
+import shlex
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Mapping, Optional
+
+from config import (
+    TERMINAL_COMMAND_TIMEOUT,
+    TERMINAL_MAX_WORKERS,
+    TERMINAL_OUTPUT_HEAD_BYTES,
+    TERMINAL_OUTPUT_TAIL_BYTES,
+    TERMINAL_SPILL_DIR,
+    TERMINAL_SPILL_MAX_FILES,
+    TERMINAL_SPILL_MAX_BYTES,
+)
+from logger_config import setup_logger
+
+# Initialize logger for this module
+logger = setup_logger(__name__)
+
+_READ_CHUNK_SIZE = 4096
+_DONE = object()
+
+
+class BoundedCapture:
+    """
+    Summary:
+        Captures a process stream with bounded memory.
+
+    Description:
+        Output is kept verbatim until it exceeds `head_bytes + tail_bytes`.
+        From then on only the first `head_bytes` and a ring buffer of the
+        last `tail_bytes` stay in memory, while the complete stream is
+        spilled to a temporary file that can be paged through with
+        `read_spilled_output`. The spill file keeps the first
+        `spill_max_bytes` of the stream and ends with a truncation note.
+
+    Args:
+        name (str): Stream name used in the spill file name.
+        head_bytes (int): Bytes kept from the start of the stream.
+        tail_bytes (int): Bytes kept from the end of the stream.
+        spill_max_bytes (int): Maximum bytes written to the spill file.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        head_bytes: int = TERMINAL_OUTPUT_HEAD_BYTES,
+        tail_bytes: int = TERMINAL_OUTPUT_TAIL_BYTES,
+        spill_max_bytes: int = TERMINAL_SPILL_MAX_BYTES,
+    ):
+        self.name = name
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.spill_max_bytes = spill_max_bytes
+        self.total_bytes = 0
+        self.spilled_bytes = 0
+        self.spill_path: Optional[str] = None
+        self._head = bytearray()
+        self._tail = bytearray()
+        self._spill = None
+
+    @property
+    def truncated(self) -> bool:
+        """True once the stream exceeded the in-memory limits."""
+        return self._spill is not None or self.spill_path is not None
+
+    def write(self, chunk: bytes) -> None:
+        """
+        Summary:
+            Appends a chunk of raw output.
+
+        Args:
+            chunk (bytes): Raw bytes read from the pipe.
+        """
+        self.total_bytes += len(chunk)
+
+        if not self.truncated:
+            self._head += chunk
+            if len(self._head) <= self.head_bytes + self.tail_bytes:
+                return
+            # First overflow: spill everything seen so far, then split head/tail
+            self._spill = _open_spill_file(self.name)
+            self.spill_path = self._spill.name
+            self._write_spill(self._head)
+            self._tail = self._head[self.head_bytes:]
+            del self._head[self.head_bytes:]
+        else:
+            self._write_spill(chunk)
+            self._tail += chunk
+
+        if len(self._tail) > self.tail_bytes:
+            del self._tail[:len(self._tail) - self.tail_bytes]
+
+    @property
+    def spill_truncated(self) -> bool:
+        """True once the spill file reached `spill_max_bytes`."""
+        return self.spilled_bytes >= self.spill_max_bytes
+
+    def _write_spill(self, data: bytes) -> None:
+        if self.spill_truncated:
+            return
+        room = self.spill_max_bytes - self.spilled_bytes
+        self._spill.write(data[:room])
+        self.spilled_bytes += min(len(data), room)
+        if self.spill_truncated:
+            self._spill.write(f"\n... [{self.name} truncated at {self.spill_max_bytes} bytes] ...\n".encode())
+            logger.warning(f"Spill file {self.spill_path} reached {self.spill_max_bytes} bytes; truncating")
+
+    def close(self) -> None:
+        """Flushes and closes the spill file, if any."""
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
+    def render(self) -> str:
+        """
+        Summary:
+            Returns the captured text with an elision marker if truncated.
+
+        Returns:
+            str: Full output, or head + marker + tail for large output.
+        """
+        head = self._head.decode("utf-8", errors="replace")
+        if not self.truncated:
+            return head
+        elided = self.total_bytes - len(self._head) - len(self._tail)
+        saved = f"first {self.spilled_bytes} bytes of {self.name}" if self.spill_truncated else f"full {self.name}"
+        marker = (
+            f"\n... [{elided} bytes elided; {saved} ({self.total_bytes} bytes) "
+            f"saved to {self.spill_path}, page through it with read_command_output] ...\n"
+        )
+        return head + marker + self._tail.decode("utf-8", errors="replace")
+
+
+def _spill_dir() -> str:
+    """Returns (and creates) the directory holding spilled command output."""
+    directory = TERMINAL_SPILL_DIR or os.path.join(tempfile.gettempdir(), "agent_command_output")
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def _open_spill_file(name: str):
+    """
+    Summary:
+        Creates a new spill file and prunes the oldest ones beyond the limit.
+
+    Args:
+        name (str): Stream name used as file name prefix.
+
+    Returns:
+        A writable binary file object.
+    """
+    directory = _spill_dir()
+    existing = sorted(
+        (os.path.join(directory, f) for f in os.listdir(directory)),
+        key=os.path.getmtime,
+    )
+    for stale in existing[:max(0, len(existing) - TERMINAL_SPILL_MAX_FILES + 1)]:
+        try:
+            os.remove(stale)
+        except OSError:
+            pass
+    return tempfile.NamedTemporaryFile(
+        mode="wb", prefix=f"{name}_", suffix=".log", dir=directory, delete=False
+    )
+
+
+def read_spilled_output(path: str, offset: int = 0, max_bytes: int = TERMINAL_OUTPUT_HEAD_BYTES) -> str:
+    """
+    Summary:
+        Reads a window of a spilled command output file.
+
+    Args:
+        path (str): Spill file path reported in a truncated command result.
+        offset (int): Byte offset to start reading from.
+        max_bytes (int): Maximum number of bytes to return.
+
+    Returns:
+        str: The requested window prefixed with its byte range.
+
+    Raises:
+        ValueError: If the path is not a spill file created by this module.
+    """
+    directory = os.path.realpath(_spill_dir())
+    resolved = os.path.realpath(path)
+    if os.path.dirname(resolved) != directory:
+        raise ValueError(f"{path} is not a captured command output file")
+
+    size = os.path.getsize(resolved)
+    offset = max(0, min(offset, size))
+    with open(resolved, "rb") as handle:
+        handle.seek(offset)
+        data = handle.read(max(0, max_bytes))
+    end = offset + len(data)
+    header = f"[bytes {offset}-{end} of {size}]"
+    if end < size:
+        header += f" (continue with offset={end})"
+    return header + "\n" + data.decode("utf-8", errors="replace")
+
+
+def _pump(pipe, stream_name: str, events: "queue.Queue") -> None:
+    """
+    Summary:
+        Copies a subprocess pipe into the event queue chunk by chunk.
+
+    Args:
+        pipe: Binary pipe of the running process.
+        stream_name (str): Either "stdout" or "stderr".
+        events (queue.Queue): Queue receiving `(stream_name, bytes)` tuples.
+    """
+    try:
+        while True:
+            chunk = pipe.read1(_READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            events.put((stream_name, chunk))
+    finally:
+        pipe.close()
+        events.put((stream_name, _DONE))
+
+
+def _kill(process: subprocess.Popen) -> None:
+    """Kills a process started by `_iter_process` together with its children."""
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        # Already gone
+        pass
+
+
+def _iter_process(
+    cmd: str,
+    timeout: float,
+    cwd: Optional[str] = None,
+    env: Optional[Mapping[str, str]] = None,
+    on_start: Optional[Callable[[subprocess.Popen], None]] = None,
+) -> Iterator[tuple]:
+    """
+    Summary:
+        Runs a command and yields raw output chunks as they are read.
+
+    Args:
+        cmd (str): Command line; split with `shlex` and executed without a shell.
+        timeout (float): Seconds before the process is killed.
+        cwd (Optional[str]): Working directory (default: the current directory).
+        env (Optional[Mapping[str, str]]): Environment (default: inherited).
+        on_start (Optional[Callable[[subprocess.Popen], None]]): Called with
+            the process once it is running, e.g. to kill it from elsewhere.
+
+    Yields:
+        tuple: `("stdout" | "stderr", bytes)` while the command runs, then one
+        `("exit", {"exit_code", "wall_time_s", "error"})`.
+    """
+    start = time.perf_counter()
+    try:
+        process = subprocess.Popen(
+            shlex.split(cmd),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=cwd,
+            env=env,
+            # Own process group, so a timeout also kills the command's children
+            start_new_session=True,
+        )
+    except Exception as e:
+        logger.warning(f"Failed to start command {cmd!r}: {e}")
+        yield "exit", {
+            "exit_code": None,
+            "wall_time_s": round(time.perf_counter() - start, 3),
+            "error": str(e),
+        }
+        return
+
+    events: "queue.Queue" = queue.Queue()
+    readers = [
+        threading.Thread(target=_pump, args=(process.stdout, "stdout", events), daemon=True),
+        threading.Thread(target=_pump, args=(process.stderr, "stderr", events), daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
+    if on_start is not None:
+        on_start(process)
+
+    deadline = start + timeout
+    open_streams = 2
+    error = None
+    finished = False
+    try:
+        while open_streams:
+            # Checked on every pass: a command that keeps writing never leaves the queue empty
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    raise queue.Empty
+                stream_name, data = events.get(timeout=remaining)
+            except queue.Empty:
+                _kill(process)
+                error = f"Command timed out after {timeout} seconds"
+                logger.warning(f"{error}: {cmd!r}")
+                break
+            if data is _DONE:
+                open_streams -= 1
+                continue
+            yield stream_name, data
+        # Both streams closed; the process may still be exiting
+        finished = True
+    finally:
+        if not finished and error is None and process.poll() is None:
+            # Generator closed early by the consumer
+            _kill(process)
+
+    try:
+        exit_code = process.wait(timeout=max(deadline - time.perf_counter(), 0))
+    except subprocess.TimeoutExpired:
+        # Closed its output but kept running
+        _kill(process)
+        error = f"Command timed out after {timeout} seconds"
+        logger.warning(f"{error}: {cmd!r}")
+        exit_code = process.wait()
+    yield "exit", {
+        "exit_code": exit_code,
+        "wall_time_s": round(time.perf_counter() - start, 3),
+        "error": error,
+    }
+
+
+def stream_command(
+    cmd: str,
+    timeout: float = TERMINAL_COMMAND_TIMEOUT,
+    on_start: Optional[Callable[[subprocess.Popen], None]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Summary:
+        Runs a single command and yields its output incrementally.
+
+    Args:
+        cmd (str): Command line; split with `shlex` and executed without a shell.
+        timeout (float): Seconds before the process is killed.
+        on_start (Optional[Callable[[subprocess.Popen], None]]): Called with
+            the process once it is running.
+
+    Yields:
+        Dict[str, Any]: `{"type": "stdout" | "stderr", "command", "data"}` events
+        while the command runs, followed by exactly one
+        `{"type": "exit", "command", "exit_code", "wall_time_s", "error"}` event.
+    """
+    decoders = {
+        name: codecs.getincrementaldecoder("utf-8")(errors="replace")
+        for name in ("stdout", "stderr")
+    }
+    for stream_name, data in _iter_process(cmd, timeout, on_start=on_start):
+        if stream_name == "exit":
+            yield {"type": "exit", "command": cmd, **data}
+            return
+        text = decoders[stream_name].decode(data)
+        if text:
+            yield {"type": stream_name, "command": cmd, "data": text}
+
+
+def run_command(
+    cmd: str,
+    timeout: float = TERMINAL_COMMAND_TIMEOUT,
+    cwd: Optional[str] = None,
+    env: Optional[Mapping[str, str]] = None,
+) -> Dict[str, Any]:
+    """
+    Summary:
+        Runs a single command to completion with bounded output capture.
+
+    Args:
+        cmd (str): Command line to execute.
+        timeout (float): Seconds before the process is killed.
+        cwd (Optional[str]): Working directory (default: the current directory).
+        env (Optional[Mapping[str, str]]): Environment (default: inherited).
+
+    Returns:
+        Dict[str, Any]: `command`, `exit_code`, `stdout`, `stderr`,
+        `wall_time_s`, `error` (None unless the command failed or timed out)
+        and `spill_files` (paths holding the full output of truncated streams).
+    """
+    captures = {name: BoundedCapture(name) for name in ("stdout", "stderr")}
+    result: Dict[str, Any] = {}
+    try:
+        for stream_name, data in _iter_process(cmd, timeout, cwd, env):
+            if stream_name == "exit":
+                result = data
+            else:
+                captures[stream_name].write(data)
+    finally:
+        for capture in captures.values():
+            capture.close()
+
+    return _build_result(cmd, captures, result)
+
+
+def _build_result(cmd: str, captures: Dict[str, BoundedCapture], exit_info: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Summary:
+        Assembles the result dictionary of a finished command.
+
+    Args:
+        cmd (str): Command line.
+        captures (Dict[str, BoundedCapture]): Closed stdout/stderr captures.
+        exit_info (Dict[str, Any]): `exit_code`, `wall_time_s` and `error`.
+
+    Returns:
+        Dict[str, Any]: Result in the format returned by `run_command`.
+    """
+    return {
+        "command": cmd,
+        "exit_code": exit_info.get("exit_code"),
+        "stdout": captures["stdout"].render(),
+        "stderr": captures["stderr"].render(),
+        "wall_time_s": exit_info.get("wall_time_s"),
+        "error": exit_info.get("error"),
+        "spill_files": [c.spill_path for c in captures.values() if c.spill_path],
+    }
+
+
+async def _apump(stream: asyncio.StreamReader, capture: BoundedCapture) -> None:
+    """Copies an asyncio subprocess stream into a capture until EOF."""
+    while True:
+        chunk = await stream.read(_READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        capture.write(chunk)
+
+
+async def arun_command(
+    cmd: str,
+    timeout: float = TERMINAL_COMMAND_TIMEOUT,
+    cwd: Optional[str] = None,
+    env: Optional[Mapping[str, str]] = None,
+) -> Dict[str, Any]:
+    """
+    Summary:
+        Async variant of `run_command` based on asyncio subprocesses.
+
+    Args:
+        cmd (str): Command line; split with `shlex` and executed without a shell.
+        timeout (float): Seconds before the process is killed.
+        cwd (Optional[str]): Working directory (default: the current directory).
+        env (Optional[Mapping[str, str]]): Environment (default: inherited).
+
+    Returns:
+        Dict[str, Any]: Result in the format returned by `run_command`.
+    """
+    captures = {name: BoundedCapture(name) for name in ("stdout", "stderr")}
+    start = time.perf_counter()
+    try:
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *shlex.split(cmd),
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                cwd=cwd,
+                env=env,
+            )
+        except Exception as e:
+            logger.warning(f"Failed to start command {cmd!r}: {e}")
+            exit_info = {"exit_code": None, "wall_time_s": round(time.perf_counter() - start, 3), "error": str(e)}
+            return _build_result(cmd, captures, exit_info)
+
+        error = None
+        pumps = asyncio.gather(
+            _apump(process.stdout, captures["stdout"]),
+            _apump(process.stderr, captures["stderr"]),
+            process.wait(),
+        )
+        # On cancellation the gathered pumps end with CancelledError; consume it
+        pumps.add_done_callback(lambda future: future.cancelled() or future.exception())
+        try:
+            await asyncio.wait_for(pumps, timeout=timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            error = f"Command timed out after {timeout} seconds"
+            logger.warning(f"{error}: {cmd!r}")
+        except asyncio.CancelledError:
+            process.kill()
+            raise
+        exit_code = await process.wait()
+        exit_info = {"exit_code": exit_code, "wall_time_s": round(time.perf_counter() - start, 3), "error": error}
+    finally:
+        for capture in captures.values():
+            capture.close()
+
+    return _build_result(cmd, captures, exit_info)
+
+
+def run_commands(
+    commands: List[str],
+    parallel: bool = False,
+    timeout: float = TERMINAL_COMMAND_TIMEOUT,
+    max_workers: int = TERMINAL_MAX_WORKERS,
+    runner: Callable[[str, float], Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Summary:
+        Runs several commands sequentially or on a bounded worker pool.
+
+    Args:
+        commands (List[str]): Commands to execute.
+        parallel (bool): Run commands concurrently; only safe when they are
+            independent of each other.
+        timeout (float): Per-command timeout in seconds.
+        max_workers (int): Upper bound on concurrently running commands.
+        runner (Callable[[str, float], Dict[str, Any]]): Function running one
+            command (`run_command` by default), e.g. a coalescing wrapper.
+
+    Returns:
+        List[Dict[str, Any]]: One result per command, in the input order.
+    """
+    runner = runner or run_command
+    if not parallel or len(commands) < 2:
+        return [runner(cmd, timeout) for cmd in commands]
+
+    workers = max(1, min(max_workers, len(commands)))
+    logger.debug("Running %d commands in parallel on %d workers", len(commands), workers)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="terminal") as pool:
+        return list(pool.map(lambda cmd: runner(cmd, timeout), commands))
+
+
+async def arun_commands(
+    commands: List[str],
+    parallel: bool = False,
+    timeout: float = TERMINAL_COMMAND_TIMEOUT,
+    max_workers: int = TERMINAL_MAX_WORKERS,
+    runner: Callable[[str, float], Awaitable[Dict[str, Any]]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Summary:
+        Async variant of `run_commands`.
+
+    Args:
+        commands (List[str]): Commands to execute.
+        parallel (bool): Run commands concurrently; only safe when they are
+            independent of each other.
+        timeout (float): Per-command timeout in seconds.
+        max_workers (int): Upper bound on concurrently running commands.
+        runner (Callable[[str, float], Awaitable[Dict[str, Any]]]): Coroutine
+            function running one command (`arun_command` by default).
+
+    Returns:
+        List[Dict[str, Any]]: One result per command, in the input order.
+    """
+    runner = runner or arun_command
+    if not parallel or len(commands) < 2:
+        return [await runner(cmd, timeout) for cmd in commands]
+
+    semaphore = asyncio.Semaphore(max(1, max_workers))
+
+    async def _bounded(cmd: str) -> Dict[str, Any]:
+        async with semaphore:
+            return await runner(cmd, timeout)
+
+    return list(await asyncio.gather(*(_bounded(cmd) for cmd in commands)))
+
+
+def stream_commands(
+    commands: List[str],
+    parallel: bool = False,
+    timeout: float = TERMINAL_COMMAND_TIMEOUT,
+    max_workers: int = TERMINAL_MAX_WORKERS,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Summary:
+        Streams output events for several commands.
+
+    Args:
+        commands (List[str]): Commands to execute.
+        parallel (bool): Run commands concurrently; events of different
+            commands are then interleaved as they arrive.
+        timeout (float): Per-command timeout in seconds.
+        max_workers (int): Upper bound on concurrently running commands.
+
+    Yields:
+        Dict[str, Any]: Events as produced by `stream_command`.
+    """
+    if not parallel or len(commands) < 2:
+        for cmd in commands:
+            yield from stream_command(cmd, timeout)
+        return
+
+    events: "queue.Queue" = queue.Queue()
+    running: set = set()
+    lock = threading.Lock()
+    stopped = False
+
+    def _started(process: subprocess.Popen) -> None:
+        with lock:
+            running.add(process)
+            if stopped:
+                _kill(process)
+
+    def _forward(cmd: str) -> None:
+        try:
+            for event in stream_command(cmd, timeout, on_start=_started):
+                events.put(event)
+        finally:
+            events.put(_DONE)
+
+    workers = max(1, min(max_workers, len(commands)))
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="terminal")
+    try:
+        for cmd in commands:
+            pool.submit(_forward, cmd)
+        pending = len(commands)
+        while pending:
+            event = events.get()
+            if event is _DONE:
+                pending -= 1
+                continue
+            yield event
+    finally:
+        # Consumer gone early: drop queued commands and kill the running ones
+        with lock:
+            stopped = True
+            for process in running:
+                if process.poll() is None:
+                    _kill(process)
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def format_result(result: Dict[str, Any]) -> str:
+    """
+    Summary:
+        Renders a command result as text for the agent.
+
+    Args:
+        result (Dict[str, Any]): Result produced by `run_command`.
+
+    Returns:
+        str: Command, exit code, wall time and captured output.
+    """
+    lines = [f"Command: {result['command']}"]
+    if result["error"] and result["exit_code"] is None:
+        lines.append(f"Error: {result['error']}")
+        return "\n".join(lines)
+
+    lines.append(f"Exit code: {result['exit_code']} | Wall time: {result['wall_time_s']}s")
+    if result.get("cache") == "hit":
+        lines.append(f"Cache: served from cache (recorded {result['cache_age_s']}s ago, environment unchanged)")
+    elif result.get("cache") == "miss":
+        lines.append("Cache: fresh run (result cached until the environment changes)")
+    if result["error"]:
+        lines.append(f"Error: {result['error']}")
+    lines.append(f"Output: {result['stdout']}")
+    if result["stderr"]:
+        lines.append(f"Stderr: {result['stderr']}")
+    return "\n".join(lines)
@@ -0,0 +1,443 @@
+"""
+Test Generation Module
+
+Summary:
+This module generates test cases with the chat model and verifies them by
+running them, so `generate_test_cases` returns only tests that pass.
+
+Description:
+- Every requested test case is generated by its own model call (in
+  parallel, each with a different focus: typical inputs, edge cases,
+  invalid inputs) and written as `test_case_<n>.py` next to the code under
+  test (`code_under_test.py`) in a temporary workspace.
+- One pytest run per round covers all pending candidates (pytest also runs
+  `unittest.TestCase` suites); per-file results are read from its JUnit XML
+  report. The run starts a fresh process of the agent's interpreter in the
+  workspace, never the warm interpreter (model-written code must not run
+  in a process forked from the agent), with a scrubbed environment, its
+  own `HOME` and temporary directory inside the workspace, and a timeout.
+- This is not a sandbox: the tests still run as the agent's user with
+  its filesystem and network access. Run the agent in a container or VM
+  when the code under test is untrusted.
+- Failing candidates are sent back to the model with their failure output
+  for up to `TESTGEN_MAX_REPAIR_ROUNDS` repair rounds, again in parallel.
+  The model must not bend a test to match buggy code: a test whose failure
+  points at a bug in the code under test is returned as a suspected bug
+  instead of being repaired. Model calls run in the caller's context, so
+  the request deadline and trace span apply to them.
+- The passing candidates are combined into the one file that is returned
+  (`test_suite.py`) and that file is run once more, under `coverage` when
+  it is installed. Candidates that break the combined file (e.g. a
+  duplicate name hiding another test) are dropped as failing, so the
+  returned file is exactly what was verified.
+"""
+
+import contextvars
+import io
+import os
+import re
+import shlex
+import shutil
+import site
+import sys
+import tempfile
+import xml.etree.ElementTree as ElementTree
+from concurrent.futures import ThreadPoolExecutor
+from importlib.util import find_spec
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.messages import HumanMessage
+
+from config import (
+    MODEL_CASCADE_ENABLED,
+    TESTGEN_MAX_REPAIR_ROUNDS,
+    TESTGEN_MAX_WORKERS,
+    TESTGEN_TIMEOUT,
+    TESTGEN_FEEDBACK_MAX_CHARS,
+)
+from deadline import remaining_timeout
+from logger_config import setup_logger
+from shell_sessions import scrubbed_environment
+from terminal import run_command
+
+# Initialize logger for this module
+logger = setup_logger(__name__)
+
+CODE_MODULE = "code_under_test"
+SUITE_MODULE = "test_suite"
+_FOCUS = (
+    "typical, valid inputs",
+    "edge cases and boundary values",
+    "invalid inputs and the exceptions they raise",
+)
+_CODE_BLOCK = re.compile(r"```(?:python|py)?[ \t]*\n(.*?)(?:```|\Z)", re.DOTALL)
+_SUSPECTED_BUG = re.compile(r"^#\s*SUSPECTED BUG:\s*(.*)$", re.MULTILINE)
+
+
+def extract_code(text: str) -> str:
+    """
+    Summary:
+        Returns the code of a model reply, without Markdown fences.
+
+    Args:
+        text (str): Model reply.
+
+    Returns:
+        str: Content of the first fenced code block, or the whole reply.
+    """
+    match = _CODE_BLOCK.search(text)
+    return (match.group(1) if match else text).strip() + "\n"
+
+
+def _generation_prompt(function_code: str, test_framework: str, index: int, total: int) -> str:
+    focus = _FOCUS[(index - 1) % len(_FOCUS)]
+    return f"""
+You are a senior Python QA engineer.
+
+Task:
+Write test case {index} of {total} for the given Python code using the
+{test_framework} framework. This test case focuses on {focus}.
+
+Rules:
+- Output ONLY runnable test code in a single ```python block
+- Import the code under test with `from {CODE_MODULE} import *`
+- Write exactly one test{f" method in one unittest.TestCase class named `TestCase{index}`" if test_framework == "unittest" else " function"}, named with the prefix `test_{index}_`
+- Give any helper function or fixture the prefix `_case{index}_`; all test cases end up in one file
+- Follow {test_framework} best practices and add a short comment to the test
+- Only use the standard library and {test_framework}
+
+Code Under Test:
+```python
+{function_code}
+```
+"""
+
+
+def _repair_prompt(function_code: str, test_framework: str, test_code: str, failure: str) -> str:
+    return f"""
+You are a senior Python QA engineer.
+
+The {test_framework} test below fails against the code under test. Fix the test
+so that it passes and still checks the intended behavior.
+
+If the failure shows a genuine bug in the code under test, do NOT change the test
+to accept the buggy behavior. Output the test unchanged instead, with this first line:
+# SUSPECTED BUG: <one-line description of the bug>
+
+Rules:
+- Output ONLY the complete test code in a single ```python block
+- Keep importing the code under test with `from {CODE_MODULE} import *`
+- Keep the test, class and helper names unchanged
+
+Code Under Test:
+```python
+{function_code}
+```
+
+Failing Test:
+```python
+{test_code}
+```
+
+Failure Output:
+```
+{failure}
+```
+"""
+
+
+def _ask_all(pool: ThreadPoolExecutor, model: Any, prompts: List[str]) -> List[str]:
+    # Each call runs in a copy of the caller's context (deadline, trace span)
+    futures = [pool.submit(contextvars.copy_context().run, _ask, model, prompt) for prompt in prompts]
+    return [future.result() for future in futures]
+
+
+def combine_tests(tests: Dict[str, str]) -> str:
+    """
+    Summary:
+        Joins test candidates into one test file.
+
+    Args:
+        tests (Dict[str, str]): Test code per candidate name, in file order.
+
+    Returns:
+        str: Code of the combined file.
+    """
+    parts = []
+    for name, code in tests.items():
+        parts += [f"# --- {name} ---", code.rstrip(), ""]
+    return "\n".join(parts)
+
+
+def _ask(model: Any, prompt: str) -> str:
+    messages = [HumanMessage(content=prompt)]
+    if model is None:
+        from cascade import invoke_cascade
+        return extract_code(invoke_cascade(messages).text)
+    return extract_code(model.invoke(messages).text)
+
+
+class TestWorkspace:
+    """
+    Summary:
+        Temporary directory holding the code under test and candidate tests.
+
+    Args:
+        function_code (str): Code under test, written to `code_under_test.py`.
+    """
+
+    def __init__(self, function_code: str):
+        self.path = tempfile.mkdtemp(prefix="testgen_")
+        # Tests collected per candidate in the latest run that included it
+        self.test_counts: Dict[str, int] = {}
+        self.code_path = os.path.join(self.path, f"{CODE_MODULE}.py")
+        with open(self.code_path, "w", encoding="utf-8") as handle:
+            handle.write(function_code)
+
+    def environment(self) -> Dict[str, str]:
+        """
+        Summary:
+            Returns the environment test runs get.
+
+        Returns:
+            Dict[str, str]: The scrubbed agent environment with `HOME` and the
+                temporary directory moved into the workspace.
+        """
+        home, tmp = os.path.join(self.path, "home"), os.path.join(self.path, "tmp")
+        os.makedirs(home, exist_ok=True)
+        os.makedirs(tmp, exist_ok=True)
+        env = scrubbed_environment()
+        # Packages installed with `pip --user` stay importable under the new HOME
+        env.setdefault("PYTHONUSERBASE", site.getuserbase())
+        env.update(HOME=home, TMPDIR=tmp, TMP=tmp, TEMP=tmp, PYTHONDONTWRITEBYTECODE="1")
+        return env
+
+    def write(self, name: str, code: str) -> None:
+        """Writes the candidate `name` (e.g. "test_case_1") to the workspace."""
+        with open(os.path.join(self.path, f"{name}.py"), "w", encoding="utf-8") as handle:
+            handle.write(code)
+
+    def run(self, names: List[str], coverage: bool = False) -> Tuple[Dict[str, Optional[str]], Optional[float]]:
+        """
+        Summary:
+            Runs the given candidates in one pytest process.
+
+        Args:
+            names (List[str]): Candidates to run.
+            coverage (bool): Measure line coverage of the code under test.
+
+        Returns:
+            Tuple[Dict[str, Optional[str]], Optional[float]]: Failure output
+                per candidate (None if it passed) and the coverage percentage
+                (None if not measured).
+        """
+        report = os.path.join(self.path, "report.xml")
+        data_file = os.path.join(self.path, ".coverage")
+        for stale in (report, data_file):
+            if os.path.exists(stale):
+                os.unlink(stale)
+
+        argv = [sys.executable]
+        if coverage:
+            argv += ["-m", "coverage", "run", f"--data-file={data_file}", f"--include={self.code_path}"]
+        argv += [
+            "-m", "pytest", "-q", "-p", "no:cacheprovider", "--continue-on-collection-errors",
+            "-o", "junit_family=xunit1", f"--junitxml={report}",
+        ]
+        argv += [f"{name}.py" for name in names]
+        result = run_command(shlex.join(argv), remaining_timeout(TESTGEN_TIMEOUT), cwd=self.path, env=self.environment())
+
+        if not os.path.exists(report):
+            output = result["error"] or (result["stdout"] + result["stderr"])
+            return {name: _tail(output or "pytest produced no report") for name in names}, None
+
+        failures: Dict[str, List[str]] = {name: [] for name in names}
+        collected, counts = set(), {}
+        for case in ElementTree.parse(report).iter("testcase"):
+            name = os.path.splitext(os.path.basename(case.get("file", "")))[0]
+            if name not in failures:
+                continue
+            collected.add(name)
+            counts[name] = counts.get(name, 0) + 1
+            for outcome in case:
+                if outcome.tag in ("failure", "error"):
+                    failures[name].append(f"{case.get('name')}: {outcome.get('message', '')}\n{outcome.text or ''}")
+        results = {
+            name: (_tail("\n".join(failures[name])) if failures[name] else None) if name in collected
+            else "No tests were collected from this file"
+            for name in names
+        }
+        self.test_counts.update({name: counts.get(name, 0) for name in names})
+        return results, self._coverage(data_file) if coverage else None
+
+    def _coverage(self, data_file: str) -> Optional[float]:
+        if not os.path.exists(data_file):
+            return None
+        try:
+            from coverage import Coverage
+
+            measured = Coverage(data_file=data_file)
+            measured.load()
+            return round(measured.report(include=[self.code_path], file=io.StringIO()), 1)
+        except Exception as e:
+            logger.warning(f"Could not read coverage data: {e}")
+            return None
+
+    def close(self) -> None:
+        """Deletes the workspace."""
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def _tail(text: str) -> str:
+    return text if len(text) <= TESTGEN_FEEDBACK_MAX_CHARS else "...\n" + text[-TESTGEN_FEEDBACK_MAX_CHARS:]
+
+
+def _verify_combined(workspace: TestWorkspace, passing: Dict[str, str]) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """
+    Summary:
+        Checks that the passing candidates still pass as one combined file.
+
+    Args:
+        workspace (TestWorkspace): Workspace holding the candidates.
+        passing (Dict[str, str]): Test code of candidates that pass on their own.
+
+    Returns:
+        Tuple[Dict[str, str], Dict[str, str]]: The candidates kept in the
+            combined file (written as `test_suite.py`) and the failure
+            output of those dropped from it.
+    """
+
+    def passes(tests: Dict[str, str]) -> Optional[str]:
+        workspace.write(SUITE_MODULE, combine_tests(tests))
+        results, _ = workspace.run([SUITE_MODULE])
+        expected = sum(workspace.test_counts[name] for name in tests)
+        if results[SUITE_MODULE] is None and workspace.test_counts[SUITE_MODULE] != expected:
+            return f"Only {workspace.test_counts[SUITE_MODULE]} of {expected} tests ran in the combined file (duplicate names?)"
+        return results[SUITE_MODULE]
+
+    if passes(passing) is None:
+        return passing, {}
+    # Add the candidates one at a time, dropping those that break the file
+    kept, conflicts = {}, {}
+    for name, code in passing.items():
+        failure = passes({**kept, name: code})
+        if failure is None:
+            kept[name] = code
+        else:
+            conflicts[name] = f"Fails when combined with the other test cases into one file:\n{failure}"
+    logger.warning(f"Dropped {len(conflicts)} test cases that break the combined test file")
+    if kept:
+        workspace.write(SUITE_MODULE, combine_tests(kept))
+    return kept, conflicts
+
+
+def generate_test_suite(
+    function_code: str,
+    test_framework: str = "pytest",
+    num_test_cases: int = 3,
+    max_repair_rounds: int = TESTGEN_MAX_REPAIR_ROUNDS,
+    model: Any = None,
+) -> Dict[str, Any]:
+    """
+    Summary:
+        Generates test cases and keeps those that pass after repair rounds.
+
+    Args:
+        function_code (str): Python function or class code to test.
+        test_framework (str): "pytest" or "unittest".
+        num_test_cases (int): Number of test cases to generate.
+        max_repair_rounds (int): Rounds of feeding failures back to the model.
+        model (Any): Chat model (default: the model cascade, or the shared
+            model from client.py when the cascade is disabled).
+
+    Returns:
+        Dict[str, Any]: `passing` (test code per candidate name, verified as
+        one combined file), `failing` (last failure output per candidate
+        name), `suspected_bugs` (`reason`, `code` and `failure` of tests the
+        model kept failing because the code under test looks wrong),
+        `coverage` (percentage of the code under test covered by the passing
+        tests, or None) and `rounds` (test runs before the verification runs).
+    """
+    if model is None and not MODEL_CASCADE_ENABLED:
+        from client import get_model
+        model = get_model()
+
+    names = [f"test_case_{i}" for i in range(1, num_test_cases + 1)]
+    workspace = TestWorkspace(function_code)
+    workers = max(1, min(TESTGEN_MAX_WORKERS, num_test_cases))
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            prompts = [_generation_prompt(function_code, test_framework, i, num_test_cases) for i in range(1, num_test_cases + 1)]
+            code = dict(zip(names, _ask_all(pool, model, prompts)))
+
+            pending, passing, failing, suspected = list(names), {}, {}, {}
+            rounds = 0
+            while pending:
+                for name in pending:
+                    workspace.write(name, code[name])
+                results, _ = workspace.run(pending)
+                rounds += 1
+                failing = {name: failure for name, failure in results.items() if failure is not None}
+                passing.update({name: code[name] for name in pending if results[name] is None})
+                logger.info(f"Test generation round {rounds}: {len(passing)}/{num_test_cases} passing")
+                if not failing or rounds > max_repair_rounds:
+                    break
+                pending = list(failing)
+                repairs = _ask_all(
+                    pool, model,
+                    [_repair_prompt(function_code, test_framework, code[name], failing[name]) for name in pending],
+                )
+                for name, repaired in zip(list(pending), repairs):
+                    bug = _SUSPECTED_BUG.search(repaired)
+                    if bug is not None:
+                        # Kept failing on purpose: the code under test looks wrong
+                        suspected[name] = {"reason": bug.group(1).strip(), "code": repaired, "failure": failing.pop(name)}
+                        pending.remove(name)
+                    else:
+                        code[name] = repaired
+        if suspected:
+            logger.warning(f"Test generation found {len(suspected)} suspected bugs in the code under test")
+
+        passing = {name: passing[name] for name in names if name in passing}
+        coverage = None
+        if passing:
+            passing, conflicts = _verify_combined(workspace, passing)
+            failing.update(conflicts)
+            # Measure what the returned file covers
+            _, coverage = workspace.run([SUITE_MODULE], coverage=find_spec("coverage") is not None) if passing else (None, None)
+        return {"passing": passing, "failing": failing, "suspected_bugs": suspected, "coverage": coverage, "rounds": rounds}
+    except Exception as e:
+        logger.error(f"Test generation failed: {str(e)}", exc_info=True)
+        raise
+    finally:
+        workspace.close()
+
+
+def format_test_suite(suite: Dict[str, Any], num_test_cases: int) -> str:
+    """
+    Summary:
+        Renders a generated suite as one runnable test file.
+
+    Args:
+        suite (Dict[str, Any]): Result of `generate_test_suite`.
+        num_test_cases (int): Number of requested test cases.
+
+    Returns:
+        str: The verified combined test file with a verification header,
+            followed by suspected bugs as commented-out failing tests.
+    """
+    coverage = f"{suite['coverage']}%" if suite["coverage"] is not None else "not measured"
+    lines = [
+        f"# Verified: {len(suite['passing'])}/{num_test_cases} test cases pass as this file "
+        f"(line coverage: {coverage}, test runs: {suite['rounds']})",
+        f"# The code under test is imported as `{CODE_MODULE}`; adjust the import to its real module.",
+    ]
+    suspected = suite.get("suspected_bugs") or {}
+    if suspected:
+        lines.append(f"# Suspected bugs: {len(suspected)} test cases fail against the code under test (see the end of the file).")
+    if suite["passing"]:
+        lines += ["", combine_tests(suite["passing"]).rstrip()]
+    for name, bug in suspected.items():
+        lines += ["", f"# --- {name}: FAILING, suspected bug: {bug['reason']} ---"]
+        lines += [f"# {line}".rstrip() for line in bug["code"].rstrip().splitlines()]
+    return "\n".join(lines) + "\n"
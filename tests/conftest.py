@@ -0,0 +1,25 @@
+"""
+Shared pytest setup: the modules live at the repository root.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def fake_backends():
+    """Installs the offline fakes and restores the previous backends afterwards."""
+    import agent
+    import client
+    from server import use_fake_backends
+
+    saved = (client._model, client._model_overridden, client._search_client)
+    use_fake_backends()
+    yield use_fake_backends
+    with client._init_lock:
+        client._model, client._model_overridden, client._search_client = saved
+    agent.reset_agent()
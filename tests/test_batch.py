@@ -0,0 +1,88 @@
+"""
+Tests for concurrency, timeouts, result order and per-item error isolation
+in batch.py, on the offline fakes.
+"""
+
+import asyncio
+import threading
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from batch import run_batch
+from client import set_model
+from fakes import FakeChatModel
+
+pytestmark = pytest.mark.usefixtures("fake_backends")
+
+
+_lock = threading.Lock()
+_state = {}
+
+
+class SlowChatModel(FakeChatModel):
+    """Answers after a per-query delay and records the peak number of calls in flight."""
+
+    delays: dict = {}
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        query = next(m.text for m in messages if m.type == "human")
+        with _lock:
+            _state["in_flight"] += 1
+            _state["peak"] = max(_state["peak"], _state["in_flight"])
+        try:
+            await asyncio.sleep(self.delays.get(query, 0.05))
+        finally:
+            with _lock:
+                _state["in_flight"] -= 1
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=f"answer: {query}"))])
+
+
+def slow_model(**delays) -> dict:
+    _state.update(in_flight=0, peak=0)
+    set_model(SlowChatModel(delays=delays))
+    return _state
+
+
+def test_concurrency_is_capped():
+    state = slow_model()
+    results = run_batch([f"q{i}" for i in range(6)], max_concurrency=2, timeout=30)
+    assert [r["status"] for r in results] == ["ok"] * 6
+    assert state["peak"] == 2
+
+
+def test_results_arrive_in_completion_order_with_input_index():
+    slow_model(slow=0.5, fast=0.01)
+    results = run_batch([{"id": "s", "query": "slow"}, {"id": "f", "query": "fast"}], max_concurrency=2, timeout=30)
+    assert [(r["id"], r["index"]) for r in results] == [("f", 1), ("s", 0)]
+    assert results[1]["output"] == "answer: slow"
+
+
+def test_item_deadline_does_not_affect_other_items():
+    slow_model(stuck=5.0)
+    items = [{"id": "stuck", "query": "stuck", "deadline_s": 0.2}, {"id": "quick", "query": "quick"}]
+    results = {r["id"]: r for r in run_batch(items, max_concurrency=2, timeout=30)}
+    # The deadline cancels the stuck model call and ends the item with a partial answer
+    assert results["stuck"]["status"] == "partial"
+    assert results["stuck"]["elapsed_s"] < 2
+    assert results["stuck"]["timing"]["stopped"] == "deadline"
+    assert results["quick"]["status"] == "ok" and results["quick"]["output"] == "answer: quick"
+
+
+def test_malformed_items_fail_on_their_own():
+    items = [
+        "hello",
+        {"id": "b"},
+        42,
+        {"id": "d", "query": "hi", "deadline_s": "soon"},
+        {"id": "e", "query": "hello again"},
+    ]
+    results = {r["index"]: r for r in run_batch(items, max_concurrency=2, timeout=30)}
+
+    assert results[0]["status"] == "ok" and "hello" in results[0]["output"]
+    assert results[1]["id"] == "b" and results[1]["status"] == "error"
+    assert "query" in results[1]["error"]
+    assert results[2]["status"] == "error" and "int" in results[2]["error"]
+    assert results[3]["status"] == "error" and "deadline_s" in results[3]["error"]
+    assert results[4]["id"] == "e" and results[4]["status"] == "ok"
@@ -0,0 +1,54 @@
+"""
+Tests for the offline agent turn benchmark in benchmarks/agent_turns.py.
+"""
+
+import asyncio
+import json
+
+import pytest
+
+import tools
+from benchmarks import agent_turns
+from benchmarks.agent_turns import main, percentile, run_benchmark
+
+
+def test_percentile_is_nearest_rank():
+    values = [5.0, 1.0, 4.0, 2.0, 3.0]
+    assert percentile(values, 50) == 3.0
+    assert percentile(values, 99) == 5.0
+    assert percentile([], 50) is None
+
+
+def test_benchmark_replays_workloads_offline(fake_backends, monkeypatch):
+    monkeypatch.setattr(tools, "search_cache", tools.search_cache)
+    report = asyncio.run(run_benchmark(
+        ["search", "testgen"], turns=4, concurrency=2, model_latency=0, search_latency=0, warmup=1,
+    ))
+
+    assert report["benchmark"] == "agent_turns"
+    assert report["turns"] == 4 and report["errors"] == 0
+    assert set(report["latency_ms"]) == {"p50", "p95", "p99", "mean", "max"}
+    assert report["latency_ms"]["p50"] <= report["latency_ms"]["p99"]
+    # Every turn goes through one real tool call; the cache is off, so each search hits the client
+    assert report["tool_calls"]["by_tool"] == {"web_search_tool": 2, "generate_test_cases": 2}
+    assert report["per_workload"]["search"]["turns"] == 2
+    assert report["search_calls"] == 3
+
+
+def test_unknown_workload_is_rejected(fake_backends):
+    with pytest.raises(ValueError, match="Unknown workloads"):
+        asyncio.run(run_benchmark(["nope"], turns=1, concurrency=1, model_latency=0, search_latency=0))
+
+
+def test_main_writes_the_json_report(fake_backends, monkeypatch, tmp_path):
+    monkeypatch.setattr(tools, "search_cache", tools.search_cache)
+    # Keep the console handlers and AGENT_LOG_CONSOLE as they are for the other tests
+    monkeypatch.setattr(agent_turns, "redirect_console_logging", lambda stream: None)
+    monkeypatch.setattr(agent_turns, "set_console_level", lambda level: None)
+    output = tmp_path / "bench.json"
+    code = main(["--workloads", "search", "--turns", "2", "--warmup", "0",
+                 "--model-latency", "0", "--search-latency", "0", "--output", str(output)])
+
+    assert code == 0
+    report = json.loads(output.read_text())
+    assert report["config"]["workloads"] == ["search"] and report["turns"] == 2
@@ -0,0 +1,41 @@
+"""
+Tests for the two-tier cache in cache.py.
+"""
+
+import time
+
+from cache import TieredCache, make_cache_key
+
+
+def test_make_cache_key_is_stable():
+    assert make_cache_key("a", {"x": 1, "y": 2}) == make_cache_key("a", {"y": 2, "x": 1})
+    assert make_cache_key("a", 1) != make_cache_key("a", 2)
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = TieredCache("test", max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+def test_entries_expire():
+    cache = TieredCache("test", ttl=60)
+    cache.set("short", "value", ttl=0.01)
+    cache.set("long", "value")
+    time.sleep(0.02)
+    assert cache.get("short") is None
+    assert cache.get("long") == "value"
+
+
+def test_disk_tier_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "cache.db")
+    TieredCache("test", db_path=path).set("key", {"answer": 42})
+
+    fresh = TieredCache("test", db_path=path)
+    assert fresh.get("key") == {"answer": 42}
+    assert fresh.disk_hits == 1
+    assert TieredCache("other", db_path=path).get("key") is None
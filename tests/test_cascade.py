@@ -0,0 +1,80 @@
+"""
+Tests for the model cascade in cascade.py, on the offline fakes.
+"""
+
+import asyncio
+import io
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.tools import tool
+
+import cascade
+from fakes import FakeChatModel
+
+
+@tool
+def lookup(query: str) -> str:
+    """Looks something up."""
+    return query
+
+
+def test_escalation_reason():
+    assert cascade.escalation_reason(None) is None
+    assert cascade.escalation_reason(AIMessage(content="done")) is None
+    truncated = AIMessage(content="cut", response_metadata={"finish_reason": "MAX_TOKENS"})
+    assert cascade.escalation_reason(truncated) == "truncated"
+    malformed = AIMessage(content="", response_metadata={"finish_reason": "MALFORMED_FUNCTION_CALL"})
+    assert cascade.escalation_reason(malformed) == "malformed_tool_call"
+
+    def call(name, args):
+        return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": "1"}])
+
+    assert cascade.escalation_reason(call("lookup", {"query": "x"}), [lookup]) is None
+    assert cascade.escalation_reason(call("missing", {}), [lookup]) == "unknown_tool"
+    assert cascade.escalation_reason(call("lookup", {}), [lookup]) == "invalid_tool_args"
+    # Provider-side tools (dicts) cannot be validated
+    assert cascade.escalation_reason(call("missing", {}), [lookup, {"google_search": {}}]) is None
+
+
+@pytest.fixture
+def two_tiers(monkeypatch, fake_backends):
+    import config
+
+    monkeypatch.setattr(config, "MODEL_CASCADE_ENABLED", True)
+    truncated = AIMessage(content="TRUNCATED partial", response_metadata={"finish_reason": "MAX_TOKENS"})
+    tiers = [("small", FakeChatModel(responses=[truncated])), ("large", FakeChatModel(responses=[AIMessage(content="FULL answer")]))]
+    monkeypatch.setattr(cascade, "_tiers", lambda start: iter(tiers))
+    monkeypatch.setattr(cascade, "MODEL_TIERS", [{"name": "small"}, {"name": "large"}])
+
+
+def test_invoke_cascade_escalates(two_tiers):
+    assert cascade.invoke_cascade([HumanMessage(content="hi")]).content == "FULL answer"
+
+
+def test_async_cascade_escalates(two_tiers):
+    messages = [HumanMessage(content="hi")]
+    escalations = []
+    response = asyncio.run(
+        cascade._arun(messages, (), lambda model: model.ainvoke(messages), lambda *args: escalations.append(args))
+    )
+    assert response.content == "FULL answer"
+    assert escalations == [("small", "truncated")]
+
+
+def test_stream_resets_escalated_tokens(two_tiers):
+    from streaming import print_stream, stream_agent
+
+    inputs = {"messages": [HumanMessage(content="hi")]}
+    events = [e for e in stream_agent(inputs) if e["type"] in ("token", "reset", "final")]
+    assert events == [
+        {"type": "token", "content": "TRUNCATED partial"},
+        {"type": "reset", "reason": "truncated"},
+        {"type": "token", "content": "FULL answer"},
+        {"type": "final", "content": "FULL answer"},
+    ]
+
+    out = io.StringIO()
+    assert print_stream(inputs, out=out) == "FULL answer"
+    assert out.getvalue().rstrip().endswith("FULL answer")
+    assert "[discarded: truncated" in out.getvalue()
@@ -0,0 +1,39 @@
+"""
+Tests for cassette record/replay in cassette.py, on the offline fakes.
+"""
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from cassette import Cassette, CassetteChatModel, CassetteMiss, CassetteSearchClient
+from fakes import FakeChatModel, FakeSearchClient
+
+
+def test_recorded_exchanges_replay_offline(tmp_path):
+    path = str(tmp_path / "run.jsonl.gz")
+    messages = [HumanMessage(content="hello")]
+    tool_call = AIMessage(content="", tool_calls=[{"name": "web_search", "args": {"query": "x"}, "id": "1"}])
+
+    recording = Cassette(path, "record")
+    model = CassetteChatModel(cassette=recording, inner=FakeChatModel(responses=[tool_call]))
+    search = CassetteSearchClient(recording, FakeSearchClient())
+    recorded_reply = model.invoke(messages)
+    recorded_results = search.search({"q": "python", "api_key": "secret"})
+    recording.close()
+
+    replay = Cassette(path, "replay")
+    model = CassetteChatModel(cassette=replay)
+    search = CassetteSearchClient(replay)
+    reply = model.invoke(messages)
+    assert reply.tool_calls == recorded_reply.tool_calls
+    # The API key is not part of the request key
+    assert search.search({"q": "python", "api_key": "other"}) == recorded_results
+    assert replay.hits == 2
+
+    with pytest.raises(CassetteMiss):
+        model.invoke([HumanMessage(content="never recorded")])
+
+
+def test_unknown_mode_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        Cassette(str(tmp_path / "x.jsonl.gz"), "rewind")
@@ -0,0 +1,72 @@
+"""
+Tests for the read-only command cache keys in command_cache.py.
+"""
+
+import os
+import subprocess
+import sys
+
+from command_cache import _interpreter, allow_listed, environment_fingerprint
+
+
+def test_allow_list_matches_the_program_name():
+    patterns = ["python --version", "pip list*"]
+    assert allow_listed("/usr/bin/python --version", patterns) == ["/usr/bin/python", "--version"]
+    assert allow_listed("pip list --format json", patterns) is not None
+    assert allow_listed("pip install requests", patterns) is None
+    assert allow_listed("python 'unterminated", patterns) is None
+
+
+def test_fingerprint_follows_the_environment(tmp_path):
+    env = {"PATH": os.path.dirname(sys.executable), "HOME": str(tmp_path)}
+    argv = [os.path.basename(sys.executable), "--version"]
+    base = environment_fingerprint(argv, str(tmp_path), env)
+    assert base is not None and base["program"].startswith(os.path.dirname(sys.executable))
+    assert "site_packages" in base
+
+    assert environment_fingerprint(argv, str(tmp_path), env) == base
+    assert environment_fingerprint(argv, "/", env) != base
+    assert environment_fingerprint(argv, str(tmp_path), {**env, "VIRTUAL_ENV": "/venv"}) != base
+    assert environment_fingerprint(["no-such-program-xyz"], str(tmp_path), env) is None
+
+
+def test_fingerprint_changes_when_packages_change(tmp_path):
+    site = tmp_path / "site"
+    site.mkdir()
+    env = {"PATH": os.path.dirname(sys.executable), "PYTHONPATH": str(site)}
+    argv = [os.path.basename(sys.executable), "-m", "pip", "list"]
+    before = environment_fingerprint(argv, str(tmp_path), env)
+    # Installing a package touches the site directory
+    mtime = dict(before["site_packages"])[str(site)]
+    os.utime(site, ns=(mtime, mtime + 10**9))
+    assert environment_fingerprint(argv, str(tmp_path), env) != before
+
+
+def test_pip_fingerprint_uses_the_interpreters_own_site_dirs(tmp_path):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    pip = bin_dir / "pip"
+    pip.write_text(f"#!{sys.executable}\nimport sys\n")
+    pip.chmod(0o755)
+    extra = tmp_path / "extra"
+    extra.mkdir()
+    env = {"PATH": str(bin_dir), "PYTHONPATH": str(extra)}
+
+    fingerprint = environment_fingerprint(["pip", "list"], str(tmp_path), env)
+    dirs = [path for path, _ in fingerprint["site_packages"]]
+    assert str(extra) in dirs
+    # e.g. Debian's dist-packages, wherever the interpreter keeps them
+    reported = subprocess.run(
+        [sys.executable, "-c", "import site; print(site.getsitepackages()[0])"], capture_output=True, text=True
+    ).stdout.strip()
+    if os.path.isdir(reported):
+        assert reported in dirs
+
+
+def test_pip_shim_maps_to_the_python_next_to_it(tmp_path):
+    python = tmp_path / "python"
+    python.symlink_to(sys.executable)
+    shim = tmp_path / "pip"
+    shim.write_text("#!/usr/bin/env bash\nexec pyenv exec pip \"$@\"\n")
+    shim.chmod(0o755)
+    assert _interpreter(str(shim), {"PATH": str(tmp_path)}) == str(python)
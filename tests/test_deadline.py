@@ -0,0 +1,81 @@
+"""
+Tests for the request deadline and step budget in deadline.py, on the
+offline fakes.
+"""
+
+import asyncio
+import time
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from agent import get_agent, reset_agent
+from batch import build_message_set
+from client import set_model
+from deadline import current_deadline, deadline_config, deadline_scope, remaining_timeout
+from fakes import FakeChatModel
+
+pytestmark = pytest.mark.usefixtures("fake_backends")
+
+
+def _search_loop(turns: int) -> list:
+    # A model that never stops asking for another search
+    return [
+        AIMessage(content="", tool_calls=[{
+            "name": "web_search_tool", "args": {"query": f"loop {i}", "num_results": 1}, "id": f"call_{i}",
+        }])
+        for i in range(turns)
+    ]
+
+
+def _install(model: FakeChatModel):
+    set_model(model)
+    reset_agent()
+    return get_agent()
+
+
+def test_step_budget_stops_a_tool_loop():
+    agent = _install(FakeChatModel(responses=_search_loop(10)))
+    with deadline_scope(None, max_steps=2):
+        result = agent.invoke(build_message_set("keep searching"), config=deadline_config(2))
+
+    final = result["messages"][-1]
+    timing = final.response_metadata["deadline"]
+    assert timing["stopped"] == "step_budget"
+    assert timing["steps"] == 2 and timing["tool_calls"] == 2
+    # The partial answer carries the tool results gathered before the stop
+    assert final.text.startswith("Stopped early: the budget of 2 steps was used up after 2 steps")
+    assert "- web_search_tool:" in final.text
+
+
+def test_deadline_cancels_a_slow_model_call():
+    agent = _install(FakeChatModel(latency=30))
+
+    async def run():
+        with deadline_scope(0.2, max_steps=None):
+            return await agent.ainvoke(build_message_set("slow"))
+
+    start = time.monotonic()
+    result = asyncio.run(run())
+    assert time.monotonic() - start < 5
+
+    final = result["messages"][-1]
+    assert final.response_metadata["deadline"]["stopped"] == "deadline"
+    assert "the 0.2s deadline was reached" in final.text
+    assert "No results were produced in time." in final.text
+
+
+def test_unbudgeted_run_is_untouched():
+    agent = _install(FakeChatModel(responses=_search_loop(2)))
+    result = agent.invoke(build_message_set("two searches"))
+    assert result["messages"][-1].text == "Fake answer to: two searches"
+    assert "deadline" not in result["messages"][-1].response_metadata
+
+
+def test_remaining_timeout_and_config():
+    assert remaining_timeout(7) == 7 and current_deadline() is None
+    with deadline_scope(1, max_steps=3) as deadline:
+        assert current_deadline() is deadline
+        assert remaining_timeout(30) <= 1 and remaining_timeout(0.5) == 0.5
+    assert current_deadline() is None
+    assert deadline_config(3) == {"recursion_limit": 28} and deadline_config(None) == {}
@@ -0,0 +1,51 @@
+"""
+Tests for the lazy client and agent construction in client.py and agent.py.
+"""
+
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import client
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_imports_need_no_credentials_or_provider_sdk(tmp_path):
+    env = {key: value for key, value in os.environ.items() if key not in ("GEMINI_API_KEY", "SERPAPI_API_KEY")}
+    script = (
+        "import sys; import agent, client, main, tools; "
+        "print(sorted(m for m in sys.modules if m.startswith(('langchain_google_genai', 'dotenv'))))"
+    )
+    env["PYTHONPATH"] = ROOT
+    # A directory without .env, so no key can be picked up
+    process = subprocess.run([sys.executable, "-c", script], cwd=tmp_path, env=env,
+                             capture_output=True, text=True, timeout=120)
+    assert process.returncode == 0, process.stderr
+    assert process.stdout.strip().splitlines()[-1] == "[]"
+
+
+def test_model_is_built_once_on_first_use(monkeypatch):
+    built = []
+
+    def slow_build(model_id, max_output_tokens):
+        time.sleep(0.05)
+        built.append(model_id)
+        return object()
+
+    monkeypatch.setattr(client, "_build_model", slow_build)
+    monkeypatch.setattr(client, "_model", None)
+    monkeypatch.setattr(client, "_model_overridden", False)
+
+    models = []
+    threads = [threading.Thread(target=lambda: models.append(client.get_model())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(built) == 1
+    assert all(model is models[0] for model in models)
+    assert client.model is models[0]
@@ -0,0 +1,76 @@
+"""
+Tests for the LLM response cache keys in llm_cache.py.
+"""
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from cache import TieredCache
+from fakes import FakeChatModel
+from llm_cache import TieredLLMCache, bypass_llm_cache
+
+SEARCH_TOOL = {"type": "function", "function": {"name": "search", "parameters": {"type": "object", "properties": {}}}}
+CODE_TOOL = {"type": "function", "function": {"name": "run_code", "parameters": {"type": "object", "properties": {}}}}
+MESSAGES = [HumanMessage(content="hello")]
+
+
+calls = []
+
+
+class CountingChatModel(FakeChatModel):
+    """Numbers its answers, so a cached answer is recognizable."""
+
+    temperature: float = 0.0
+
+    @property
+    def _identifying_params(self):
+        # Generation settings are part of the cache key, as for the Gemini model
+        return {"temperature": self.temperature}
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        calls.append(kwargs)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=f"answer {len(calls)}"))])
+
+
+def _cache(tmp_path) -> TieredLLMCache:
+    return TieredLLMCache(TieredCache("llm-test", db_path=str(tmp_path / "llm.sqlite3"), ttl=60, max_entries=10))
+
+
+def test_key_covers_messages_tools_and_generation_config(tmp_path):
+    calls.clear()
+    cache = _cache(tmp_path)
+    model = CountingChatModel(cache=cache)
+
+    first = model.bind(tools=[SEARCH_TOOL]).invoke(MESSAGES).content
+    assert model.bind(tools=[SEARCH_TOOL]).invoke(MESSAGES).content == first
+    assert model.bind(tools=[CODE_TOOL]).invoke(MESSAGES).content != first
+    assert model.bind(tools=[SEARCH_TOOL]).invoke([HumanMessage(content="bye")]).content != first
+
+    warmer = CountingChatModel(cache=cache, temperature=0.7)
+    assert warmer.bind(tools=[SEARCH_TOOL]).invoke(MESSAGES).content != first
+    assert len(calls) == 4
+
+
+def test_bypass_and_persistence(tmp_path):
+    calls.clear()
+    model = CountingChatModel(cache=_cache(tmp_path))
+    first = model.invoke(MESSAGES).content
+    with bypass_llm_cache():
+        assert model.invoke(MESSAGES).content != first
+
+    # A new process-level cache over the same SQLite file still has the entry
+    restarted = CountingChatModel(cache=_cache(tmp_path))
+    assert restarted.invoke(MESSAGES).content == first
+    assert len(calls) == 2
+
+
+def test_gemini_generation_settings_change_the_key(tmp_path):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    cache = _cache(tmp_path)
+    prompt = "serialized messages"
+    keys = {
+        cache._key(prompt, ChatGoogleGenerativeAI(model="gemini-2.5-flash-lite", api_key="x", **settings)._get_llm_string())
+        for settings in ({"temperature": 0.0}, {"temperature": 0.7}, {"temperature": 0.0, "max_output_tokens": 64})
+    }
+    assert len(keys) == 3
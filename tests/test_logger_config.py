@@ -0,0 +1,38 @@
+"""
+Tests for the background log writer in logger_config.py.
+"""
+
+import io
+import logging
+import queue
+import sys
+
+from logger_config import JsonFormatter, _BatchingStreamHandler, _DeferredQueueHandler
+
+
+def test_queued_records_keep_the_message_of_the_call():
+    log_queue = queue.Queue()
+    handler = _DeferredQueueHandler(log_queue)
+    items = ["a"]
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = logging.LogRecord("t", logging.ERROR, __file__, 1, "items=%s", (items,), sys.exc_info())
+    handler.handle(record)
+    items.append("b")
+
+    queued = log_queue.get_nowait()
+    assert queued.getMessage() == "items=['a']" and queued.args is None
+    assert queued.exc_info is None and "ValueError: boom" in queued.exc_text
+    assert "ValueError: boom" in JsonFormatter().format(queued)
+    assert "ValueError: boom" in logging.Formatter().format(queued)
+
+
+def test_closed_console_stream_is_skipped():
+    stream = io.StringIO()
+    handler = _BatchingStreamHandler(stream)
+    handler._defer_flush = True
+    stream.close()
+    # Neither writing nor the listener's batch flush may raise
+    handler.handle(logging.LogRecord("t", logging.INFO, __file__, 1, "late", None, None))
+    handler.commit()
@@ -0,0 +1,44 @@
+"""
+Tests for the context window planning of memory.ContextWindowMiddleware.
+"""
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from memory import ContextWindowMiddleware
+
+
+def _turn(index, tool_output="ok"):
+    call = {"name": "web_search", "args": {"query": str(index)}, "id": f"call-{index}"}
+    return [
+        HumanMessage(content=f"question {index} " + "word " * 50),
+        AIMessage(content="", tool_calls=[call]),
+        ToolMessage(content=tool_output, tool_call_id=f"call-{index}", name="web_search"),
+        AIMessage(content=f"answer {index} " + "word " * 50),
+    ]
+
+
+def test_small_history_is_left_alone():
+    middleware = ContextWindowMiddleware(token_budget=10_000, keep_recent_tokens=5_000)
+    messages = [SystemMessage(content="system")] + _turn(1) + _turn(2)
+    plan = middleware._plan(messages)
+    assert plan["system"].content == "system"
+    assert plan["cutoff"] == 0 and plan["folded"] == []
+    assert len(plan["history"]) == 8
+
+
+def test_old_tool_outputs_are_folded_but_not_the_current_turn():
+    middleware = ContextWindowMiddleware(token_budget=10_000, keep_recent_tokens=5_000, tool_output_max_chars=100)
+    messages = _turn(1, "x" * 1000) + _turn(2, "y" * 1000)
+    plan = middleware._plan(messages)
+    assert len(plan["folded"]) == 1
+    assert len(plan["history"][2].text) < 1000
+    assert plan["history"][6].text == "y" * 1000
+
+
+def test_over_budget_history_summarizes_older_turns():
+    middleware = ContextWindowMiddleware(token_budget=300, keep_recent_tokens=150)
+    messages = _turn(1) + _turn(2) + _turn(3)
+    plan = middleware._plan(messages)
+    # Whole older turns are summarized; the current turn is always kept
+    assert plan["cutoff"] == 8
+    assert plan["history"][8].text.startswith("question 3")
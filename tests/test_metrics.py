@@ -0,0 +1,84 @@
+"""
+Tests for the metrics registry and its Prometheus and JSON exports in metrics.py.
+"""
+
+import json
+
+import pytest
+
+from metrics import MetricsRegistry, instrument_tool, mark_tool_error, registry, render_prometheus, snapshot
+
+
+def _series(reg: MetricsRegistry, name: str, **labels) -> dict:
+    for entry in snapshot(reg)["metrics"].get(name, {}).get("series", []):
+        if entry["labels"] == labels:
+            return entry
+    return {}
+
+
+def test_prometheus_text_format():
+    reg = MetricsRegistry()
+    reg.counter("demo_calls_total", "Calls by status").inc(status="ok")
+    reg.counter("demo_calls_total", "Calls by status").inc(2, status='say "hi"')
+    histogram = reg.histogram("demo_duration_seconds", "Duration", buckets=(0.1, 1))
+    histogram.observe(0.05, tool="search")
+    histogram.observe(0.5, tool="search")
+
+    lines = render_prometheus(reg).splitlines()
+    assert lines[:2] == ["# HELP demo_calls_total Calls by status", "# TYPE demo_calls_total counter"]
+    assert 'demo_calls_total{status="ok"} 1' in lines
+    assert 'demo_calls_total{status="say \\"hi\\""} 2' in lines
+    assert "# TYPE demo_duration_seconds histogram" in lines
+    # Buckets are cumulative and end with +Inf
+    assert 'demo_duration_seconds_bucket{tool="search",le="0.1"} 1' in lines
+    assert 'demo_duration_seconds_bucket{tool="search",le="1"} 2' in lines
+    assert 'demo_duration_seconds_bucket{tool="search",le="+Inf"} 2' in lines
+    assert 'demo_duration_seconds_sum{tool="search"} 0.55' in lines
+    assert 'demo_duration_seconds_count{tool="search"} 2' in lines
+
+
+def test_json_snapshot_has_percentiles():
+    reg = MetricsRegistry()
+    histogram = reg.histogram("demo_duration_seconds", "Duration", buckets=(1, 2, 4))
+    for value in (0.5, 0.5, 1.5, 3):
+        histogram.observe(value)
+
+    data = json.loads(json.dumps(snapshot(reg)))
+    metric = data["metrics"]["demo_duration_seconds"]
+    assert metric["type"] == "histogram" and metric["help"] == "Duration"
+    series = metric["series"][0]
+    assert series["count"] == 4 and series["sum"] == 5.5 and series["mean"] == 1.375
+    # Quantiles interpolate inside the bucket that holds the rank
+    assert series["p50"] == pytest.approx(1.0)
+    assert series["p95"] == pytest.approx(3.6)
+    assert series["p50"] <= series["p95"] <= series["p99"] <= 4
+
+
+def test_drain_and_merge_aggregate_across_registries():
+    worker, coordinator = MetricsRegistry(), MetricsRegistry()
+    coordinator.counter("demo_total", "Demo").inc(tool="a")
+    worker.counter("demo_total", "Demo").inc(3, tool="a")
+    worker.histogram("demo_seconds", "Demo", buckets=(1,)).observe(0.5)
+
+    coordinator.merge(worker.drain())
+    assert _series(coordinator, "demo_total", tool="a")["value"] == 4
+    assert _series(coordinator, "demo_seconds")["count"] == 1
+    assert _series(worker, "demo_total", tool="a") == {}
+
+
+def test_instrument_tool_counts_status():
+    @instrument_tool("demo_tool")
+    def demo(fail: bool) -> str:
+        if fail:
+            mark_tool_error("boom")
+        return "result"
+
+    def calls(status: str) -> float:
+        return _series(registry, "agent_tool_calls_total", tool="demo_tool", status=status).get("value", 0)
+
+    before_ok, before_error = calls("ok"), calls("error")
+    demo(False)
+    demo(True)
+    assert calls("ok") == before_ok + 1
+    assert calls("error") == before_error + 1
+    assert _series(registry, "agent_tool_output_bytes", tool="demo_tool")["count"] >= 2
@@ -0,0 +1,78 @@
+"""
+Tests for the system prompt budget in prompt_budget.py and the prompt
+prefix cache in prompt_cache.py.
+"""
+
+from langchain.agents.middleware import ModelRequest
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from fakes import FakeChatModel
+from prompt import system_prompt
+from prompt_budget import build_compact_prompt, estimate_tokens, get_system_prompt, split_sections
+from prompt_cache import PromptPrefixCache, PromptPrefixCacheMiddleware
+
+SEARCH_TOOL = {"type": "function", "function": {"name": "search", "parameters": {"type": "object", "properties": {}}}}
+
+
+def _titles(prompt: SystemMessage) -> list:
+    return [section["title"] for section in split_sections(prompt.text)]
+
+
+def test_compact_prompt_fits_the_budget_and_keeps_required_sections():
+    full = estimate_tokens(system_prompt.text)
+    compact = build_compact_prompt(full // 2)
+    assert estimate_tokens(compact.text) <= full // 2
+    titles = _titles(compact)
+    assert "Role" in titles and "Available Tools" in titles
+    # Low-priority sections go first; the survivors keep the original order
+    assert "Continuous Improvement" not in titles
+    assert titles == [title for title in _titles(system_prompt) if title in titles]
+
+    # A budget below the required sections still keeps them
+    smallest = build_compact_prompt(1)
+    assert {"Role", "Available Tools"} <= set(_titles(smallest))
+    assert build_compact_prompt(full + 100) is system_prompt
+
+
+def test_budgeted_prompt_is_one_shared_prefix():
+    assert get_system_prompt(None) is system_prompt
+    assert get_system_prompt(1500) is get_system_prompt(1500)
+
+
+def test_prefix_cache_hits_for_the_same_prefix_only():
+    cache = PromptPrefixCache("local")
+    model = FakeChatModel()
+    first = cache.resolve(model, system_prompt, [SEARCH_TOOL])
+    assert cache.resolve(model, system_prompt, [SEARCH_TOOL]) == first
+    assert cache.resolve(model, system_prompt, []) != first
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["prefixes"]) == (1, 2, 2)
+    assert stats["tokens_saved"] >= estimate_tokens(system_prompt.text)
+
+
+def test_uncacheable_prefix_falls_back_once():
+    # Gemini context caching needs a Gemini model
+    cache = PromptPrefixCache("gemini")
+    assert cache.resolve(FakeChatModel(), system_prompt, []) is None
+    assert cache.resolve(FakeChatModel(), system_prompt, []) is None
+    assert cache.stats()["misses"] == 1
+
+
+class StubGeminiCache(PromptPrefixCache):
+    def _create(self, model, system_message, tools, key):
+        return f"cachedContents/{key[:8]}"
+
+
+def test_middleware_references_the_cached_prefix():
+    middleware = PromptPrefixCacheMiddleware(StubGeminiCache("gemini"))
+    request = ModelRequest(
+        model=FakeChatModel(), messages=[system_prompt, HumanMessage(content="hi")], tools=[SEARCH_TOOL],
+        tool_choice="auto", model_settings={},
+    )
+    prepared = middleware._prepare(request)
+    assert prepared.system_message is None and prepared.tools == [] and prepared.tool_choice is None
+    assert [m.type for m in prepared.messages] == ["human"]
+    assert prepared.model_settings["cached_content"].startswith("cachedContents/")
+
+    # The local stand-in leaves requests unchanged
+    assert PromptPrefixCacheMiddleware(PromptPrefixCache("local"))._prepare(request) is request
@@ -0,0 +1,113 @@
+"""
+Tests for the adaptive concurrency limit and the rate limited chat models in ratelimit.py.
+"""
+
+import asyncio
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGenerationChunk
+
+import ratelimit
+from cache import TieredCache
+from fakes import FakeChatModel
+from llm_cache import TieredLLMCache
+from ratelimit import AdaptiveConcurrency, RateLimiter, rate_limited
+
+
+def test_cancelled_waiter_does_not_swallow_wake_up():
+    async def scenario():
+        limit = AdaptiveConcurrency(initial=1, minimum=1, maximum=1)
+        started = await limit.aacquire()
+        waiter_a = asyncio.create_task(limit.aacquire())
+        waiter_b = asyncio.create_task(limit.aacquire())
+        await asyncio.sleep(0)
+        waiter_a.cancel()
+        await asyncio.sleep(0)
+        limit.release(started)
+        await asyncio.wait_for(waiter_b, timeout=1)
+        assert waiter_a.cancelled()
+        assert limit.in_flight == 1
+        assert not limit._waiters
+
+    asyncio.run(scenario())
+
+
+def test_waiter_cancelled_after_wake_up_passes_it_on():
+    async def scenario():
+        limit = AdaptiveConcurrency(initial=1, minimum=1, maximum=1)
+        started = await limit.aacquire()
+        waiter_a = asyncio.create_task(limit.aacquire())
+        waiter_b = asyncio.create_task(limit.aacquire())
+        await asyncio.sleep(0)
+        # A is woken, then cancelled before it runs
+        limit.release(started)
+        waiter_a.cancel()
+        await asyncio.wait_for(waiter_b, timeout=1)
+        assert limit.in_flight == 1
+
+    asyncio.run(scenario())
+
+
+def test_release_wakes_blocked_thread():
+    import threading
+
+    limit = AdaptiveConcurrency(initial=1, minimum=1, maximum=1)
+    started = limit.acquire()
+    acquired = threading.Event()
+    thread = threading.Thread(target=lambda: (limit.acquire(), acquired.set()))
+    thread.start()
+    assert not acquired.wait(0.05)
+    limit.release(started)
+    assert acquired.wait(1)
+    thread.join()
+
+
+class CountingLimiter(RateLimiter):
+    def __init__(self):
+        super().__init__("test", requests_per_minute=6000)
+        self.acquired = 0
+
+    def acquire(self, tokens: float = 0) -> float:
+        self.acquired += 1
+        return super().acquire(tokens)
+
+
+def test_cache_hits_use_no_quota(monkeypatch):
+    limiter = CountingLimiter()
+    monkeypatch.setattr(ratelimit, "model_limiter", lambda model: limiter)
+    cache = TieredLLMCache(TieredCache("test-llm", ttl=60, max_entries=10))
+    model = rate_limited(FakeChatModel)(cache=cache)
+
+    first = model.invoke([HumanMessage("hello")])
+    second = model.invoke([HumanMessage("hello")])
+    assert second.text == first.text
+    assert limiter.acquired == 1
+    assert limiter.concurrency.in_flight == 0
+
+
+class StreamingFakeChatModel(FakeChatModel):
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        for word in ("one", "two", "three"):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word))
+
+
+def test_stream_holds_slot_until_closed(monkeypatch):
+    limiter = CountingLimiter()
+    monkeypatch.setattr(ratelimit, "model_limiter", lambda model: limiter)
+    model = rate_limited(StreamingFakeChatModel)()
+
+    stream = model.stream("hi")
+    next(stream)
+    assert limiter.concurrency.in_flight == 1
+    stream.close()
+    assert limiter.concurrency.in_flight == 0
+    assert limiter.acquired == 1
+
+
+def test_rate_limited_keeps_default_fallbacks():
+    limited = rate_limited(FakeChatModel)
+    assert limited.__name__ == "FakeChatModel"
+    assert limited.__module__ == FakeChatModel.__module__
+    assert limited._stream is BaseChatModel._stream
+    assert limited._agenerate is not BaseChatModel._agenerate
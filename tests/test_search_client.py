@@ -0,0 +1,107 @@
+"""
+Tests for the pooled SerpAPI HTTP client in search_client.py and the async
+web search tool path, on a mock transport.
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+import search_client
+import tools
+from client import set_search_client
+from search_client import SerpApiHttpClient
+
+
+def _response(request: httpx.Request) -> httpx.Response:
+    query = request.url.params["q"]
+    return httpx.Response(200, json={"organic_results": [{"title": query, "link": "https://example.com", "snippet": "ok"}]})
+
+
+@pytest.fixture
+def sessions(monkeypatch):
+    """Routes every pool to a mock transport; yields the created sessions and the requests seen."""
+    created, requests = [], []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return _response(request)
+
+    def factory(cls):
+        def make(**kwargs):
+            session = cls(transport=httpx.MockTransport(handler), **kwargs)
+            created.append(session)
+            return session
+        return make
+
+    monkeypatch.setattr(search_client.httpx, "Client", factory(httpx.Client))
+    monkeypatch.setattr(search_client.httpx, "AsyncClient", factory(httpx.AsyncClient))
+    return created, requests
+
+
+def test_sync_searches_reuse_one_session(sessions):
+    created, requests = sessions
+    client = SerpApiHttpClient("secret")
+    try:
+        assert client.search({"q": "one"})["organic_results"][0]["title"] == "one"
+        client.search(q="two")
+    finally:
+        client.close()
+
+    assert len(created) == 1 and len(requests) == 2
+    assert requests[1].url.params["api_key"] == "secret" and requests[1].url.params["output"] == "json"
+
+
+def test_async_searches_share_one_session_per_loop(sessions):
+    created, requests = sessions
+    client = SerpApiHttpClient("secret")
+
+    async def run():
+        results = await asyncio.gather(*(client.asearch(q=f"q{i}") for i in range(3)))
+        await client.async_session().aclose()
+        return results
+
+    assert [r["organic_results"][0]["title"] for r in asyncio.run(run())] == ["q0", "q1", "q2"]
+    assert len(created) == 1 and len(requests) == 3
+    # Async connections are bound to their event loop, so a new loop gets its own pool
+    asyncio.run(run())
+    assert len(created) == 2
+
+
+def test_async_search_tool_uses_the_shared_pool(sessions, fake_backends, monkeypatch):
+    created, requests = sessions
+    monkeypatch.setattr(tools, "search_cache", None)
+    set_search_client(SerpApiHttpClient("secret"))
+
+    async def run():
+        return await asyncio.gather(
+            tools.web_search_tool.ainvoke({"query": "python pooling", "num_results": 1}),
+            tools.web_search_tool.ainvoke({"query": "httpx keepalive", "num_results": 1}),
+        )
+
+    outputs = asyncio.run(run())
+    assert "python pooling" in outputs[0] and "httpx keepalive" in outputs[1]
+    assert len(created) == 1 and len(requests) == 2
+
+
+def test_retryable_status_is_retried_on_the_same_session(monkeypatch):
+    statuses = [503, 200]
+    created = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        status = statuses.pop(0)
+        return _response(request) if status == 200 else httpx.Response(status)
+
+    def make(client_cls=httpx.Client, **kwargs):
+        created.append(client_cls(transport=httpx.MockTransport(handler), **kwargs))
+        return created[-1]
+
+    monkeypatch.setattr(search_client.httpx, "Client", make)
+    monkeypatch.setattr(search_client, "_backoff_delay", lambda attempt, **kwargs: 0)
+    client = SerpApiHttpClient("secret", retries=1)
+    try:
+        assert client.search(q="retry")["organic_results"][0]["title"] == "retry"
+    finally:
+        client.close()
+    assert statuses == [] and len(created) == 1
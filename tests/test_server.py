@@ -0,0 +1,70 @@
+"""
+Tests for request error isolation in server.py, on the offline fakes.
+"""
+
+import gc
+import io
+import json
+import time
+import weakref
+
+import pytest
+
+from server import AgentServer, serve_jsonl
+
+
+@pytest.fixture
+def server(fake_backends):
+    server = AgentServer(max_concurrency=2, timeout=30).start()
+    yield server
+    server.stop()
+
+
+def test_malformed_requests_return_errors_and_release_counters(server):
+    results = [
+        server.submit(request).result(timeout=30)
+        for request in ([1, 2], {"id": "x", "query": "hi", "deadline_s": "soon"}, {"id": "y"}, {"id": "ok", "query": "hi"})
+    ]
+    assert [r["status"] for r in results] == ["error", "error", "error", "ok"]
+    assert "JSON object" in results[0]["error"]
+    assert results[1]["id"] == "x" and "deadline_s" in results[1]["error"]
+    stats = server.stats()
+    assert stats["queue_depth"] == 0 and stats["in_flight"] == 0
+    assert stats["completed"] == 4 and stats["failed"] == 3
+
+
+def test_jsonl_mode_survives_non_object_lines(server):
+    infile = io.StringIO('[1, 2]\n42\n{"id": "a", "query": "hello"}\n')
+    outfile = io.StringIO()
+    serve_jsonl(infile, outfile, server=server)
+    results = {r["id"]: r for r in map(json.loads, outfile.getvalue().splitlines())}
+    assert results["a"]["status"] == "ok"
+    assert sorted(r["status"] for r in results.values()) == ["error", "error", "ok"]
+
+
+def test_jsonl_mode_drops_finished_requests(server, monkeypatch):
+    refs = []
+    submit = server.submit
+
+    def tracking_submit(request):
+        future = submit(request)
+        refs.append(weakref.ref(future))
+        return future
+
+    monkeypatch.setattr(server, "submit", tracking_submit)
+    alive = []
+
+    def lines():
+        for index in range(5):
+            yield json.dumps({"id": str(index), "query": "hi"})
+        # Still serving: the finished requests must not be kept
+        deadline = time.monotonic() + 10
+        while any(ref() is not None for ref in refs) and time.monotonic() < deadline:
+            gc.collect()
+            time.sleep(0.01)
+        alive.append(sum(ref() is not None for ref in refs))
+
+    outfile = io.StringIO()
+    serve_jsonl(lines(), outfile, server=server)
+    assert alive == [0]
+    assert sorted(json.loads(line)["id"] for line in outfile.getvalue().splitlines()) == ["0", "1", "2", "3", "4"]
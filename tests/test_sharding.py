@@ -0,0 +1,85 @@
+"""
+Tests for sharded batch execution in sharding.py, on the offline fakes.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import sharding
+from sharding import make_shards, run_sharded_batch
+
+
+def test_make_shards_keeps_positions_and_items():
+    items = ["a", {"query": "b"}, 3, None, "e"]
+    shards = make_shards(items, workers=2, shard_size=16)
+    assert [len(shard) for shard in shards] == [3, 2]
+    assert [pair for shard in shards for pair in shard] == list(enumerate(items))
+
+
+def test_sharded_batch_is_ordered_and_isolates_malformed_items():
+    items = ["q0", {"id": "q1", "query": "hello"}, 42, {"id": "q3"}, "q4", "q5"]
+    results = run_sharded_batch(items, workers=2, timeout=30, backends={"fake_backends": True})
+
+    assert [r["index"] for r in results] == list(range(len(items)))
+    assert [r["id"] for r in results] == ["0", "q1", "2", "q3", "4", "5"]
+    assert [r["status"] for r in results] == ["ok", "ok", "error", "error", "ok", "ok"]
+
+
+def test_workers_never_write_to_stdout(tmp_path):
+    import os
+    import subprocess
+    import sys
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    workload = tmp_path / "queries.jsonl"
+    workload.write_text('"a"\n"b"\n"c"\n"d"\n', encoding="utf-8")
+    output = tmp_path / "results.jsonl"
+    env = {key: value for key, value in os.environ.items() if key != "AGENT_LOG_CONSOLE"}
+    process = subprocess.run(
+        [sys.executable, "main.py", "--batch", str(workload), "--workers", "2",
+         "--fake-backends", "--output", str(output)],
+        cwd=root, env=env, capture_output=True, text=True, timeout=120,
+    )
+    assert process.returncode == 0, process.stderr
+    # Only the coordinator's own banner; workers log to stderr
+    assert process.stdout.count("Logging system initialized") == 1
+    assert len(output.read_text(encoding="utf-8").splitlines()) == 4
+
+
+def test_shards_finishing_out_of_order_are_yielded_in_input_order(monkeypatch):
+    items = [f"q{i}" for i in range(6)]
+    # Later items first, so the second half of the workload completes before the first
+    monkeypatch.setattr(sharding, "make_shards", lambda items, workers: [
+        [(i, items[i]) for i in range(3, 6)], [(i, items[i]) for i in range(3)],
+    ])
+    seen = []
+    results = run_sharded_batch(items, workers=2, timeout=30, on_result=seen.append,
+                                backends={"fake_backends": True})
+    assert [r["index"] for r in seen] == list(range(6))
+    assert [r["output"] for r in results] == [f"Fake answer to: q{i}" for i in range(6)]
+
+
+def _search_in_worker(query):
+    # Runs in a spawned process set up like a sharded batch worker
+    from client import get_search_client
+    from tools import web_search_tool
+
+    output = web_search_tool.invoke({"query": query})
+    return os.getpid(), get_search_client().call_count, output
+
+
+def test_workers_share_the_search_cache(tmp_path, monkeypatch):
+    # Workers resolve the relative cache path against the working directory
+    monkeypatch.chdir(tmp_path)
+    runs = []
+    for _ in range(2):
+        with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=sharding._init_worker, initargs=({"fake_backends": True},)) as pool:
+            runs.append(pool.submit(_search_in_worker, "python asyncio").result(timeout=120))
+
+    (first_pid, first_calls, first_output), (second_pid, second_calls, second_output) = runs
+    assert first_pid != second_pid
+    assert (first_calls, second_calls) == (1, 0)
+    assert second_output == first_output
+    assert (tmp_path / ".cache").is_dir()
@@ -0,0 +1,49 @@
+"""
+Tests for shell_sessions.ShellSession.
+"""
+
+import os
+import time
+
+import pytest
+
+from shell_sessions import ShellSession
+
+
+@pytest.fixture
+def session(tmp_path):
+    session = ShellSession("test", cwd=str(tmp_path))
+    yield session
+    session.close()
+
+
+def test_environment_snapshot_survives_jobs(session, monkeypatch):
+    probes = []
+    execute = session._execute
+
+    def counting_execute(argv, command, timeout, working_directory):
+        if command == "env":
+            probes.append(argv)
+        return execute(argv, command, timeout, working_directory)
+
+    monkeypatch.setattr(session, "_execute", counting_execute)
+    session.environment()
+    assert session.run("true", 10)["exit_code"] == 0
+    session.environment()
+    assert len(probes) == 1
+
+    assert session.run("export ADA_TEST_VAR=1", 10)["exit_code"] == 0
+    assert session.environment()["ADA_TEST_VAR"] == "1"
+    assert len(probes) == 2
+
+
+def test_command_that_keeps_writing_times_out_and_session_survives(session):
+    start = time.monotonic()
+    result = session.run("yes", 1)
+    try:
+        assert time.monotonic() - start < 15
+        assert "timed out" in result["error"]
+    finally:
+        for path in result["spill_files"]:
+            os.unlink(path)
+    assert session.run("echo still-alive", 10)["stdout"].strip() == "still-alive"
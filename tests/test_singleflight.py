@@ -0,0 +1,64 @@
+"""
+Tests for call coalescing in singleflight.py.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    group = SingleFlight("test")
+    started, release = threading.Event(), threading.Event()
+    calls, roles = [], []
+    count = group._count
+    group._count = lambda role: (roles.append(role), count(role))
+
+    def work():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "result"
+
+    with ThreadPoolExecutor(4) as pool:
+        leader = pool.submit(group.do, "key", work)
+        started.wait(5)
+        followers = [pool.submit(group.do, "key", work) for _ in range(3)]
+        # Release the leader once every follower joined its call
+        while roles.count("follower") < 3:
+            time.sleep(0.001)
+        release.set()
+        assert [f.result(5) for f in [leader] + followers] == ["result"] * 4
+    assert len(calls) == 1
+
+
+def test_errors_reach_every_caller_and_are_not_cached():
+    group = SingleFlight("test")
+
+    def fail():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        group.do("key", fail)
+    assert group.do("key", lambda: "retried") == "retried"
+
+
+def test_async_calls_share_one_task():
+    group = SingleFlight("test")
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def main():
+        return await asyncio.gather(*(group.ado("key", work) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["result"] * 5
+    assert len(calls) == 1
@@ -0,0 +1,52 @@
+"""
+Tests for the context handling of streaming.py, on the offline fakes.
+"""
+
+import asyncio
+import contextvars
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from deadline import current_deadline
+from streaming import astream_agent, stream_agent
+from tracing import span_id_var
+
+INPUTS = {"messages": [HumanMessage(content="hello")]}
+
+
+pytestmark = pytest.mark.usefixtures("fake_backends")
+
+
+def test_stream_scope_does_not_leak_into_consumer():
+    events = []
+    for event in stream_agent(INPUTS):
+        assert span_id_var.get() is None and current_deadline() is None
+        events.append(event)
+    assert events[-1] == {"type": "final", "content": "Fake answer to: hello"}
+
+
+def test_abandoned_stream_closes_from_another_context():
+    stream = stream_agent(INPUTS)
+    next(stream)
+    contextvars.copy_context().run(stream.close)
+
+
+def test_astream_scope_does_not_leak_into_consumer():
+    async def consume():
+        events = []
+        async for event in astream_agent(INPUTS):
+            assert span_id_var.get() is None and current_deadline() is None
+            events.append(event)
+        return events
+
+    assert asyncio.run(consume())[-1]["type"] == "final"
+
+
+def test_abandoned_astream_closes_from_another_task():
+    async def abandon():
+        stream = astream_agent(INPUTS)
+        await stream.__anext__()
+        await asyncio.get_running_loop().create_task(stream.aclose())
+
+    asyncio.run(abandon())
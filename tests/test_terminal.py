@@ -0,0 +1,98 @@
+"""
+Tests for parallel and streaming execution, timeouts and the bounded output
+capture in terminal.py.
+"""
+
+import os
+import shlex
+import sys
+import time
+
+from terminal import BoundedCapture, read_spilled_output, run_command, run_commands, stream_commands
+
+
+def test_small_output_is_kept_verbatim():
+    capture = BoundedCapture("stdout", head_bytes=8, tail_bytes=8)
+    capture.write(b"hello ")
+    capture.write(b"world")
+    capture.close()
+    assert not capture.truncated
+    assert capture.render() == "hello world"
+
+
+def test_large_output_keeps_head_and_tail_and_spills_the_rest():
+    capture = BoundedCapture("stdout", head_bytes=4, tail_bytes=4)
+    data = b"".join(str(i).encode() for i in range(100))
+    for start in range(0, len(data), 7):
+        capture.write(data[start:start + 7])
+    capture.close()
+    try:
+        assert capture.truncated and capture.total_bytes == len(data)
+        rendered = capture.render()
+        assert rendered.startswith(data[:4].decode()) and rendered.endswith(data[-4:].decode())
+        assert f"{len(data) - 8} bytes elided" in rendered
+        with open(capture.spill_path, "rb") as handle:
+            assert handle.read() == data
+        assert data[10:20].decode() in read_spilled_output(capture.spill_path, offset=10, max_bytes=10)
+    finally:
+        os.unlink(capture.spill_path)
+
+
+def test_command_that_keeps_writing_still_times_out():
+    start = time.monotonic()
+    result = run_command("yes", timeout=1)
+    try:
+        assert time.monotonic() - start < 10
+        assert "timed out" in result["error"]
+    finally:
+        for path in result["spill_files"]:
+            os.unlink(path)
+
+
+def _sleep_then_print(seconds: float, text: str) -> str:
+    return shlex.join([sys.executable, "-c", f"import time; time.sleep({seconds}); print({text!r})"])
+
+
+def test_parallel_commands_overlap_and_keep_input_order():
+    commands = [_sleep_then_print(1.0, "slow"), _sleep_then_print(0.2, "fast"), _sleep_then_print(0.5, "medium")]
+    start = time.monotonic()
+    results = run_commands(commands, parallel=True, max_workers=3)
+    # Sequentially the sleeps alone add up to 1.7 s
+    assert time.monotonic() - start < 1.5
+    assert [r["stdout"].strip() for r in results] == ["slow", "fast", "medium"]
+    assert all(r["exit_code"] == 0 for r in results)
+
+
+def test_parallel_stream_interleaves_events_as_they_arrive():
+    commands = [_sleep_then_print(0.8, "slow"), _sleep_then_print(0.1, "fast")]
+    events = list(stream_commands(commands, parallel=True, max_workers=2))
+    output = [e["data"].strip() for e in events if e["type"] == "stdout" and e["data"].strip()]
+    assert output == ["fast", "slow"]
+    exits = [e for e in events if e["type"] == "exit"]
+    assert [e["command"] for e in exits] == [commands[1], commands[0]]
+    assert all(e["exit_code"] == 0 for e in exits)
+
+
+def test_closing_a_parallel_stream_kills_the_running_commands():
+    command = shlex.join([sys.executable, "-u", "-c", "import time; print('ready'); time.sleep(30)"])
+    stream = stream_commands([command] * 3, parallel=True, max_workers=2)
+    assert next(stream)["type"] == "stdout"
+    start = time.monotonic()
+    stream.close()
+    assert time.monotonic() - start < 5
+
+
+def test_spill_file_stops_at_its_size_limit():
+    capture = BoundedCapture("stdout", head_bytes=4, tail_bytes=4, spill_max_bytes=100)
+    for _ in range(50):
+        capture.write(b"0123456789")
+    capture.close()
+    try:
+        with open(capture.spill_path, "rb") as handle:
+            data = handle.read()
+        assert data.startswith(b"0123456789" * 10)
+        assert b"truncated at 100 bytes" in data[100:]
+        assert "first 100 bytes of stdout (500 bytes)" in capture.render()
+        assert capture.render().endswith("6789")
+    finally:
+        os.unlink(capture.spill_path)
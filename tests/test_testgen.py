@@ -0,0 +1,94 @@
+"""
+Tests for test generation and verification in testgen.py.
+"""
+
+import os
+import re
+from typing import Any
+
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+import testgen
+from deadline import current_deadline, deadline_scope
+from fakes import FakeChatModel
+
+
+def test_workspace_runs_tests_with_isolated_home_and_tmp(monkeypatch):
+    monkeypatch.setenv("GOOGLE_API_KEY", "secret")
+    workspace = testgen.TestWorkspace("def double(x):\n    return 2 * x\n")
+    try:
+        workspace.write("test_case_1", (
+            "import os, tempfile\n"
+            "from code_under_test import double\n\n"
+            "def test_double():\n"
+            "    assert double(2) == 4\n\n"
+            f"def test_environment():\n"
+            f"    assert os.environ['HOME'].startswith({workspace.path!r})\n"
+            f"    assert tempfile.gettempdir().startswith({workspace.path!r})\n"
+            "    assert 'GOOGLE_API_KEY' not in os.environ\n"
+        ))
+        workspace.write("test_case_2", "def test_broken():\n    assert False\n")
+        results, coverage = workspace.run(["test_case_1", "test_case_2"], coverage=True)
+    finally:
+        workspace.close()
+
+    assert results["test_case_1"] is None
+    assert "test_broken" in results["test_case_2"]
+    assert coverage == 100.0
+    assert not os.path.exists(workspace.path)
+
+
+class PromptModel(FakeChatModel):
+    """Answers each prompt with `reply(prompt)`."""
+
+    reply: Any = None
+
+    def _reply(self, messages):
+        content = self.reply(messages[-1].text)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=f"```python\n{content}```"))])
+
+
+def _case(prompt):
+    return int(re.search(r"Write test case (\d+) of", prompt).group(1))
+
+
+def test_candidates_that_break_the_combined_file_are_dropped():
+    contexts = []
+
+    def reply(prompt):
+        contexts.append(current_deadline())
+        # Same class name in both files: combined, the second hides the first
+        return (
+            "import unittest\nfrom code_under_test import *\n\n"
+            "class TestDouble(unittest.TestCase):\n"
+            f"    def test_{_case(prompt)}_double(self):\n"
+            "        self.assertEqual(double(2), 4)\n"
+        )
+
+    with deadline_scope(60):
+        suite = testgen.generate_test_suite(
+            "def double(x):\n    return 2 * x\n", "unittest", 2, model=PromptModel(reply=reply)
+        )
+
+    assert list(suite["passing"]) == ["test_case_1"]
+    assert "combined" in suite["failing"]["test_case_2"]
+    assert all(deadline is not None for deadline in contexts)
+    assert "# Verified: 1/2" in testgen.format_test_suite(suite, 2)
+
+
+def test_tests_exposing_a_bug_are_reported_not_bent():
+    failing_test = "from code_under_test import *\n\ndef test_1_add():\n    assert add(1, 2) == 3\n"
+
+    def reply(prompt):
+        if "fails against the code under test" in prompt:
+            return "# SUSPECTED BUG: add subtracts instead of adding\n" + failing_test
+        return failing_test
+
+    suite = testgen.generate_test_suite("def add(a, b):\n    return a - b\n", "pytest", 1, model=PromptModel(reply=reply))
+
+    assert suite["passing"] == {}
+    assert suite["suspected_bugs"]["test_case_1"]["reason"] == "add subtracts instead of adding"
+    rendered = testgen.format_test_suite(suite, 1)
+    assert "FAILING, suspected bug: add subtracts" in rendered
+    assert "# def test_1_add():" in rendered
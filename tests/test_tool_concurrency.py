@@ -0,0 +1,86 @@
+"""
+Tests for parallel tool calls and the per-tool limits in tool_concurrency.py,
+on the offline fakes.
+"""
+
+import asyncio
+import threading
+import time
+
+from langchain.agents import create_agent
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.tools import tool
+
+from fakes import FakeChatModel
+from tool_concurrency import ToolConcurrencyMiddleware
+
+# Later calls finish first, so completion order differs from call order
+DELAYS = {"a": 0.4, "b": 0.2, "c": 0.05}
+_lock = threading.Lock()
+_state = {"in_flight": 0, "peak": 0}
+
+
+def _enter():
+    with _lock:
+        _state["in_flight"] += 1
+        _state["peak"] = max(_state["peak"], _state["in_flight"])
+
+
+def _leave():
+    with _lock:
+        _state["in_flight"] -= 1
+
+
+@tool
+def slow_lookup(key: str) -> str:
+    """Looks a key up slowly."""
+    _enter()
+    try:
+        time.sleep(DELAYS[key])
+    finally:
+        _leave()
+    return f"value {key}"
+
+
+@tool
+async def aslow_lookup(key: str) -> str:
+    """Looks a key up slowly."""
+    _enter()
+    try:
+        await asyncio.sleep(DELAYS[key])
+    finally:
+        _leave()
+    return f"value {key}"
+
+
+def _agent(tool_name: str, limit: int):
+    calls = [{"name": tool_name, "args": {"key": key}, "id": f"call-{key}"} for key in DELAYS]
+    model = FakeChatModel(responses=[AIMessage(content="", tool_calls=calls), AIMessage(content="done")])
+    tools = [slow_lookup if tool_name == "slow_lookup" else aslow_lookup]
+    return create_agent(model=model, tools=tools, middleware=[ToolConcurrencyMiddleware(limits={tool_name: limit})])
+
+
+def _tool_results(messages):
+    return [(m.tool_call_id, m.content) for m in messages if m.type == "tool"]
+
+
+def test_tool_calls_of_one_turn_run_in_parallel_in_call_order():
+    _state.update(in_flight=0, peak=0)
+    result = _agent("slow_lookup", 2).invoke({"messages": [HumanMessage(content="go")]})
+    assert _tool_results(result["messages"]) == [("call-a", "value a"), ("call-b", "value b"), ("call-c", "value c")]
+    assert _state["peak"] == 2
+
+
+def test_async_tool_calls_run_in_parallel_in_call_order():
+    _state.update(in_flight=0, peak=0)
+    start = time.perf_counter()
+    result = asyncio.run(_agent("aslow_lookup", 3).ainvoke({"messages": [HumanMessage(content="go")]}))
+    assert _tool_results(result["messages"]) == [("call-a", "value a"), ("call-b", "value b"), ("call-c", "value c")]
+    assert _state["peak"] == 3
+    assert time.perf_counter() - start < sum(DELAYS.values())
+
+
+def test_limits_are_shared_by_middleware_instances():
+    first, second = ToolConcurrencyMiddleware(limits={"t": 2}), ToolConcurrencyMiddleware(limits={"t": 2})
+    assert first._semaphore("t") is second._semaphore("t")
+    assert ToolConcurrencyMiddleware(limits={"t": 3})._semaphore("t") is not first._semaphore("t")
@@ -0,0 +1,26 @@
+"""
+Tests for tool error handling in tools.py.
+"""
+
+import tools
+
+
+def test_generate_test_cases_turns_failures_into_tool_errors(monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("model unavailable")
+
+    monkeypatch.setattr(tools, "generate_test_suite", fail)
+    result = tools.generate_test_cases.invoke({"function_code": "def f():\n    return 1\n"})
+    assert result.startswith("Error:") and "model unavailable" in result
+
+
+def test_generate_test_cases_caps_num_test_cases(monkeypatch):
+    requested = []
+
+    def suite(function_code, test_framework, num_test_cases):
+        requested.append(num_test_cases)
+        return {"passing": {}, "failing": {}, "suspected_bugs": {}, "coverage": None, "rounds": 1}
+
+    monkeypatch.setattr(tools, "generate_test_suite", suite)
+    tools.generate_test_cases.invoke({"function_code": "def f():\n    return 1\n", "num_test_cases": 500})
+    assert requested == [tools.TESTGEN_MAX_TEST_CASES]
@@ -0,0 +1,64 @@
+"""
+Tests for trace/span propagation in tracing.py and the JSON log format of
+logger_config.py.
+"""
+
+import json
+import logging
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from logger_config import JsonFormatter, _TraceContextFilter
+from tracing import callback_config, span
+
+
+@pytest.fixture
+def span_records():
+    records = []
+    handler = logging.Handler(level=logging.DEBUG)
+    handler.emit = records.append
+    handler.addFilter(_TraceContextFilter())
+    tracing_logger = logging.getLogger("tracing")
+    tracing_logger.addHandler(handler)
+    yield records
+    tracing_logger.removeHandler(handler)
+
+
+def test_nested_spans_share_the_trace_and_log_as_json(span_records):
+    with span("outer", kind="agent", request="r1") as outer:
+        with span("inner"):
+            pass
+        outer["steps"] = 2
+
+    inner, outer = [json.loads(JsonFormatter().format(record)) for record in span_records]
+    assert inner["span"]["name"] == "inner" and outer["span"]["name"] == "outer"
+    assert inner["span"]["trace_id"] == outer["span"]["trace_id"] and len(outer["span"]["trace_id"]) == 32
+    assert inner["span"]["parent_span_id"] == outer["span"]["span_id"]
+    assert outer["span"]["parent_span_id"] is None
+    assert outer["span"]["attributes"] == {"request": "r1", "steps": 2}
+    assert outer["span"]["latency_ms"] >= 0 and outer["span"]["status"] == "ok"
+    # The log line itself is stamped with the span that was active when it was written
+    assert inner["trace_id"] == outer["span"]["trace_id"] and inner["span_id"] == outer["span"]["span_id"]
+
+
+def test_failed_span_records_the_error(span_records):
+    with pytest.raises(ValueError):
+        with span("failing"):
+            raise ValueError("boom")
+    record = span_records[-1].span
+    assert record["status"] == "error" and record["attributes"]["error"] == "ValueError: boom"
+
+
+def test_model_calls_of_an_invocation_are_child_spans(span_records, fake_backends):
+    from agent import get_agent
+
+    with span("agent.invoke", kind="agent"):
+        get_agent().invoke({"messages": [HumanMessage(content="hi")]}, config=callback_config())
+
+    spans = [record.span for record in span_records]
+    agent_span = spans[-1]
+    llm_spans = [s for s in spans if s["kind"] == "llm"]
+    assert agent_span["name"] == "agent.invoke" and llm_spans
+    assert all(s["trace_id"] == agent_span["trace_id"] for s in llm_spans)
+    assert all(s["parent_span_id"] == agent_span["span_id"] for s in llm_spans)
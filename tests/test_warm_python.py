@@ -0,0 +1,47 @@
+"""
+Tests for the forking server in warm_python.py.
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+from warm_python import WarmInterpreter, parse_python_command
+
+
+@pytest.fixture
+def interpreter():
+    interpreter = WarmInterpreter(preload=["json"])
+    yield interpreter
+    interpreter.close()
+
+
+def _run(interpreter, code, timeout=30, cwd=None, env=None):
+    spec = parse_python_command([sys.executable, "-c", code], os.environ)
+    return interpreter.run(f"python -c {code!r}", spec, cwd or os.getcwd(), env or os.environ, timeout)
+
+
+def test_runs_code_with_its_own_directory_and_exit_code(interpreter, tmp_path):
+    result = _run(interpreter, "import os, sys; print(os.getcwd()); sys.exit(3)", cwd=str(tmp_path))
+    assert result["stdout"].strip() == str(tmp_path)
+    assert result["exit_code"] == 3 and result["error"] is None
+
+
+def test_output_is_bounded_and_timeouts_apply_while_writing(interpreter):
+    start = time.monotonic()
+    result = _run(interpreter, "import sys\nwhile True: sys.stdout.write('y' * 65536)", timeout=1)
+    try:
+        assert time.monotonic() - start < 15
+        assert "timed out" in result["error"]
+        assert len(result["stdout"]) < 20_000
+    finally:
+        for path in result["spill_files"]:
+            os.unlink(path)
+
+
+def test_commands_only_resolve_to_this_interpreter():
+    assert parse_python_command([sys.executable, "-m", "pytest", "-q"], os.environ) == ("m", "pytest", ["-q"])
+    assert parse_python_command(["/nonexistent/bin/python", "-c", "1"], os.environ) is None
+    assert parse_python_command([sys.executable, "-X", "dev", "x.py"], os.environ) is None
@@ -0,0 +1,115 @@
+"""
+Tool Concurrency Limits Module
+
+Summary:
+This module caps how many calls of each tool may run at the same time
+across every agent invocation in the process.
+
+Description:
+- When the model returns several tool calls in one AIMessage, the agent
+  built by `create_agent` dispatches each call as its own graph task, so
+  independent calls (e.g. two `web_search_tool` queries and a
+  `generate_test_cases`) run concurrently: on a thread pool for `invoke`
+  and as asyncio tasks for `ainvoke`. Their ToolMessages are appended in
+  the original tool-call order.
+- `ToolConcurrencyMiddleware` bounds that fan-out per tool with
+  `TOOL_CONCURRENCY_LIMITS` (tool name -> max concurrent calls), falling
+  back to `TOOL_DEFAULT_CONCURRENCY` (None = unlimited). The semaphores
+  live at module level, keyed by tool name and limit, so every middleware
+  instance (`get_agent()`, `get_session_agent()`, rebuilt agents after
+  `reset_agent()`) and thus every concurrent agent run shares them, e.g. to
+  respect the SerpAPI plan or keep the number of subprocesses bounded.
+- Sync calls wait on a threading semaphore; async calls on an asyncio
+  semaphore of the running event loop. Time spent waiting for a slot is
+  recorded in the `agent_tool_queue_wait_seconds` histogram.
+"""
+
+import asyncio
+import threading
+import time
+import weakref
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from langchain.agents.middleware import AgentMiddleware
+
+from config import TOOL_CONCURRENCY_LIMITS, TOOL_DEFAULT_CONCURRENCY
+from logger_config import setup_logger
+from metrics import registry
+
+# Initialize logger for this module
+logger = setup_logger(__name__)
+
+# Process-wide semaphores keyed by (tool name, limit); async ones per event loop
+_lock = threading.Lock()
+_semaphores: Dict[Tuple[str, int], threading.BoundedSemaphore] = {}
+_async_semaphores: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def _record_wait(tool_name: str, start: float) -> None:
+    registry.histogram("agent_tool_queue_wait_seconds", "Time tool calls waited for a concurrency slot").observe(
+        time.perf_counter() - start, tool=tool_name
+    )
+
+
+class ToolConcurrencyMiddleware(AgentMiddleware):
+    """
+    Summary:
+        Agent middleware that limits concurrent calls per tool.
+
+    Args:
+        limits (Optional[Dict[str, int]]): Max concurrent calls per tool name.
+        default (Optional[int]): Limit for tools not listed (None = unlimited).
+    """
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, int]] = None,
+        default: Optional[int] = TOOL_DEFAULT_CONCURRENCY,
+    ):
+        super().__init__()
+        self.limits = dict(TOOL_CONCURRENCY_LIMITS if limits is None else limits)
+        self.default = default
+
+    def _limit(self, tool_name: str) -> Optional[int]:
+        limit = self.limits.get(tool_name, self.default)
+        return max(1, limit) if limit is not None else None
+
+    def _semaphore(self, tool_name: str) -> Optional[threading.BoundedSemaphore]:
+        limit = self._limit(tool_name)
+        if limit is None:
+            return None
+        with _lock:
+            if (tool_name, limit) not in _semaphores:
+                _semaphores[tool_name, limit] = threading.BoundedSemaphore(limit)
+            return _semaphores[tool_name, limit]
+
+    def _async_semaphore(self, tool_name: str) -> Optional[asyncio.Semaphore]:
+        limit = self._limit(tool_name)
+        if limit is None:
+            return None
+        loop = asyncio.get_running_loop()
+        with _lock:
+            per_loop = _async_semaphores.setdefault(loop, {})
+            if (tool_name, limit) not in per_loop:
+                per_loop[tool_name, limit] = asyncio.Semaphore(limit)
+            return per_loop[tool_name, limit]
+
+    def wrap_tool_call(self, request: Any, handler: Callable) -> Any:
+        tool_name = request.tool_call["name"]
+        semaphore = self._semaphore(tool_name)
+        if semaphore is None:
+            return handler(request)
+        start = time.perf_counter()
+        with semaphore:
+            _record_wait(tool_name, start)
+            return handler(request)
+
+    async def awrap_tool_call(self, request: Any, handler: Callable) -> Any:
+        tool_name = request.tool_call["name"]
+        semaphore = self._async_semaphore(tool_name)
+        if semaphore is None:
+            return await handler(request)
+        start = time.perf_counter()
+        async with semaphore:
+            _record_wait(tool_name, start)
+            return await handler(request)
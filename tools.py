@@ -7,62 +7,333 @@ test cases.
 
 Description:
 - Provides a safe interface for executing Linux terminal commands without
-  using shell execution.
+  using shell execution, with bounded output capture and a paging tool for
+  the full output of truncated commands.
 - Integrates SerpAPI to support real-time web search and technical research.
-- Includes a test case generation utility for creating structured and
-  comprehensive Python test prompts.
-- All functions are exposed as LangChain tools using the `@tool` decorator.
+- Includes a test case generator that writes tests with the model, runs
+  them with pytest and returns only passing tests plus their coverage
+  (testgen.py).
+- All functions are exposed as LangChain tools and instrumented with
+  `metrics.instrument_tool` (duration, output size, status and cache hits).
+- Identical concurrent searches, and identical concurrent read-only
+  commands from the `SINGLE_FLIGHT_COMMANDS` allow-list, are coalesced
+  into one SerpAPI request or subprocess (singleflight.py). Results of
+  allow-listed environment probes (`python --version`, `pip list`) are
+  cached until the environment fingerprint changes (command_cache.py).
+- `execute_terminal_command` and `web_search_tool` also have native async
+  implementations (asyncio subprocesses, pooled async HTTP), used when the
+  agent runs through `ainvoke` / `astream`.
+- Within an agent session (a run with a `thread_id`), sequential commands
+  run in that session's persistent shell (shell_sessions.py), so `cd`,
+  `export` and `source` carry over between calls; `python`/`pip` commands
+  reuse a warm interpreter (warm_python.py).
 
 This module contains only tool definitions and is intended to be imported
 by the agent initialization layer.
 """
 
-import subprocess
-from typing import List, Union
+import asyncio
+import os
+import re
+from typing import List, Optional, Tuple, Union
 
-from langchain_core.tools import tool
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import StructuredTool, tool
 
-from client import client
+from cache import TieredCache, make_cache_key
+from command_cache import allow_listed, arun_cached, is_cacheable, run_cached
+from client import get_search_client
+from config import (
+    SEARCH_CACHE_ENABLED,
+    SEARCH_CACHE_PATH,
+    SEARCH_CACHE_TTL,
+    SEARCH_CACHE_MAX_ENTRIES,
+    SINGLE_FLIGHT_ENABLED,
+    SINGLE_FLIGHT_COMMANDS,
+    SHELL_SESSIONS_ENABLED,
+    TESTGEN_MAX_TEST_CASES,
+)
+from deadline import remaining_timeout
+from logger_config import setup_logger
+from metrics import instrument_tool, mark_tool_error, record_cache_lookup
+from shell_sessions import arun_stateless, run_stateless, shell_sessions
+from singleflight import SingleFlight
+from testgen import format_test_suite, generate_test_suite
+from terminal import arun_commands, format_result, read_spilled_output, run_commands
 
+# Initialize logger for this module
+logger = setup_logger(__name__)
 
+# Cache for formatted web search results (memory LRU + SQLite, with TTL)
+search_cache = TieredCache(
+    "web_search",
+    db_path=SEARCH_CACHE_PATH,
+    ttl=SEARCH_CACHE_TTL,
+    max_entries=SEARCH_CACHE_MAX_ENTRIES,
+) if SEARCH_CACHE_ENABLED else None
 
-@tool
-def execute_terminal_command(commands: Union[str, List[str]]) -> str:
+# Identical in-flight searches / allow-listed commands share one execution
+_search_flight = SingleFlight("web_search")
+_command_flight = SingleFlight("terminal")
+
+
+def _search_cache_key(query: str, num_results: int, hl: str, gl: str) -> str:
+    """
+    Summary:
+        Builds the search cache key from the normalized request parameters.
+
+    Args:
+        query (str): Raw search query; case and whitespace are normalized.
+        num_results (int): Number of requested results.
+        hl (str): Interface language.
+        gl (str): Geolocation.
+
+    Returns:
+        str: Content-addressed cache key.
+    """
+    normalized_query = re.sub(r"\s+", " ", query).strip().lower()
+    return make_cache_key("web_search", normalized_query, num_results, hl, gl)
+
+
+def _coalescing_key(cmd: str, cwd: Optional[str] = None, env: Optional[dict] = None) -> Optional[Tuple]:
+    """
+    Summary:
+        Returns the single-flight key of a command, or None if it must not
+        be shared between callers.
+
+    Args:
+        cmd (str): Command line.
+        cwd (Optional[str]): Directory the command runs in (default: current).
+        env (Optional[dict]): Environment the command runs with (default: inherited).
+
+    Returns:
+        Optional[Tuple]: `(argv, cwd, PATH)` for allow-listed commands, else None.
+    """
+    if not SINGLE_FLIGHT_ENABLED:
+        return None
+    argv = allow_listed(cmd, SINGLE_FLIGHT_COMMANDS)
+    if argv is None:
+        return None
+    return tuple(argv), os.path.abspath(cwd or os.getcwd()), (env or os.environ).get("PATH")
+
+
+def _run_command_coalesced(cmd: str, timeout: float, cwd: Optional[str] = None, env: Optional[dict] = None) -> dict:
+    timeout = remaining_timeout(timeout)
+    key = _coalescing_key(cmd, cwd, env)
+    if key is None:
+        return run_cached(cmd, cwd, env, lambda: run_stateless(cmd, timeout, cwd, env))
+    return run_cached(cmd, cwd, env, lambda: _command_flight.do(key, lambda: run_stateless(cmd, timeout, cwd, env)))
+
+
+async def _arun_command_coalesced(cmd: str, timeout: float, cwd: Optional[str] = None, env: Optional[dict] = None) -> dict:
+    timeout = remaining_timeout(timeout)
+    key = _coalescing_key(cmd, cwd, env)
+    if key is None:
+        return await arun_cached(cmd, cwd, env, lambda: arun_stateless(cmd, timeout, cwd, env))
+    return await arun_cached(cmd, cwd, env, lambda: _command_flight.ado(key, lambda: arun_stateless(cmd, timeout, cwd, env)))
+
+
+def _run_in_session(session, cmd: str, timeout: float, working_directory: Optional[str]) -> dict:
+    run = lambda: session.run(cmd, remaining_timeout(timeout), working_directory)
+    if not is_cacheable(cmd):
+        return run()
+    # Read-only probes are keyed on the session's directory and environment
+    cwd, env = _session_snapshot(session, working_directory)
+    return run_cached(cmd, cwd, env, run)
+
+
+def _session_id(config: Optional[RunnableConfig]) -> Optional[str]:
+    """Returns the agent session (thread) id of a tool call, if sessions are enabled."""
+    if not SHELL_SESSIONS_ENABLED or not config:
+        return None
+    thread_id = config.get("configurable", {}).get("thread_id")
+    return str(thread_id) if thread_id is not None else None
+
+
+def _session_snapshot(session, working_directory: Optional[str]) -> Tuple[str, dict]:
+    # Parallel commands run outside the shell, starting from its state
+    cwd = os.path.join(session.cwd, working_directory) if working_directory else session.cwd
+    return cwd, session.environment()
+
+
+def _execute_terminal_command(
+    commands: Union[str, List[str]],
+    parallel: bool = False,
+    working_directory: Optional[str] = None,
+    config: RunnableConfig = None,
+) -> str:
     """
     Summary:
         Safely executes one or more Linux terminal commands and returns their output.
 
     Args:
         commands (Union[str, List[str]]): A single command string or a list of
-        command strings to be executed sequentially.
+        command strings to be executed.
+        parallel (bool): Run the commands concurrently. Only set this when the
+        commands are independent of each other (default is False, sequential).
+        working_directory (Optional[str]): Directory to run the commands in,
+        for this call only (default: the session's current directory).
 
     Returns:
-        str: Combined stdout and stderr output for all executed commands,
-        including command context.
+        str: Exit code, wall time, stdout and stderr for every executed
+        command, in the order the commands were given.
     """
 
     if isinstance(commands, str):
         commands = [commands]
-    
-    results = []
-    for cmd in commands:
-        try:
-            # Use list format and avoid shell=True for security
-            result = subprocess.run(
-                cmd.split(),  # Split command into list
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-            output = result.stdout if result.stdout else result.stderr
-            results.append(f"Command: {cmd}\nOutput: {output}")
-        except Exception as e:
-            results.append(f"Command: {cmd}\nError: {str(e)}")
-    
-    return "\n\n".join(results)
+
+    session_id = _session_id(config)
+    if session_id is None:
+        runner = lambda cmd, timeout: _run_command_coalesced(cmd, timeout, working_directory)
+        results = run_commands(commands, parallel=parallel, runner=runner)
+    elif not parallel:
+        session = shell_sessions.get(session_id)
+        results = run_commands(
+            commands, runner=lambda cmd, timeout: _run_in_session(session, cmd, timeout, working_directory)
+        )
+    else:
+        cwd, env = _session_snapshot(shell_sessions.get(session_id), working_directory)
+        runner = lambda cmd, timeout: _run_command_coalesced(cmd, timeout, cwd, env)
+        results = run_commands(commands, parallel=True, runner=runner)
+    return _format_command_results(results)
+
+
+async def _aexecute_terminal_command(
+    commands: Union[str, List[str]],
+    parallel: bool = False,
+    working_directory: Optional[str] = None,
+    config: RunnableConfig = None,
+) -> str:
+    # Async path: asyncio subprocesses, no worker threads (except for the session shell)
+    if isinstance(commands, str):
+        commands = [commands]
+
+    session_id = _session_id(config)
+    if session_id is None:
+        runner = lambda cmd, timeout: _arun_command_coalesced(cmd, timeout, working_directory)
+        results = await arun_commands(commands, parallel=parallel, runner=runner)
+    elif not parallel:
+        session = shell_sessions.get(session_id)
+        runner = lambda cmd, timeout: asyncio.to_thread(_run_in_session, session, cmd, timeout, working_directory)
+        results = await arun_commands(commands, runner=runner)
+    else:
+        session = shell_sessions.get(session_id)
+        cwd, env = await asyncio.to_thread(_session_snapshot, session, working_directory)
+        runner = lambda cmd, timeout: _arun_command_coalesced(cmd, timeout, cwd, env)
+        results = await arun_commands(commands, parallel=True, runner=runner)
+    return _format_command_results(results)
+
+
+def _format_command_results(results: List[dict]) -> str:
+    for result in results:
+        if result["error"]:
+            mark_tool_error(result["error"])
+    return "\n\n".join(format_result(result) for result in results)
+
+
+execute_terminal_command = StructuredTool.from_function(
+    func=instrument_tool("execute_terminal_command")(_execute_terminal_command),
+    coroutine=instrument_tool("execute_terminal_command")(_aexecute_terminal_command),
+    name="execute_terminal_command",
+)
 
 @tool
-def web_search_tool(query: str, num_results: int = 5) -> str:
+@instrument_tool()
+def read_command_output(path: str, offset: int = 0, max_bytes: int = 4000) -> str:
+    """
+    Summary:
+        Pages through the full output of a terminal command whose result
+        was truncated by execute_terminal_command.
+
+    Args:
+        path (str): Output file path reported in the truncated command result.
+        offset (int): Byte offset to start reading from (default is 0).
+        max_bytes (int): Maximum number of bytes to return (default is 4000).
+
+    Returns:
+        str: The requested window of output, prefixed with its byte range.
+    """
+    try:
+        return read_spilled_output(path, offset=offset, max_bytes=max_bytes)
+    except Exception as e:
+        mark_tool_error(e)
+        return f"Error: {str(e)}"
+
+def _search_params(query: str, num_results: int) -> dict:
+    return {
+        'engine': 'google',
+        'q': query,
+        'num': num_results,
+        'hl': 'en',
+        'gl': 'us'
+    }
+
+
+def _cached_search(query: str, num_results: int):
+    """
+    Summary:
+        Looks up a search in the cache.
+
+    Args:
+        query (str): Search query.
+        num_results (int): Number of results requested.
+
+    Returns:
+        tuple: `(cache_key, cached output or None)`.
+    """
+    params = _search_params(query, num_results)
+    cache_key = _search_cache_key(query, num_results, params['hl'], params['gl'])
+    if search_cache is None:
+        return cache_key, None
+    cached = search_cache.get(cache_key)
+    record_cache_lookup("web_search_tool", cached is not None)
+    if cached is not None:
+        logger.debug("Search cache hit for query: %r", query)
+    return cache_key, cached
+
+
+def _format_search_results(results: dict, num_results: int, cache_key: str) -> str:
+    """
+    Summary:
+        Formats SerpAPI organic results and caches the formatted output.
+
+    Args:
+        results (dict): SerpAPI JSON response.
+        num_results (int): Number of results to keep.
+        cache_key (str): Key to store the formatted output under.
+
+    Returns:
+        str: Numbered titles, URLs and descriptions.
+    """
+    # Extract and format organic results
+    if 'organic_results' not in results:
+        return "No results found."
+
+    formatted_results = []
+    for idx, result in enumerate(results['organic_results'][:num_results], 1):
+        title = result.get('title', 'No title')
+        link = result.get('link', 'No link')
+        snippet = result.get('snippet', 'No description available')
+
+        formatted_results.append(
+            f"{idx}. {title}\n"
+            f"   URL: {link}\n"
+            f"   Description: {snippet}\n"
+        )
+
+    output = "\n".join(formatted_results)
+    if search_cache is not None:
+        search_cache.set(cache_key, output)
+    return output
+
+
+def _search_failed(query: str, e: Exception) -> str:
+    logger.error(f"Web search failed for query {query!r}: {str(e)}", exc_info=True)
+    mark_tool_error(e)
+    return f"Search error: {str(e)}"
+
+
+def _web_search(query: str, num_results: int = 5) -> str:
     """
     Summary:
         Performs a web search using SerpAPI and returns formatted search results.
@@ -75,40 +346,50 @@ def web_search_tool(query: str, num_results: int = 5) -> str:
         str: A formatted string containing titles, URLs, and descriptions
         of the search results.
     """
+    cache_key, cached = _cached_search(query, num_results)
+    if cached is not None:
+        return cached
+
+    def _fetch() -> str:
+        results = get_search_client().search(_search_params(query, num_results))
+        return _format_search_results(results, num_results, cache_key)
+
     try:
-        # Perform search
-        results = client.search({
-            'engine': 'google',
-            'q': query,
-            'num': num_results,
-            'hl': 'en',
-            'gl': 'us'
-        })
-        
-        # Extract and format organic results
-        if 'organic_results' not in results:
-            return "No results found."
-        
-        formatted_results = []
-        for idx, result in enumerate(results['organic_results'][:num_results], 1):
-            title = result.get('title', 'No title')
-            link = result.get('link', 'No link')
-            snippet = result.get('snippet', 'No description available')
-            
-            formatted_results.append(
-                f"{idx}. {title}\n"
-                f"   URL: {link}\n"
-                f"   Description: {snippet}\n"
-            )
-        
-        return "\n".join(formatted_results)
-        
+        return _search_flight.do(cache_key, _fetch) if SINGLE_FLIGHT_ENABLED else _fetch()
     except Exception as e:
-        return f"Search error: {str(e)}"
+        return _search_failed(query, e)
 
 
+async def _aweb_search(query: str, num_results: int = 5) -> str:
+    # Async path: pooled non-blocking HTTP; clients without `asearch` run in a thread
+    cache_key, cached = _cached_search(query, num_results)
+    if cached is not None:
+        return cached
+
+    async def _fetch() -> str:
+        search_client = get_search_client()
+        params = _search_params(query, num_results)
+        if hasattr(search_client, "asearch"):
+            results = await search_client.asearch(params)
+        else:
+            results = await asyncio.to_thread(search_client.search, params)
+        return _format_search_results(results, num_results, cache_key)
+
+    try:
+        return await (_search_flight.ado(cache_key, _fetch) if SINGLE_FLIGHT_ENABLED else _fetch())
+    except Exception as e:
+        return _search_failed(query, e)
+
+
+web_search_tool = StructuredTool.from_function(
+    func=instrument_tool("web_search_tool")(_web_search),
+    coroutine=instrument_tool("web_search_tool")(_aweb_search),
+    name="web_search_tool",
+)
+
 
 @tool
+@instrument_tool()
 def generate_test_cases(
     function_code: str,
     test_framework: str = "pytest",
@@ -116,42 +397,37 @@ def generate_test_cases(
 ) -> str:
     """
     Summary:
-        Generates structured Python test cases for a given function or class
-        using Gemini via LangChain.
+        Generates Python test cases for a given function or class with
+        Gemini, runs them and returns only the ones that pass.
 
     Args:
         function_code (str): Python function or class code to test.
         test_framework (str): Testing framework (pytest or unittest).
-        num_test_cases (int): Number of test cases to generate.
+        num_test_cases (int): Number of test cases to generate (at most
+            `TESTGEN_MAX_TEST_CASES`).
 
     Returns:
-        str: Runnable Python test code.
+        str: Runnable Python test code with the pass count and line coverage.
     """
 
     if test_framework not in {"pytest", "unittest"}:
+        mark_tool_error("unsupported test framework")
         return "Error: test_framework must be 'pytest' or 'unittest'"
+    if num_test_cases < 1:
+        mark_tool_error("invalid num_test_cases")
+        return "Error: num_test_cases must be at least 1"
+    if num_test_cases > TESTGEN_MAX_TEST_CASES:
+        # Every case costs a model call plus repair rounds
+        logger.warning(f"Capping num_test_cases at {TESTGEN_MAX_TEST_CASES} (requested {num_test_cases})")
+        num_test_cases = TESTGEN_MAX_TEST_CASES
 
-    prompt = f"""
-You are a senior Python QA engineer.
-
-Task:
-Generate exactly {num_test_cases} test cases for the given Python function
-using the {test_framework} framework.
-
-Rules:
-- Output ONLY runnable test code
-- Use clear and descriptive test names
-- Follow {test_framework} best practices
-- Include comments for each test
-- No explanations outside the code
-
-Coverage:
-- Positive cases
-- Edge cases
-- Negative cases (exceptions / invalid inputs)
-
-Code Under Test:
-```python
-{function_code}
-"""
-    return prompt
\ No newline at end of file
+    try:
+        suite = generate_test_suite(function_code, test_framework, num_test_cases)
+    except Exception as e:
+        mark_tool_error(e)
+        return f"Error: test generation failed: {str(e)}"
+    if not suite["passing"] and not suite["suspected_bugs"]:
+        mark_tool_error("no passing tests")
+        failures = "\n\n".join(f"{name}:\n{failure}" for name, failure in suite["failing"].items())
+        return f"Error: none of the generated test cases passed after {suite['rounds']} runs.\n\n{failures}"
+    return format_test_suite(suite, num_test_cases)
@@ -0,0 +1,266 @@
+"""
+Tracing and Timing Spans Module
+
+Summary:
+This module records timing spans for agent invocations, LLM calls and
+tool calls so slow steps of an agent turn can be identified from the logs.
+
+Description:
+- `span()` opens a span as a context manager: it creates (or inherits) a
+  trace ID, assigns a new span ID, and propagates both through
+  contextvars so every log record emitted inside carries them.
+- When a span ends, one log record is written with its name, kind,
+  start/end timestamps, latency in milliseconds, status and attributes.
+- `TracingCallbackHandler` is a LangChain callback handler that turns
+  chat model and tool runs inside the agent graph into child spans of
+  the current agent span.
+- `callback_config()` returns the `config` argument to pass to
+  `agent.invoke` / `agent.ainvoke` so those callbacks (and the LLM metrics
+  callback from metrics.py) are attached.
+- Finished agent spans are also recorded as metrics.
+
+Span records are plain log records; enable `LOG_FORMAT = "json"` in
+config.py to get them as machine-readable JSON lines.
+"""
+
+import functools
+import inspect
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from config import TRACE_SPAN_LOG_LEVEL
+from logger_config import setup_logger, span_id_var, trace_id_var
+from metrics import metrics_handler, observe_agent_span
+
+# Initialize logger for this module
+logger = setup_logger(__name__)
+
+_SPAN_LEVEL = logging.getLevelName(TRACE_SPAN_LOG_LEVEL)
+
+
+def _new_id(length: int = 16) -> str:
+    """Returns a random hex identifier."""
+    return uuid.uuid4().hex[:length]
+
+
+def _emit_span(
+    name: str,
+    kind: str,
+    trace_id: str,
+    span_id: str,
+    parent_span_id: Optional[str],
+    start: float,
+    end: float,
+    status: str,
+    attributes: Dict[str, Any],
+) -> Dict[str, Any]:
+    """
+    Summary:
+        Logs a finished span.
+
+    Args:
+        name (str): Span name, e.g. "agent.invoke" or "tool:web_search_tool".
+        kind (str): One of "agent", "llm", "tool" or "internal".
+        trace_id (str): Trace the span belongs to.
+        span_id (str): ID of the span itself.
+        parent_span_id (Optional[str]): Enclosing span, if any.
+        start (float): Start time (epoch seconds).
+        end (float): End time (epoch seconds).
+        status (str): "ok" or "error".
+        attributes (Dict[str, Any]): Extra span attributes.
+
+    Returns:
+        Dict[str, Any]: The span record that was logged.
+    """
+    record = {
+        "name": name,
+        "kind": kind,
+        "trace_id": trace_id,
+        "span_id": span_id,
+        "parent_span_id": parent_span_id,
+        "start": start,
+        "end": end,
+        "latency_ms": round((end - start) * 1000, 3),
+        "status": status,
+        "attributes": attributes,
+    }
+    if kind == "agent":
+        observe_agent_span(name, end - start, status)
+    if logger.isEnabledFor(_SPAN_LEVEL):
+        logger.log(
+            _SPAN_LEVEL,
+            "span %s [%s] %s in %.1f ms",
+            name, kind, status, record["latency_ms"],
+            extra={"span": record},
+        )
+    return record
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Summary:
+        Context manager that times a block of code as a span.
+
+    Args:
+        name (str): Span name.
+        kind (str): Span kind ("agent", "llm", "tool" or "internal").
+        **attributes (Any): Attributes stored on the span; the yielded
+            dictionary can be updated inside the block to add more.
+
+    Yields:
+        Dict[str, Any]: Mutable span attributes.
+    """
+    parent_span_id = span_id_var.get()
+    trace_id = trace_id_var.get() or _new_id(32)
+    span_id = _new_id()
+    trace_token = trace_id_var.set(trace_id)
+    span_token = span_id_var.set(span_id)
+
+    start = time.time()
+    status = "ok"
+    try:
+        yield attributes
+    except BaseException as e:
+        status = "error"
+        attributes.setdefault("error", f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        end = time.time()
+        span_id_var.reset(span_token)
+        trace_id_var.reset(trace_token)
+        _emit_span(name, kind, trace_id, span_id, parent_span_id, start, end, status, attributes)
+
+
+def traced(name: Optional[str] = None, kind: str = "internal"):
+    """
+    Summary:
+        Decorator that runs a sync or async function inside a span.
+
+    Args:
+        name (Optional[str]): Span name (defaults to the function name).
+        kind (str): Span kind.
+
+    Returns:
+        Callable: The decorator.
+    """
+
+    def decorator(func):
+        span_name = name or func.__name__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name, kind):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name, kind):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """
+    Summary:
+        LangChain callback handler that records LLM and tool runs as spans.
+
+    Description:
+        Start events capture the trace context active in the calling
+        context (the enclosing agent span); end and error events emit the
+        finished span. Runs are tracked by their LangChain `run_id`, so the
+        handler is safe to share between concurrent invocations.
+    """
+
+    def __init__(self):
+        self._runs: Dict[UUID, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id: UUID, name: str, kind: str, attributes: Dict[str, Any]) -> None:
+        with self._lock:
+            self._runs[run_id] = {
+                "name": name,
+                "kind": kind,
+                "trace_id": trace_id_var.get() or _new_id(32),
+                "parent_span_id": span_id_var.get(),
+                "span_id": _new_id(),
+                "start": time.time(),
+                "attributes": attributes,
+            }
+
+    def _finish(self, run_id: UUID, status: str, **attributes: Any) -> None:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        run["attributes"].update(attributes)
+        _emit_span(
+            run["name"], run["kind"], run["trace_id"], run["span_id"],
+            run["parent_span_id"], run["start"], time.time(), status, run["attributes"],
+        )
+
+    # ------------------------------------------------------------------ LLM runs
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        name = (serialized or {}).get("name") or "chat_model"
+        self._start(run_id, f"llm:{name}", "llm", {"messages": sum(len(m) for m in messages)})
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        name = (serialized or {}).get("name") or "llm"
+        self._start(run_id, f"llm:{name}", "llm", {"prompts": len(prompts)})
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        try:
+            message = response.generations[0][0].message
+            usage = getattr(message, "usage_metadata", None) or usage
+        except (IndexError, AttributeError):
+            pass
+        self._finish(run_id, "ok", usage=usage)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, "error", error=f"{type(error).__name__}: {error}")
+
+    # ----------------------------------------------------------------- tool runs
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        name = (serialized or {}).get("name") or "tool"
+        self._start(run_id, f"tool:{name}", "tool", {"input_chars": len(input_str or "")})
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        content = getattr(output, "content", output)
+        self._finish(run_id, "ok", output_chars=len(str(content)))
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, "error", error=f"{type(error).__name__}: {error}")
+
+
+# Shared handler; run state is keyed by run_id so one instance serves all calls
+tracing_handler = TracingCallbackHandler()
+
+
+def callback_config(**config: Any) -> Dict[str, Any]:
+    """
+    Summary:
+        Builds a runnable config with the tracing and metrics callbacks attached.
+
+    Args:
+        **config (Any): Additional runnable config entries.
+
+    Returns:
+        Dict[str, Any]: Config for `agent.invoke(..., config=...)`.
+    """
+    callbacks = list(config.pop("callbacks", []) or [])
+    callbacks.extend([tracing_handler, metrics_handler])
+    return {**config, "callbacks": callbacks}
@@ -0,0 +1,427 @@
+"""
+Warm Python Interpreter Module
+
+Summary:
+This module runs `python` and `pip` commands in processes forked from a
+long-lived interpreter instead of starting a new interpreter each time.
+
+Description:
+- `WarmInterpreter` keeps one server process (a fresh interpreter started
+  with `-c`, never a fork of the agent) that has `WARM_PYTHON_PRELOAD`
+  already imported. For every command it forks a child that switches to
+  the command's working directory and environment and runs the target the
+  way the interpreter would (`-c CODE`, `-m MODULE`, script path).
+  Interpreter startup, `site` processing and the preloaded imports are
+  paid once instead of per command. Preloaded modules stay in the child's
+  `sys.modules`, so commands can tell they run warm; the list is empty by
+  default and the whole mode is off (`WARM_PYTHON_ENABLED`).
+- Requests go to the server over a Unix socket together with the write
+  ends of two pipes, which become the child's stdout and stderr. The
+  agent reads the pipes while the command runs, straight into a
+  `BoundedCapture`, so output limits and timeouts apply as for any other
+  command.
+- `parse_python_command()` decides whether a command can take this path:
+  the `python`/`pip` it names must resolve to this interpreter's bin
+  directory (so an activated virtualenv or another Python is never
+  substituted), `PYTHON*` environment variables must match the server's,
+  and only the plain `-c`, `-m` and script forms are accepted. Everything
+  else runs as a normal subprocess.
+- Each child gets its own process group, so a per-command timeout kills
+  it together with anything it spawned.
+- `pip install` / `pip uninstall` mark the server stale; it is restarted
+  before the next command, so preloaded modules never go out of date.
+
+Results have the format returned by `terminal.run_command`.
+"""
+
+import json
+import os
+import re
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from config import TERMINAL_COMMAND_TIMEOUT, WARM_PYTHON_ENABLED, WARM_PYTHON_PRELOAD
+from logger_config import setup_logger
+from terminal import BoundedCapture, _build_result
+
+# Initialize logger for this module
+logger = setup_logger(__name__)
+
+_PYTHON_NAME = re.compile(r"python3?(\.\d+)?")
+_PIP_NAME = re.compile(r"pip3?(\.\d+)?")
+_READ_CHUNK_SIZE = 65536
+
+# Runs in the server process. Single-threaded on purpose: it forks.
+_SERVER_SOURCE = r'''
+import atexit, json, os, runpy, select, signal, socket, sys, traceback
+
+_requests = socket.socket(fileno=int(sys.argv[1]))
+for _name in sys.argv[2:]:
+    try:
+        __import__(_name)
+    except Exception:
+        pass
+
+_reply_fd = os.dup(1)
+_wake_r, _wake_w = os.pipe()
+os.set_blocking(_wake_r, False)
+os.set_blocking(_wake_w, False)
+signal.set_wakeup_fd(_wake_w)
+signal.signal(signal.SIGCHLD, lambda *_: None)
+
+
+def _reply(message):
+    os.write(_reply_fd, (json.dumps(message) + "\n").encode())
+
+
+def _child(request, pipes):
+    os.setsid()
+    signal.set_wakeup_fd(-1)
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    for fd in (_reply_fd, _wake_r, _wake_w, _requests.detach()):
+        os.close(fd)
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    for fd, pipe in zip((1, 2), pipes):
+        os.dup2(pipe, fd)
+        os.close(pipe)
+    code = 1
+    try:
+        os.chdir(request["cwd"])
+        os.environ.clear()
+        os.environ.update(request["env"])
+        mode, target, args = request["mode"], request["target"], request["args"]
+        if mode == "c":
+            sys.argv = ["-c"] + args
+            exec(compile(target, "<string>", "exec"), {"__name__": "__main__", "__builtins__": __builtins__})
+        elif mode == "m":
+            sys.argv = [target] + args
+            runpy.run_module(target, run_name="__main__", alter_sys=True)
+        else:
+            sys.argv = [target] + args
+            sys.path[0] = os.path.dirname(os.path.abspath(target))
+            runpy.run_path(target, run_name="__main__")
+        code = 0
+    except SystemExit as e:
+        if e.code is None:
+            code = 0
+        elif isinstance(e.code, int):
+            code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except BaseException as e:
+        # Hide this function's frame, like a traceback of the real interpreter
+        traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+    try:
+        atexit._run_exitfuncs()
+        sys.stdout.flush()
+        sys.stderr.flush()
+    except BaseException:
+        pass
+    os._exit(code & 0xFF)
+
+
+_children = {}
+while True:
+    try:
+        ready, _, _ = select.select([_requests, _wake_r], [], [])
+    except InterruptedError:
+        continue
+    if _wake_r in ready:
+        try:
+            while os.read(_wake_r, 512):
+                pass
+        except BlockingIOError:
+            pass
+    while _children:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid == 0:
+            break
+        _reply({"id": _children.pop(pid), "exit_code": os.waitstatus_to_exitcode(status)})
+    if _requests in ready:
+        # One request per message, with the write ends of the child's stdout/stderr
+        data, pipes, _flags, _address = socket.recv_fds(_requests, 1 << 20, 2)
+        if not data:
+            break
+        request = json.loads(data)
+        pid = os.fork()
+        if pid == 0:
+            _child(request, pipes)
+        for pipe in pipes:
+            os.close(pipe)
+        _children[pid] = request["id"]
+        _reply({"id": request["id"], "pid": pid})
+'''
+
+
+def _python_env_differs(env: Mapping[str, str]) -> bool:
+    keys = {k for k in env if k.startswith("PYTHON")} | {k for k in os.environ if k.startswith("PYTHON")}
+    return any(env.get(k) != os.environ.get(k) for k in keys)
+
+
+def is_python_command(argv: Sequence[str]) -> bool:
+    """
+    Summary:
+        Cheap name check for `python`/`pip` commands before the full parse.
+
+    Args:
+        argv (Sequence[str]): Command split into arguments.
+
+    Returns:
+        bool: True if the program is named like a Python interpreter or pip.
+    """
+    if not argv:
+        return False
+    name = os.path.basename(argv[0])
+    return bool(_PYTHON_NAME.fullmatch(name) or _PIP_NAME.fullmatch(name))
+
+
+def parse_python_command(
+    argv: Sequence[str],
+    env: Mapping[str, str],
+    executable: str = sys.executable,
+) -> Optional[Tuple[str, str, List[str]]]:
+    """
+    Summary:
+        Checks whether a command can run on the warm interpreter.
+
+    Args:
+        argv (Sequence[str]): Command split into arguments.
+        env (Mapping[str, str]): Environment the command would run with.
+        executable (str): Interpreter of the warm server.
+
+    Returns:
+        Optional[Tuple[str, str, List[str]]]: `(mode, target, args)` with mode
+            `"c"`, `"m"` or `"path"`, or None if the command must run as a
+            normal subprocess.
+    """
+    if not is_python_command(argv) or _python_env_differs(env):
+        return None
+    name = os.path.basename(argv[0])
+
+    path = argv[0] if os.sep in argv[0] else shutil.which(argv[0], path=env.get("PATH", ""))
+    if path is None:
+        return None
+    bin_dir = os.path.realpath(os.path.dirname(os.path.abspath(executable)))
+    if os.path.realpath(os.path.dirname(os.path.abspath(path))) != bin_dir:
+        return None
+
+    args = list(argv[1:])
+    if _PIP_NAME.fullmatch(name):
+        return "m", "pip", args
+    if os.path.realpath(path) != os.path.realpath(executable) or not args:
+        return None
+    if args[0] in ("-c", "-m"):
+        return (args[0][1], args[1], args[2:]) if len(args) >= 2 else None
+    if args[0].startswith("-"):
+        return None
+    return "path", args[0], args[1:]
+
+
+def _kill_group(pid: int) -> None:
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        # Not a group leader yet (setsid() not called) or already gone
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+
+def _drain(fd: int, capture: BoundedCapture) -> None:
+    """Copies a pipe into a capture until every writer closed it."""
+    with os.fdopen(fd, "rb", buffering=0) as pipe:
+        for chunk in iter(lambda: pipe.read(_READ_CHUNK_SIZE), b""):
+            capture.write(chunk)
+
+
+class WarmInterpreter:
+    """
+    Summary:
+        Forking server that runs Python commands without interpreter startup.
+
+    Args:
+        executable (str): Python interpreter of the server.
+        preload (Sequence[str]): Modules imported once by the server.
+    """
+
+    def __init__(self, executable: str = sys.executable, preload: Sequence[str] = WARM_PYTHON_PRELOAD):
+        self.executable = executable
+        self.preload = list(preload)
+        self._process: Optional[subprocess.Popen] = None
+        self._requests: Optional[socket.socket] = None
+        self._stale = False
+        self._lock = threading.Lock()
+        self._calls: Dict[int, Dict[str, Any]] = {}
+        self._next_id = 0
+
+    def _start(self) -> subprocess.Popen:
+        # Called with the lock held
+        if self._process is not None and (self._stale or self._process.poll() is not None):
+            self._stop()
+        if self._process is None:
+            logger.info(f"Starting warm Python interpreter (preload: {', '.join(self.preload) or 'none'})")
+            self._requests, server_end = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+            with server_end:
+                self._process = subprocess.Popen(
+                    [self.executable, "-c", _SERVER_SOURCE, str(server_end.fileno()), *self.preload],
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                    cwd=tempfile.gettempdir(),
+                    pass_fds=(server_end.fileno(),),
+                    start_new_session=True,
+                )
+            self._stale = False
+            threading.Thread(target=self._read_replies, args=(self._process,), daemon=True).start()
+        return self._process
+
+    def _stop(self) -> None:
+        process, self._process = self._process, None
+        if process is not None:
+            # The server exits once its request socket is closed
+            self._requests.close()
+            self._requests = None
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    def _read_replies(self, process: subprocess.Popen) -> None:
+        for line in process.stdout:
+            message = json.loads(line)
+            with self._lock:
+                call = self._calls.get(message["id"])
+            if call is None:
+                continue
+            call.update(message)
+            if "exit_code" in message:
+                call["done"].set()
+            else:
+                call["started"].set()
+        # Server gone: release everyone still waiting
+        with self._lock:
+            for call in self._calls.values():
+                call.setdefault("exit_code", None)
+                call["started"].set()
+                call["done"].set()
+
+    def run(
+        self,
+        command: str,
+        spec: Tuple[str, str, List[str]],
+        cwd: str,
+        env: Mapping[str, str],
+        timeout: float = TERMINAL_COMMAND_TIMEOUT,
+    ) -> Dict[str, Any]:
+        """
+        Summary:
+            Runs a command accepted by `parse_python_command`.
+
+        Args:
+            command (str): Original command line, for the result.
+            spec (Tuple[str, str, List[str]]): Parsed `(mode, target, args)`.
+            cwd (str): Working directory of the command.
+            env (Mapping[str, str]): Environment of the command.
+            timeout (float): Seconds before the command is killed.
+
+        Returns:
+            Dict[str, Any]: Result in the format returned by `terminal.run_command`.
+        """
+        start = time.perf_counter()
+        mode, target, args = spec
+        captures = {name: BoundedCapture(name) for name in ("stdout", "stderr")}
+        pipes = {name: os.pipe() for name in captures}
+        pumps = [
+            threading.Thread(target=_drain, args=(pipes[name][0], captures[name]), daemon=True)
+            for name in captures
+        ]
+        for pump in pumps:
+            pump.start()
+        call = {"started": threading.Event(), "done": threading.Event()}
+        call_id, error = None, None
+        try:
+            try:
+                with self._lock:
+                    self._start()
+                    self._next_id += 1
+                    call_id = self._next_id
+                    self._calls[call_id] = call
+                    request = {"id": call_id, "mode": mode, "target": target, "args": args, "cwd": cwd, "env": dict(env)}
+                    socket.send_fds(self._requests, [json.dumps(request).encode()], [w for _, w in pipes.values()])
+            finally:
+                # The child holds its own copies; the pumps see EOF once it exits
+                for _, write_end in pipes.values():
+                    os.close(write_end)
+
+            if not call["done"].wait(timeout):
+                call["started"].wait(1)
+                if call.get("pid"):
+                    _kill_group(call["pid"])
+                call["done"].wait(5)
+                error = f"Command timed out after {timeout} seconds"
+                logger.warning(f"{error}: {command!r}")
+            if call.get("exit_code") is None and error is None:
+                error = "Warm interpreter exited unexpectedly"
+
+            if mode == "m" and target == "pip" and args[:1] in (["install"], ["uninstall"]):
+                with self._lock:
+                    self._stale = True
+
+            for pump in pumps:
+                pump.join(max(0.0, start + timeout - time.perf_counter()))
+            if any(pump.is_alive() for pump in pumps) and call.get("pid"):
+                # A background process it started still holds the output open
+                _kill_group(call["pid"])
+                for pump in pumps:
+                    pump.join(5)
+        finally:
+            with self._lock:
+                self._calls.pop(call_id, None)
+            for capture in captures.values():
+                capture.close()
+
+        exit_info = {
+            "exit_code": call.get("exit_code"),
+            "wall_time_s": round(time.perf_counter() - start, 3),
+            "error": error,
+        }
+        return _build_result(command, captures, exit_info)
+
+    def close(self) -> None:
+        """Stops the server process."""
+        with self._lock:
+            self._stop()
+
+
+_warm_interpreter: Optional[WarmInterpreter] = None
+_warm_lock = threading.Lock()
+
+
+def get_warm_interpreter() -> Optional[WarmInterpreter]:
+    """
+    Summary:
+        Returns the shared warm interpreter, or None when disabled.
+
+    Returns:
+        Optional[WarmInterpreter]: The process-wide instance.
+    """
+    global _warm_interpreter
+    if not WARM_PYTHON_ENABLED or os.name != "posix":
+        return None
+    with _warm_lock:
+        if _warm_interpreter is None:
+            _warm_interpreter = WarmInterpreter()
+        return _warm_interpreter